@@ -0,0 +1,51 @@
+import operator
+import pandas as pd
+
+OPERATORS = {'>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le, '==': operator.eq}
+
+def first_numeric(details):
+    """Marks = the first numeric value in a student's details dict (0 if none)."""
+    if details and isinstance(details, dict):
+        for v in details.values():
+            if isinstance(v, (int, float)) and not isinstance(v, bool): return v
+    return 0
+
+def attendance_table(students, records):
+    """
+    One pass over the class: groups attendance records by student once
+    (instead of rescanning every record per student) and returns
+    (DataFrame[name, id, present, attendance, marks], total session dates).
+    """
+    roster = pd.DataFrame({
+        'name': [s['name'] for s in students],
+        'id': [s['student_id'] for s in students],
+        'marks': [first_numeric(s.get('details')) for s in students],
+    })
+    roster['key'] = roster['id'].astype(str)
+
+    if records:
+        rec = pd.DataFrame.from_records(records, columns=['student_id', 'date', 'status'])
+        global_total = int(rec['date'].nunique())
+        present = rec.loc[rec['status'] == 'Present'].groupby(rec['student_id'].astype(str)).size()
+    else:
+        global_total = 0
+        present = pd.Series(dtype='int64')
+
+    roster['present'] = roster['key'].map(present).fillna(0).astype(int)
+    roster['attendance'] = (roster['present'] / global_total * 100).round(1) if global_total else 0.0
+    return roster.drop(columns='key'), global_total
+
+def filter_table(df, search_name='', f_type='attendance', op=None, value=None):
+    """Applies the name search and the operator filter as vectorised masks."""
+    mask = pd.Series(True, index=df.index)
+    if search_name:
+        # astype: an empty roster gives a float column, which has no .str
+        mask &= df['name'].astype(str).str.lower().str.contains(search_name.lower(), regex=False)
+
+    if op in OPERATORS and value is not None:
+        try:
+            target = df['attendance'] if f_type == 'attendance' else pd.to_numeric(df['marks'], errors='coerce')
+            mask &= OPERATORS[op](target, float(value))
+        except (TypeError, ValueError):
+            pass  # Unusable value: same as before, don't filter on it
+    return df[mask]
@@ -1,14 +1,29 @@
 import os
 import json
 import traceback
-import pickle
+import threading
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, Future
 import pandas as pd
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
 from flask_cors import CORS
 import google.generativeai as genai
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from sklearn.metrics.pairwise import cosine_similarity
+from timetable_index import TimetableIndex, campus_now
+from syllabus_index import SyllabusIndex, YEAR_LABELS, parse_year
+import brain_store
+from retrieval import RetrievalEngine, query_filters
+from query_cache import TTLCache, normalize_query, text_hash
+from analytics import attendance_table, filter_table
+from roster_context import roster_intent, encode_roster
+from context_builder import ContextAssembler, estimate_tokens, trim_to_tokens
+from db import DataAccess, DBUnavailable, connect
+from history import HistoryManager
+from intent_parser import parse_command, resolves, extract_action
+from static_assets import AssetManifest, send_asset
+import metrics
+from metrics import span, note, record
 
 # --- 1. SETUP (SIBLING FOLDER MODE) ---
 current_file_path = os.path.abspath(__file__)
@@ -20,9 +35,11 @@ print(f"📍 Project Root: {project_root}")
 
 # Define paths assuming the standard structure
 frontend_dir = os.path.join(project_root, 'frontend')
-kb_path = os.path.join(backend_dir, 'knowledge_base.json')
-vectorizer_path = os.path.join(backend_dir, 'vectorizer.pkl')
-matrix_path = os.path.join(backend_dir, 'tfidf_matrix.pkl')
+brain_dir = os.path.join(backend_dir, 'brain')
+timetable_index_path = os.path.join(backend_dir, 'timetable_index.json')
+syllabus_index_path = os.path.join(backend_dir, 'syllabus_index.json')
+assets_manifest_path = os.path.join(backend_dir, 'assets_manifest.json')
+data_dir = os.path.join(project_root, 'data')
 dotenv_path = os.path.join(project_root, '.env')
 
 # Verify existence (Debug Log)
@@ -50,320 +67,764 @@ if api_key:
         top_k=40,
         max_output_tokens=4096,
     )
-    model = genai.GenerativeModel(
+
+def make_model(system_instruction=None):
+    # A model object is only config; one per turn carries that turn's system instruction
+    return genai.GenerativeModel(
         model_name='gemini-2.0-flash',
-        generation_config=generation_config
+        generation_config=generation_config,
+        system_instruction=system_instruction
     )
+
+if api_key:
+    model = make_model()
 else:
     print("⚠️ WARNING: GEMINI_API_KEY not found in .env")
 
-# Initialize Supabase
+# Initialize Supabase (pooled client, retries and circuit breaker live in db.py)
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-supabase: Client = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try: supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except: pass
+def connect_supabase():
+    if not (SUPABASE_URL and SUPABASE_KEY): return None
+    try: return connect(SUPABASE_URL, SUPABASE_KEY)
+    except Exception as e: print(f"❌ Supabase Init Error: {e}")
+supabase_client = connect_supabase()
+db = DataAccess(supabase_client)
 
 # --- 2. LOAD THE "TRAINED BRAIN" ---
-chunks = []
-vectorizer = None
-tfidf_matrix = None
+# Ranking: hybrid (default: BM25 + TF-IDF + char n-grams) | bm25 | tfidf | char
+# - compare with `python eval_retrieval.py`
+RANKER = os.getenv('RANKER', 'hybrid')
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '8'))
+
+class Knowledge:
+    """
+    One immutable snapshot of everything get_context reads. Reloads build a
+    new snapshot off to the side and swap the global reference in one
+    assignment (read-copy-update), so readers never see a half-loaded index
+    and never wait on a lock.
+    """
+
+    def __init__(self, brain=None, timetable=None, timetable_digest='', syllabus=None, syllabus_digest=''):
+        self.brain = brain
+        self.chunks = brain.chunks if brain else []
+        self.tfidf_matrix = brain.matrix if brain else None
+        self.engine = RetrievalEngine(brain, ranker=RANKER) if brain else None
+        self.timetable = timetable
+        self.syllabus = syllabus
+        self.version = f"{brain.version if brain else 'none'}-{timetable_digest or 'none'}"
+        if syllabus_digest: self.version += f"-{syllabus_digest}"
+
+# --- QUERY CACHES (keys carry kb.version; both are cleared on reload) ---
+# Tier 1: normalised query -> retrieved chunk ids
+retrieval_cache = TTLCache(int(os.getenv('RETRIEVAL_CACHE_SIZE', '2048')), float(os.getenv('RETRIEVAL_CACHE_TTL', '3600')))
+# Tier 2: (prompt hash, message) -> model reply. Guest/student, no history, no roster only.
+answer_cache = TTLCache(int(os.getenv('ANSWER_CACHE_SIZE', '512')), float(os.getenv('ANSWER_CACHE_TTL', '900')))
+# Rosters: class_id -> students, ('teacher', email) -> default class_id.
+# Dropped on upload/delete/attendance writes in this worker; the TTL bounds staleness across workers.
+roster_cache = TTLCache(int(os.getenv('ROSTER_CACHE_SIZE', '256')), float(os.getenv('ROSTER_CACHE_TTL', '300')))
+ROSTER_CONTEXT_CHARS = int(os.getenv('ROSTER_CONTEXT_CHARS', '6000'))
+
+kb = Knowledge()
+reload_lock = threading.Lock()  # Serialises reloaders only, never readers
+
+def artifact_signature():
+    """Cheap change detector for the watcher: mtimes of the published artifacts."""
+    sig = []
+    for p in (os.path.join(brain_dir, 'manifest.json'), timetable_index_path, syllabus_index_path):
+        try: sig.append(os.stat(p).st_mtime_ns)
+        except OSError: sig.append(None)
+    return tuple(sig)
 
 def load_brain():
-    global chunks, vectorizer, tfidf_matrix
+    """Builds a fresh Knowledge snapshot from disk (does not publish it)."""
     print("⚡ Loading AI Brain (TF-IDF Models)...")
     
-    # Load Raw Text Chunks
-    if os.path.exists(kb_path):
-        with open(kb_path, 'r', encoding='utf-8') as f:
-            chunks = json.load(f)
-    
-    # Load Mathematical Models
-    if os.path.exists(vectorizer_path) and os.path.exists(matrix_path):
-        with open(vectorizer_path, 'rb') as f: vectorizer = pickle.load(f)
-        with open(matrix_path, 'rb') as f: tfidf_matrix = pickle.load(f)
-        print(f"   ✅ Brain Loaded: {len(chunks)} knowledge nodes.")
+    # Chunks, matrix and vocabulary are all mmap'd: workers share the pages
+    try:
+        brain = brain_store.load_brain(brain_dir)
+    except Exception as e:
+        print(f"   ❌ Brain Load Error: {e}")
+        brain = None
+
+    if brain:
+        print(f"   ✅ Brain Loaded: {len(brain.chunks)} knowledge nodes (build {brain.version}).")
     else:
         print("   ⚠️ Brain missing! Run 'python backend/process_data.py' first.")
 
-load_brain()
+    # Load Structured Timetable (Room/Vacancy lookups)
+    timetable, digest = None, ''
+    try:
+        timetable = TimetableIndex.load(timetable_index_path)
+        if timetable:
+            with open(timetable_index_path, 'rb') as f: digest = hashlib.sha1(f.read()).hexdigest()[:12]
+            print(f"   ✅ Timetable Index Loaded: {len(timetable.slots)} slots.")
+    except Exception as e:
+        print(f"   ❌ Timetable Load Error: {e}")
+
+    # Load Structured Syllabus (year -> branch -> subject -> units)
+    syllabus, syllabus_digest = None, ''
+    try:
+        syllabus = SyllabusIndex.load(syllabus_index_path)
+        if syllabus:
+            with open(syllabus_index_path, 'rb') as f: syllabus_digest = hashlib.sha1(f.read()).hexdigest()[:12]
+            print(f"   ✅ Syllabus Index Loaded: {len(syllabus)} subject entries.")
+    except Exception as e:
+        print(f"   ❌ Syllabus Load Error: {e}")
+
+    return Knowledge(brain, timetable, digest, syllabus, syllabus_digest)
+
+def reload_brain():
+    """Loads a new snapshot and swaps it in. Keeps the old one if loading fails."""
+    global kb
+    with reload_lock:
+        new_kb = load_brain()
+        if not new_kb.brain and kb.brain:
+            print("   ⚠️ Reload aborted: new brain failed to load, keeping the current one.")
+            return kb
+        kb = new_kb
+        retrieval_cache.clear()
+        answer_cache.clear()
+        return kb
+
+def watch_artifacts(interval):
+    """Background poller: reloads when process_data.py publishes new artifacts."""
+    last = artifact_signature()
+    while True:
+        time.sleep(interval)
+        sig = artifact_signature()
+        if sig != last:
+            time.sleep(1)  # Let the writer finish timetable_index.json after brain/
+            last = artifact_signature()
+            print("🔄 Knowledge artifacts changed, hot-reloading...")
+            try: reload_brain()
+            except Exception as e: print(f"   ❌ Hot Reload Error: {e}")
+
+# Loaded at import: under gunicorn (preload_app) that is once in the master, and
+# the forked workers share the mmap'd pages. The watcher starts in start_worker().
+kb = load_brain()
+
+# KB_WATCH_INTERVAL=0 disables the watcher (use /admin/reload instead)
+watch_interval = float(os.getenv('KB_WATCH_INTERVAL', '30'))
 
 # --- 3. HYBRID CONTEXT RETRIEVAL ---
-def get_context(query):
-    if not vectorizer or not chunks: return ""
+# Prompt budget for the [KNOWLEDGE BASE] block (estimated tokens)
+CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', '2000'))
+CONTEXT_RULE_TOKENS = int(os.getenv('CONTEXT_RULE_TOKENS', '1500'))  # Cap for the hard-rule branch
+assembler = ContextAssembler(max_tokens=CONTEXT_MAX_TOKENS)
+
+def get_context(query, stats=None, course=None):
+    """
+    Returns the KB context for a query. If `stats` is a dict it is filled with
+    tokens/chunks used. `course` is the student's {year, branch, subject} pick.
+    """
+    if stats is None: stats = {}
+    stats.update({'strategy': 'none', 'tokens': 0, 'chunks': 0})
+
+    state = kb  # Pin one snapshot for the whole call
+    chunks, engine, timetable = state.chunks, state.engine, state.timetable
+    if not engine or not chunks: return ""
     
     q_lower = query.lower()
-    relevant_text = []
+
+    # --- STRATEGY 0: SYLLABUS LOOKUP ---
+    # "Syllabus for DBMS" / "unit 3 of OS" about one known subject: exactly
+    # that subject's units from the compiled index, no search.
+    if state.syllabus:
+        with span('syllabus_lookup'): syl_ctx = state.syllabus.lookup(query, **(course or {}))
+        if syl_ctx:
+            stats.update({'strategy': 'syllabus', 'tokens': estimate_tokens(syl_ctx), 'chunks': 1})
+            return syl_ctx
 
     # --- STRATEGY A: HARD RULES (For "Exact" Tasks) ---
-    # If user asks about Rooms/Vacancy, we dump the WHOLE timetable/room list.
-    # TF-IDF is bad at "logic puzzles", so we give it all the data to solve it.
+    # Room/Vacancy questions are answered from the structured timetable index
+    # (interval lookup), so only the matching rows reach the LLM.
     if any(w in q_lower for w in ['room', 'vacant', 'free', 'empty', 'where', 'class']):
-        # Filter chunks manually for room/timetable content
-        room_data = [c for c in chunks if '[Campus Room Inventory]' in c]
-        timetable_data = [c for c in chunks if 'Timetable' in c]
-        
-        # Return ALL room data so it can do the subtraction logic
-        return "\n".join(room_data + timetable_data)
-
-    # --- STRATEGY B: AI SEARCH (TF-IDF) ---
+        if timetable:
+            with span('timetable_lookup'): room_ctx = timetable.lookup(query)
+        else:
+            # Old index without timetable_index.json: dump everything
+            room_data = [c for c in chunks if '[Campus Room Inventory]' in c or '[Class Rooms]' in c]
+            timetable_data = [c for c in chunks if 'Timetable' in c]
+            room_ctx = "\n".join(room_data + timetable_data)
+        if room_ctx:
+            room_ctx = trim_to_tokens(room_ctx, CONTEXT_RULE_TOKENS)
+            stats.update({'strategy': 'rules', 'tokens': estimate_tokens(room_ctx)})
+            return room_ctx
+
+    # --- STRATEGY B: AI SEARCH (BM25 / TF-IDF) ---
     # For Syllabus, Faculty, General info - use Math.
+    hits = []
     try:
-        query_vec = vectorizer.transform([query])
-        similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
-        
-        # Get Top 8 Matches (Increased context for better accuracy)
-        top_indices = similarities.argsort()[-8:][::-1]
-        
-        for idx in top_indices:
-            if similarities[idx] > 0.1: # Only keep relevant stuff
-                relevant_text.append(chunks[idx])
+        # Top K matches above the ranker's threshold (inverted index, only chunks sharing a term are scored)
+        cache_key = (state.version, normalize_query(query))
+        hits = retrieval_cache.get(cache_key)
+        note(retrieval_cache='hit' if hits is not None else 'miss')
+        if hits is None:
+            with span('retrieval'):
+                # Year/branch/subject named in the question narrow the candidates first
+                where = query_filters(query, state.brain)
+                hits = engine.search(query, k=RETRIEVAL_TOP_K, where=where)
+                if not hits and where: hits = engine.search(query, k=RETRIEVAL_TOP_K)
+            retrieval_cache.set(cache_key, hits)
     except Exception as e:
         print(f"Search Error: {e}")
 
-    if not relevant_text:
+    # Best chunks first, overlapping sentences once, cut to the token budget
+    with span('assemble'): text, used = assembler.assemble(hits or [], chunks)
+    if not text:
         return "No specific data found. Answer generally."
     
-    return "\n---\n".join(relevant_text)
+    stats.update(used, strategy='search')
+    return text
+
+# --- 3.5 CONCURRENT I/O (Supabase round-trips off the critical path) ---
+# io_pool: parallel reads inside a request (roster fetch || KB retrieval)
+# history_pool: fire-and-forget conversation inserts (db.py retries the ones that never left)
+IO_POOL_SIZE = int(os.getenv('IO_POOL_SIZE', '16'))
+HISTORY_POOL_SIZE = int(os.getenv('HISTORY_POOL_SIZE', '4'))
+io_pool = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix='io')
+history_pool = ThreadPoolExecutor(max_workers=HISTORY_POOL_SIZE, thread_name_prefix='history')
+
+def insert_history(email, role, message):
+    try:
+        db.append_history(email, role, message)
+        return True
+    except Exception as e:
+        print(f"History Save Error ({email}): {e}")
+        return False
+
+def summarize_history(prompt):
+    return model.generate_content(prompt).text
+
+# Last HISTORY_KEEP messages verbatim, older ones folded into a cached summary (written on io_pool)
+history_manager = HistoryManager(summarize=summarize_history if api_key else None, pool=io_pool)
+
+def append_history(email, role, message, after=None):
+    """
+    Queues a conversations insert and returns immediately. Passing the
+    future of an earlier insert as `after` chains this one behind it, so the
+    bot reply never lands before the user's message.
+    """
+    if not (db.enabled and email): return None
+    if after is None or after.done():
+        return history_pool.submit(insert_history, email, role, message)
+
+    # Chain with a callback instead of blocking a pool thread on after.result()
+    chained = Future()
+    def submit_next(_):
+        nxt = history_pool.submit(insert_history, email, role, message)
+        nxt.add_done_callback(lambda f: chained.set_result(f.result()))
+    after.add_done_callback(submit_next)
+    return chained
+
+def fetch_roster(email, cid):
+    """Resolves the teacher's class (if not given) and loads its students (cached per class)."""
+    if not cid:
+        cid = roster_cache.get(('teacher', email))
+        if not cid:
+            cid = db.get_class_id(email)
+            if cid: roster_cache.set(('teacher', email), cid)
+    
+    students = []
+    if cid:
+        # Class ids arrive as int (DB) or str (JSON/form); one key per class
+        students = roster_cache.get(str(cid))
+        note(roster_cache='hit' if students is not None else 'miss')
+        if students is None:
+            students = db.get_roster(cid)
+            roster_cache.set(str(cid), students)
+    return cid, students
+
+# --- 3.6 INSTRUMENTATION (GET /metrics, optional per-request timing headers) ---
+# Stage spans (get_context, retrieval, llm, db.*, action...) land in cgpa_stage_seconds.
+# METRICS_DEBUG=1 + request header "X-Debug-Timing: 1" -> Server-Timing / X-Chat-Stats headers.
+METRICS_DEBUG = os.getenv('METRICS_DEBUG', '0') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # If set, /metrics needs "Authorization: Bearer <token>"
+
+REQUEST_SECONDS = metrics.REGISTRY.histogram('cgpa_request_seconds', 'Request latency per endpoint', ('endpoint',))
+REQUESTS = metrics.REGISTRY.counter('cgpa_requests_total', 'Requests per endpoint and status', ('endpoint', 'status'))
+PROMPT_TOKENS = metrics.REGISTRY.histogram('cgpa_prompt_tokens', 'Estimated system prompt tokens per chat turn', (), metrics.TOKEN_BUCKETS)
+CONTEXT_TOKENS = metrics.REGISTRY.histogram('cgpa_context_tokens', 'Estimated KB context tokens per chat turn', ('strategy',), metrics.TOKEN_BUCKETS)
+CONTEXT_CHUNKS = metrics.REGISTRY.histogram('cgpa_context_chunks', 'KB chunks sent per chat turn', ('strategy',), metrics.COUNT_BUCKETS)
+LLM_TOKENS = metrics.REGISTRY.counter('cgpa_llm_tokens_total', 'Gemini tokens from usage metadata', ('kind',))
+CHAT_REPLIES = metrics.REGISTRY.counter('cgpa_chat_replies_total', 'Chat replies by source', ('source',))
+
+@metrics.REGISTRY.collector
+def cache_metrics():
+    caches = {'retrieval': retrieval_cache, 'answer': answer_cache, 'roster': roster_cache, 'history': history_manager.cache}
+    return [
+        ('cgpa_cache_hits_total', 'counter', 'Cache lookups that hit', [({'cache': n}, c.hits) for n, c in caches.items()]),
+        ('cgpa_cache_misses_total', 'counter', 'Cache lookups that missed', [({'cache': n}, c.misses) for n, c in caches.items()]),
+        ('cgpa_cache_entries', 'gauge', 'Entries currently cached', [({'cache': n}, len(c)) for n, c in caches.items()]),
+        ('cgpa_kb_chunks', 'gauge', 'Chunks in the loaded knowledge snapshot', [({'version': kb.version}, len(kb.chunks))]),
+        ('cgpa_db_circuit_open', 'gauge', '1 while the DB circuit breaker rejects calls', [({}, int(db.breaker.state == 'open'))]),
+    ]
+
+def cached_answer(turn):
+    if not turn['answer_key']: return None
+    txt = answer_cache.get(turn['answer_key'])
+    note(answer_cache='hit' if txt is not None else 'miss')
+    if txt is not None: CHAT_REPLIES.inc(source='answer_cache')
+    return txt
+
+def record_usage(resp):
+    """Counts the prompt/output tokens Gemini reports for a reply."""
+    CHAT_REPLIES.inc(source='model')
+    try:
+        usage = resp.usage_metadata
+        prompt, output = usage.prompt_token_count or 0, usage.candidates_token_count or 0
+    except Exception:
+        return
+    LLM_TOKENS.inc(prompt, kind='prompt')
+    LLM_TOKENS.inc(output, kind='output')
+    note(llm_prompt_tokens=prompt, llm_output_tokens=output)
+
+@app.before_request
+def begin_trace():
+    metrics.start_trace(debug=METRICS_DEBUG and request.headers.get('X-Debug-Timing') == '1')
+
+@app.after_request
+def timing_headers(response):
+    g.status = response.status_code
+    trace = metrics.current_trace()
+    if trace and trace.debug:
+        response.headers['Server-Timing'] = trace.server_timing()
+        response.headers['X-Chat-Stats'] = json.dumps(trace.notes)
+    return response
+
+def observe_request(endpoint, trace, status):
+    REQUEST_SECONDS.observe(trace.elapsed(), endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=status)
+
+@app.teardown_request
+def end_trace(exc):
+    trace = metrics.current_trace()
+    if trace and not trace.deferred and request.endpoint not in (None, 'static', 'metrics_endpoint', 'healthz', 'readyz'):
+        observe_request(request.endpoint, trace, 500 if exc else g.get('status', 200))
+    metrics.end_trace()
+
+def traced_stream(body, endpoint):
+    """Wraps a streamed body so its spans land on the request trace and the request is timed to the last byte."""
+    trace = metrics.current_trace()
+    if trace: trace.deferred = True
+    def run():
+        metrics.resume_trace(trace)
+        try: yield from body
+        finally:
+            if trace: observe_request(endpoint, trace, 200)
+            metrics.end_trace()
+    return run()
 
 # --- 4. ROUTES ---
-# --- IMAGE SERVING ROUTE ---
+# --- IMAGE / STATIC SERVING (resized variants + hashed copies from build_assets.py) ---
+assets = AssetManifest(assets_manifest_path, frontend_dir)
+
 @app.route('/data/<path:filename>')
 def serve_data(filename):
-    # Defines the path to the 'data' folder in your project root
-    data_dir = os.path.join(project_root, 'data')
-    return send_from_directory(data_dir, filename)
+    return send_asset(data_dir, filename, request.headers.get('Accept-Encoding'))
+
+def serve_frontend(filename):
+    # Replaces Flask's static view: same files, plus precompressed copies and cache headers
+    return send_asset(frontend_dir, filename, request.headers.get('Accept-Encoding'), max_age=0)
+app.view_functions['static'] = serve_frontend
+
+@app.route('/assets/images')
+def asset_images():
+    resp = jsonify(assets.public_images())
+    resp.cache_control.public, resp.cache_control.max_age = True, 300
+    return resp
 
 @app.route('/')
-def home(): return render_template('index.html')
+def home():
+    resp = Response(assets.rewrite_html(render_template('index.html')), mimetype='text/html')
+    resp.cache_control.no_cache = True  # Small, and the only file that names the hashed ones
+    return resp
+
+# --- ADMIN: HOT RELOAD ---
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    token = os.getenv('ADMIN_TOKEN')
+    if not token or request.headers.get('X-Admin-Token') != token:
+        return jsonify({'success': False, 'msg': 'Forbidden'}), 403
+    state = reload_brain()
+    return jsonify({'success': True, 'version': state.version, 'chunks': len(state.chunks)})
+
+# --- PROMETHEUS SCRAPE ---
+@app.route('/metrics')
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 # --- HISTORY ROUTE ---
 @app.route('/get_history', methods=['POST'])
 def get_history():
-    if not supabase: return jsonify({'history': []})
+    if not db.enabled: return jsonify({'history': []})
     email = request.json.get('email')
-    res = supabase.table('conversations').select('*').eq('user_email', email).order('created_at', desc=False).limit(50).execute()
-    return jsonify({'history': res.data})
-
-@app.route('/chat', methods=['POST'])
-def chat():
+    try: return jsonify({'history': db.get_history(email)})
+    except Exception as e:
+        print(f"History Load Error ({email}): {e}")
+        return jsonify({'history': []})
+
+# --- CHAT PIPELINE (shared by /chat and /chat/stream) ---
+def prepare_chat(data):
+    """Everything that happens before the LLM call. Returns the turn state."""
+    msg = data.get('message', '')
+    hist = data.get('history', []) 
+    role = data.get('role', 'guest')
+    email = data.get('email', '')
+    cid = data.get('class_id')
+    # Student sidebar: selected year/branch, and the subject chip that was clicked
+    course = {k: data.get(k) for k in ('year', 'branch', 'subject') if data.get(k)}
+    
+    # 1. Save User Message (background, doesn't block the reply)
+    user_saved = append_history(email, 'user', msg)
+    
+    roster_ctx = ""
+    kb_version = kb.version
+
+    # --- TEACHER INTELLIGENCE ---
+    # Roster fetch and KB retrieval run side by side
+    roster_job = io_pool.submit(metrics.bind(fetch_roster), email, cid) if role == 'teacher' and email and db.enabled else None
+    ctx_stats = {}
+    with span('get_context'): kb_ctx = get_context(msg, ctx_stats, course)
+
+    if roster_job:
+        try:
+            with span('roster_wait'): cid, students = roster_job.result()
+            if cid:
+                # Only the columns this question needs, capped at ROSTER_CONTEXT_CHARS
+                roster_ctx = encode_roster(students, roster_intent(msg, students), ROSTER_CONTEXT_CHARS)
+        except Exception as e:
+            # DB down: still answer from the KB, just without class data
+            print(f"Roster Fetch Error ({email}): {e}")
+            roster_ctx = "[CLASS ROSTER] Unavailable right now (database not reachable). Do not output attendance actions.\n"
+    
+    # --- STRICT SYSTEM PROMPT ---
+    sys_prompt = f"""
+    You are the Faculty of Technology (FoT) Campus AI (C.G.P.A).
+    
+    [KNOWLEDGE BASE]
+    {kb_ctx}
+    
+    [TEACHER DATA]
+    {roster_ctx}
+    
+    [STRICT PROTOCOLS]
+    1. **Syllabus/Rooms:** Use Knowledge Base.
+    
+    2. **Mark Attendance (Specific):** If ids are clear (e.g. "Mark 101, 102"), output: 
+       {{ "action": "update_attendance", "ids": ["101", "102"], "status": "Present", "date": "YYYY-MM-DD" }}
+    
+    3. **Mark Attendance (Pattern):** If asked to mark by pattern (e.g. "Name starts with K", "Roll ends with 77", "Contains Singh"):
+       Output: {{ 
+         "action": "update_attendance", 
+         "status": "Present", 
+         "date": "YYYY-MM-DD",
+         "pattern": {{ "field": "name" or "id", "type": "startswith" or "endswith" or "contains", "value": "77" }}
+       }}
+
+    4. **Data Analysis (Read Only):** If asked to filter/show students (e.g. "attendance < 50%", "marks > 8", "show record for Yash"):
+       Output: {{ 
+         "action": "analyze_data", 
+         "search_name": "optional_name", 
+         "filter_type": "attendance" or "marks", 
+         "operator": ">" or "<" or ">=" or "<=" or "==", 
+         "value": 50 
+       }}
+
+    5. **General Info:** If not in KB/Data, say "I don't have that information."
+    """
+
+    # Temperature 0.0 => same prompt + same message gives the same reply,
+    # so first-turn guest/student answers can be served from cache.
+    ctx_stats['prompt_tokens'] = estimate_tokens(sys_prompt)
+    PROMPT_TOKENS.observe(ctx_stats['prompt_tokens'])
+    CONTEXT_TOKENS.observe(ctx_stats['tokens'], strategy=ctx_stats['strategy'])
+    CONTEXT_CHUNKS.observe(ctx_stats['chunks'], strategy=ctx_stats['strategy'])
+    note(**{k: ctx_stats[k] for k in ('strategy', 'chunks', 'tokens', 'prompt_tokens')})
+
+    answer_key = None
+    if role in ('guest', 'student') and not roster_ctx and not hist:
+        answer_key = (kb_version, text_hash(sys_prompt, normalize_query(msg)))
+
+    return {'msg': msg, 'hist': hist, 'email': email, 'cid': cid, 'sys_prompt': sys_prompt,
+            'answer_key': answer_key, 'user_saved': user_saved, 'context_stats': ctx_stats}
+
+def start_llm_chat(turn):
+    """System prompt goes in as the real system instruction; history is bounded by history_manager."""
+    with span('history'): summary, recent = history_manager.build(turn['hist'])
+    system = turn['sys_prompt']
+    if summary: system += f"\n    [CONVERSATION SO FAR]\n    {summary}\n"
+    note(history_sent=len(recent), history_total=len(turn['hist']), history_summary_tokens=estimate_tokens(summary))
+
+    ghist = [{"role": "user" if m['isUser'] else "model", "parts": [m['text']]} for m in recent]
+    return make_model(system).start_chat(history=ghist)
+
+def finish_chat(turn, txt, cmd=None):
+    """Caches/saves the reply and runs its action (parsed from txt unless given). Returns the text to show."""
+    cmd = cmd or extract_action(txt)
+    if turn['answer_key'] and not cmd: answer_cache.set(turn['answer_key'], txt)
+
+    # 2. Save Bot Response (background, ordered after the user message)
+    save_text = "✅ Executing Action..." if cmd else txt
+    append_history(turn['email'], 'model', save_text, after=turn['user_saved'])
+
+    action_reply = None
+    if cmd:
+        with span('action'): action_reply = handle_action(cmd, turn['cid'])
+    return action_reply if action_reply is not None else txt
+
+# --- FAST PATH (routine teacher commands, no LLM round trip) ---
+def fast_path(data):
+    """
+    Parses "mark 101, 102 present" / "attendance < 50%" style commands
+    locally. Returns (turn, cmd), or None to use the model: not a teacher,
+    not a command the grammar covers, or ids/names the roster can't resolve
+    unambiguously.
+    """
+    msg, email = data.get('message', ''), data.get('email', '')
+    if data.get('role') != 'teacher' or not (email and db.enabled): return None
+    with span('intent_parse'): cmd = parse_command(msg, today=campus_now().date())
+    if not cmd: return None
+
+    try: cid, students = fetch_roster(email, data.get('class_id'))
+    except Exception as e:
+        print(f"Roster Fetch Error ({email}): {e}")
+        return None
+    if not cid or not resolves(cmd, students): return None
+
+    note(fast_path=cmd['action'])
+    CHAT_REPLIES.inc(source='fast_path')
+    turn = {'msg': msg, 'hist': data.get('history', []), 'email': email, 'cid': cid, 'answer_key': None,
+            'user_saved': append_history(email, 'user', msg)}
+    return turn, cmd
+
+# --- ACTION HANDLER ---
+def handle_action(cmd, cid):
+    """Executes an action dict (from the model or the fast path). Returns None if there is nothing to do."""
     try:
-        data = request.json
-        msg = data.get('message', '')
-        hist = data.get('history', []) 
-        role = data.get('role', 'guest')
-        email = data.get('email', '')
-        cid = data.get('class_id')
-        
-        # 1. Save User Message
-        if supabase and email:
-            supabase.table('conversations').insert({'user_email': email, 'role': 'user', 'message': msg}).execute()
+        note(action=cmd.get('action'))
         
-        roster_ctx = ""
-        
-        # --- TEACHER INTELLIGENCE ---
-        if role == 'teacher' and email and supabase:
-            if not cid:
-                c = supabase.table('classes').select('id').eq('teacher_email', email).limit(1).execute()
-                if c.data: cid = c.data[0]['id']
+        # =====================================================
+        # ACTION 1: UPDATE ATTENDANCE (WRITE)
+        # =====================================================
+        if cid and cmd.get('action') == 'update_attendance':
+            status = cmd.get('status', 'Present')
+            date = cmd.get('date')
             
-            if cid:
-                st = supabase.table('students').select('*').eq('class_id', cid).execute()
-                s_list = "\n".join([f"ID: {s['student_id']} | Name: {s['name']} | Data: {s['details']}" for s in st.data])
-                roster_ctx = f"[CLASS ROSTER & DATA]\n{s_list}\n"
-
-        kb_ctx = get_context(msg)
-        
-        # --- STRICT SYSTEM PROMPT ---
-        sys_prompt = f"""
-        You are the Faculty of Technology (FoT) Campus AI (C.G.P.A).
-        
-        [KNOWLEDGE BASE]
-        {kb_ctx}
-        
-        [TEACHER DATA]
-        {roster_ctx}
-        
-        [STRICT PROTOCOLS]
-        1. **Syllabus/Rooms:** Use Knowledge Base.
-        
-        2. **Mark Attendance (Specific):** If ids are clear (e.g. "Mark 101, 102"), output: 
-           {{ "action": "update_attendance", "ids": ["101", "102"], "status": "Present", "date": "YYYY-MM-DD" }}
-        
-        3. **Mark Attendance (Pattern):** If asked to mark by pattern (e.g. "Name starts with K", "Roll ends with 77", "Contains Singh"):
-           Output: {{ 
-             "action": "update_attendance", 
-             "status": "Present", 
-             "date": "YYYY-MM-DD",
-             "pattern": {{ "field": "name" or "id", "type": "startswith" or "endswith" or "contains", "value": "77" }}
-           }}
-
-        4. **Data Analysis (Read Only):** If asked to filter/show students (e.g. "attendance < 50%", "marks > 8", "show record for Yash"):
-           Output: {{ 
-             "action": "analyze_data", 
-             "search_name": "optional_name", 
-             "filter_type": "attendance" or "marks", 
-             "operator": ">" or "<" or ">=" or "<=" or "==", 
-             "value": 50 
-           }}
-
-        5. **General Info:** If not in KB/Data, say "I don't have that information."
-        """
-
-        ghist = [{"role": "user", "parts": ["System Instruction: " + sys_prompt]}]
-        for m in hist:
-            ghist.append({"role": "user" if m['isUser'] else "model", "parts": [m['text']]})
-        
-        chat_session = model.start_chat(history=ghist)
-        resp = chat_session.send_message(msg)
-        txt = resp.text.strip()
-
-        # 2. Save Bot Response
-        if supabase and email:
-            save_text = txt
-            if '"action":' in txt: save_text = "✅ Executing Action..."
-            supabase.table('conversations').insert({'user_email': email, 'role': 'model', 'message': save_text}).execute()
-
-        # --- ACTION HANDLER ---
-        if '"action":' in txt:
-            try:
-                clean = txt.replace('```json','').replace('```','').strip()
-                cmd = json.loads(clean)
-                
-                # =====================================================
-                # ACTION 1: UPDATE ATTENDANCE (WRITE)
-                # =====================================================
-                if cid and cmd.get('action') == 'update_attendance':
-                    status = cmd.get('status', 'Present')
-                    date = cmd.get('date')
-                    
-                    # Fetch Roster
-                    st_data = supabase.table('students').select('student_id, name').eq('class_id', cid).execute().data
-                    valid_map = {str(s['student_id']): s['name'] for s in st_data}
-                    
-                    target_ids = []
-
-                    # Case A: Specific IDs provided
-                    if 'ids' in cmd:
-                        raw_ids = [str(i) for i in cmd.get('ids', [])]
-                        for tid in raw_ids:
-                            # Match substring ID to full ID
-                            matched_id = next((k for k in valid_map.keys() if k.endswith(tid)), None)
-                            if matched_id: target_ids.append(matched_id)
-
-                    # Case B: Pattern Matching provided
-                    elif 'pattern' in cmd:
-                        p = cmd['pattern']
-                        p_type = p.get('type')
-                        p_val = p.get('value', '').lower()
-                        p_field = p.get('field') # 'name' or 'id'
-
-                        for full_id, full_name in valid_map.items():
-                            check_val = full_name.lower() if p_field == 'name' else full_id.lower()
-                            
-                            match = False
-                            if p_type == 'startswith' and check_val.startswith(p_val): match = True
-                            elif p_type == 'endswith' and check_val.endswith(p_val): match = True
-                            elif p_type == 'contains' and p_val in check_val: match = True
-                            
-                            if match: target_ids.append(full_id)
-
-                    if not target_ids:
-                        return jsonify({'response': f"❌ No students found matching your criteria.", 'success': True})
-
-                    # Update DB for all matches
-                    updated_names = []
-                    for sid in target_ids:
-                        supabase.table('attendance_records').upsert({
-                            "student_id": sid, "class_id": cid, 
-                            "date": date, "status": status
-                        }, on_conflict="student_id, class_id, date").execute()
-                        updated_names.append(valid_map[sid])
-                    
-                    count = len(updated_names)
-                    # If list is too long, summarize
-                    if count > 5:
-                        msg_out = f"✅ Marked **{status}** for **{count} students** (including {updated_names[0]}, {updated_names[1]}...)"
-                    else:
-                        msg_out = f"✅ Marked **{status}** for: {', '.join(updated_names)}"
-
-                    return jsonify({'response': msg_out, 'success': True})
-
-                # =====================================================
-                # ACTION 2: ANALYZE DATA (READ / FILTER / REPORT)
-                # =====================================================
-                elif cid and cmd.get('action') == 'analyze_data':
-                    f_type = cmd.get('filter_type', 'attendance')
-                    operator = cmd.get('operator')
-                    val = cmd.get('value')
-                    search_name = cmd.get('search_name', '').lower()
-
-                    students = supabase.table('students').select('*').eq('class_id', cid).execute().data
-                    records = supabase.table('attendance_records').select('*').eq('class_id', cid).execute().data
-                    
-                    unique_dates = set(r['date'] for r in records)
-                    global_total = len(unique_dates)
+            # Fetch Roster
+            st_data = db.get_roster(cid, 'student_id, name')
+            valid_map = {str(s['student_id']): s['name'] for s in st_data}
+            
+            target_ids = []
+
+            # Case A: Specific IDs provided
+            if 'ids' in cmd:
+                raw_ids = [str(i) for i in cmd.get('ids', [])]
+                for tid in raw_ids:
+                    # Match substring ID to full ID
+                    matched_id = next((k for k in valid_map.keys() if k.endswith(tid)), None)
+                    if matched_id: target_ids.append(matched_id)
+
+            # Case B: Pattern Matching provided
+            elif 'pattern' in cmd:
+                p = cmd['pattern']
+                p_type = p.get('type')
+                p_val = p.get('value', '').lower()
+                p_field = p.get('field') # 'name' or 'id'
+
+                for full_id, full_name in valid_map.items():
+                    check_val = full_name.lower() if p_field == 'name' else full_id.lower()
                     
-                    master_data = []
+                    match = False
+                    if p_type == 'startswith' and check_val.startswith(p_val): match = True
+                    elif p_type == 'endswith' and check_val.endswith(p_val): match = True
+                    elif p_type == 'contains' and p_val in check_val: match = True
                     
-                    for s in students:
-                        # Attendance Calc
-                        present_count = sum(1 for r in records if r['student_id'] == s['student_id'] and r['status'] == 'Present')
-                        att_pct = round((present_count / global_total * 100), 1) if global_total > 0 else 0.0
-                        
-                        # Marks Calc
-                        marks = 0
-                        if s['details'] and isinstance(s['details'], dict):
-                            for k, v in s['details'].items():
-                                if isinstance(v, (int, float)):
-                                    marks = v
-                                    break
-                        
-                        master_data.append({ "name": s['name'], "id": s['student_id'], "attendance": att_pct, "present": present_count, "marks": marks })
-
-                    filtered_list = []
-                    for item in master_data:
-                        if search_name and search_name not in item['name'].lower(): continue
-                        
-                        if operator and val is not None:
-                            target = item['attendance'] if f_type == 'attendance' else item['marks']
-                            try:
-                                v = float(val)
-                                if operator == '>' and not (target > v): continue
-                                if operator == '<' and not (target < v): continue
-                                if operator == '>=' and not (target >= v): continue
-                                if operator == '<=' and not (target <= v): continue
-                                if operator == '==' and not (target == v): continue
-                            except: pass
-                        
-                        filtered_list.append(item)
-
-                    if not filtered_list:
-                        return jsonify({'response': "No students matched your criteria.", 'success': True})
-
-                    if f_type == 'marks':
-                        table = "| Name | Roll ID | Marks |\n|:---|:---|:---:|\n"
-                        for i in filtered_list: table += f"| {i['name']} | {i['id']} | **{i['marks']}** |\n"
-                    else:
-                        table = "| Name | Roll ID | Present | Total | % |\n|:---|:---|:---:|:---:|:---:|\n"
-                        for i in filtered_list: table += f"| {i['name']} | {i['id']} | {i['present']} | {global_total} | **{i['attendance']}%** |\n"
-
-                    return jsonify({'response': f"### Analysis Report\n{table}", 'success': True})
-
-            except Exception as e:
-                print(f"JSON Action Error: {e}")
-
-        return jsonify({'response': txt, 'success': True})
+                    if match: target_ids.append(full_id)
+
+            if not target_ids:
+                return f"❌ No students found matching your criteria."
+
+            # Update DB for all matches (batched: one round-trip per UPSERT_BATCH_SIZE rows)
+            target_ids = list(dict.fromkeys(target_ids))  # Same row twice in one upsert is rejected by Postgres
+            rows = [{"student_id": sid, "class_id": cid, "date": date, "status": status} for sid in target_ids]
+            saved, failed = db.bulk_upsert_attendance(rows)
+            roster_cache.pop(str(cid))
+            updated_names = [valid_map[r['student_id']] for r in saved]
+            
+            count = len(updated_names)
+            # If list is too long, summarize
+            if count > 5:
+                msg_out = f"✅ Marked **{status}** for **{count} students** (including {updated_names[0]}, {updated_names[1]}...)"
+            elif count:
+                msg_out = f"✅ Marked **{status}** for: {', '.join(updated_names)}"
+            else:
+                msg_out = f"❌ Could not mark **{status}** for any student."
+
+            if failed:
+                msg_out += f"\n\n⚠️ Failed for {len(failed)} student(s):\n"
+                msg_out += "\n".join(f"- {valid_map[r['student_id']]} ({r['student_id']}): {err}" for r, err in failed[:10])
+                if len(failed) > 10: msg_out += f"\n- ...and {len(failed) - 10} more"
+
+            return msg_out
+
+        # =====================================================
+        # ACTION 2: ANALYZE DATA (READ / FILTER / REPORT)
+        # =====================================================
+        elif cid and cmd.get('action') == 'analyze_data':
+            f_type = cmd.get('filter_type', 'attendance')
+            operator = cmd.get('operator')
+            val = cmd.get('value')
+            search_name = cmd.get('search_name', '').lower()
+
+            students = db.get_roster(cid)
+            records = db.get_attendance(cid)
+            
+            # Group-by once, then filter with vectorised masks
+            with span('analytics'):
+                table_df, global_total = attendance_table(students, records)
+                filtered_list = filter_table(table_df, search_name, f_type, operator, val).to_dict('records')
+
+            if not filtered_list:
+                return "No students matched your criteria."
+
+            if f_type == 'marks':
+                table = "| Name | Roll ID | Marks |\n|:---|:---|:---:|\n"
+                for i in filtered_list: table += f"| {i['name']} | {i['id']} | **{i['marks']}** |\n"
+            else:
+                table = "| Name | Roll ID | Present | Total | % |\n|:---|:---|:---:|:---:|:---:|\n"
+                for i in filtered_list: table += f"| {i['name']} | {i['id']} | {i['present']} | {global_total} | **{i['attendance']}%** |\n"
+
+            return f"### Analysis Report\n{table}"
+
+    except DBUnavailable as e:
+        return f"⚠️ {e}. Please try again in a minute."
+    except Exception as e:
+        print(f"JSON Action Error: {e}")
+
+    return None
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    try:
+        fast = fast_path(request.json)
+        if fast:
+            turn, cmd = fast
+            return jsonify({'response': finish_chat(turn, '', cmd), 'success': True})
+
+        turn = prepare_chat(request.json)
+
+        txt = cached_answer(turn)
+        if txt is None:
+            with span('llm'): resp = start_llm_chat(turn).send_message(turn['msg'])
+            record_usage(resp)
+            txt = resp.text.strip()
+
+        return jsonify({'response': finish_chat(turn, txt), 'success': True})
 
     except Exception as e:
         print(traceback.format_exc())
         return jsonify({'response': f"Server Error: {str(e)}", 'success': False})
 
+# --- STREAMING CHAT (Server-Sent Events) ---
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def done_event(response):
+    done = {'response': response, 'success': True}
+    trace = metrics.current_trace()
+    if trace and trace.debug: done['timing'] = trace.summary()  # Headers are already sent
+    return sse('done', done)
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Same pipeline as /chat, but forwards model tokens as they arrive:
+      event: delta  {"text": "..."}                 (plain-text replies only)
+      event: done   {"response": "...", "success": true}
+    Replies that start like a JSON action are buffered, and the action result
+    is sent in the final `done` event.
+    """
+    data = request.json
+
+    def generate():
+        try:
+            fast = fast_path(data)
+            if fast:
+                turn, cmd = fast
+                yield done_event(finish_chat(turn, '', cmd))
+                return
+
+            turn = prepare_chat(data)
+
+            txt = cached_answer(turn)
+            if txt is not None:
+                yield sse('delta', {'text': txt})
+            else:
+                parts = []
+                streaming = None  # Undecided until the first non-blank text arrives
+                t0 = time.perf_counter()
+                resp = start_llm_chat(turn).send_message(turn['msg'], stream=True)
+                for chunk in resp:
+                    try: piece = chunk.text or ''
+                    except ValueError: piece = ''  # Chunks with no text parts (e.g. finish reason only)
+                    if piece and not parts: record('llm_first_token', time.perf_counter() - t0)
+                    parts.append(piece)
+
+                    if streaming is None:
+                        head = ''.join(parts).lstrip()
+                        if not head: continue
+                        streaming = not head.startswith(('{', '`'))
+                        if streaming: yield sse('delta', {'text': head})
+                    elif streaming and piece:
+                        yield sse('delta', {'text': piece})
+                record('llm', time.perf_counter() - t0)
+                record_usage(resp)
+                txt = ''.join(parts).strip()
+
+            yield done_event(finish_chat(turn, txt))
+
+        except Exception as e:
+            print(traceback.format_exc())
+            yield sse('done', {'response': f"Server Error: {str(e)}", 'success': False})
+
+    return Response(stream_with_context(traced_stream(generate(), 'chat_stream')), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --- 5. ROSTER UPLOAD ---
+ROSTER_CSV_CHUNK_ROWS = int(os.getenv('ROSTER_CSV_CHUNK_ROWS', '2000'))
+
+def detect_roster_columns(columns):
+    roll_col = next((c for c in columns if 'roll' in c or 'id' in c), None)
+    name_col = next((c for c in columns if 'name' in c or 'student' in c), None)
+    return roll_col, name_col
+
+def roster_records(df, roll_col, name_col, class_id, teacher_email):
+    """
+    Columnar clean-up of one DataFrame (or CSV chunk): normalise ids/names,
+    drop blanks, dedupe and build the upsert payload in one pass.
+    """
+    ids = df[roll_col].astype('string').str.strip().str.replace(r'\.0$', '', regex=True)
+    names = df[name_col].astype('string').str.strip()
+
+    keep = ids.notna() & (ids != '') & names.notna() & (names != '')
+    ids, names = ids[keep], names[keep]
+
+    # Postgres rejects the same row twice in one upsert. Across CSV chunks the
+    # later upsert simply overwrites, so the last row in the file always wins.
+    dup = ids.duplicated(keep='last')
+    ids, names = ids[~dup], names[~dup]
+
+    return [{"student_id": sid, "name": sname, "class_id": class_id,
+             "teacher_email": teacher_email, "details": {"Attendance": "0%"}}
+            for sid, sname in zip(ids.tolist(), names.tolist())]
+
 @app.route('/upload_smart_roster', methods=['POST'])
 def upload_smart_roster():
-    if not supabase: return jsonify({'success': False, 'msg': 'DB Error'})
+    if not db.enabled: return jsonify({'success': False, 'msg': 'DB Error'})
     
     try:
         file = request.files['file']
@@ -372,89 +833,153 @@ def upload_smart_roster():
 
         if not file or not class_id: return jsonify({'success': False, 'msg': 'Missing data'})
 
+        # CSVs are streamed in chunks so big department sheets never sit in memory whole.
+        # dtype=str keeps roll numbers exactly as typed (leading zeros, no 1.0 floats).
         if file.filename.endswith('.csv'):
-            df = pd.read_csv(file)
+            frames = pd.read_csv(file.stream, dtype=str, chunksize=ROSTER_CSV_CHUNK_ROWS)
         else:
-            df = pd.read_excel(file)
+            with span('roster_upload.read'): frames = [pd.read_excel(file, dtype=str)]
+
+        uploaded, failed = set(), []  # Ids, so a student repeated across chunks counts once
+        roll_col = name_col = None
 
-        df.columns = [c.lower().strip() for c in df.columns]
-        roll_col = next((c for c in df.columns if 'roll' in c or 'id' in c), None)
-        name_col = next((c for c in df.columns if 'name' in c or 'student' in c), None)
+        for df in frames:
+            df.columns = [str(c).lower().strip() for c in df.columns]
+            if roll_col is None:
+                roll_col, name_col = detect_roster_columns(df.columns)
+                if not roll_col or not name_col:
+                    return jsonify({'success': False, 'msg': 'Columns "Roll Number" and "Name" not found.'})
 
-        if not roll_col or not name_col:
-            return jsonify({'success': False, 'msg': 'Columns "Roll Number" and "Name" not found.'})
+            with span('roster_upload.clean'): records = roster_records(df, roll_col, name_col, class_id, teacher_email)
+            saved, bad = db.upsert_students(records)
+            uploaded.update(r['student_id'] for r in saved)
+            failed.extend(bad)
 
-        count = 0
-        for _, row in df.iterrows():
-            sid = str(row[roll_col])
-            sname = str(row[name_col])
-            supabase.table('students').upsert({
-                "student_id": sid, "name": sname, "class_id": class_id,
-                "teacher_email": teacher_email, "details": {"Attendance": "0%"}
-            }, on_conflict="class_id, student_id").execute()
-            count += 1
+        count = len(uploaded)
+        roster_cache.pop(str(class_id))
+        note(rows=count, failed=len(failed))
 
-        return jsonify({'success': True, 'count': count, 'msg': f'Uploaded {count} students.'})
+        msg = f'Uploaded {count} students.'
+        if failed: msg += f' {len(failed)} rows failed (e.g. {failed[0][0]["student_id"]}: {failed[0][1]}).'
+        return jsonify({'success': True, 'count': count, 'failed': len(failed), 'msg': msg})
 
     except Exception as e:
         return jsonify({'success': False, 'msg': str(e)})
 
-# --- UTILS: FULL SUBJECT MAP ---
-SUBJECT_MAP = {
-    "First Year": {
-        "CSE": ["FCP (Programming)", "Mathematics-I", "IEEE / Physics", "Mathematics-II", "Data Structures", "Physics / IEEE"],
-        "ECE": ["FCP (Programming)", "Mathematics-I", "IEEE / Physics", "Mathematics-II", "Data Structures", "Physics / IEEE"],
-        "EE":  ["FCP (Programming)", "Mathematics-I", "IEEE / Physics", "Mathematics-II", "Data Structures", "Physics / IEEE"]
-    },
-    "Second Year": {
-        "CSE": ["ADA (Algorithms)", "Digital System Design", "DBMS", "Operating Systems (OS)", "Software Engineering", "Computer System Arch."],
-        "ECE": ["Electronic Devices", "Network Analysis", "Digital Electronics", "Signals & Systems", "Electromagnetic Theory", "Linear Integrated Circuits"],
-        "EE":  ["Network Analysis", "Electrical Machines-I", "Analog & Digital Circuits", "Electrical Machines-II", "Power Trans. & Dist.", "Electrical Measurements"]
-    },
-    "Third Year": {
-        "CSE": ["Theory of Computation", "AI & Machine Learning", "Computer Networks", "Cybersecurity", "Cloud Computing", "Software Project Mgmt"],
-        "ECE": ["Control Systems", "Digital Signal Processing", "Analog Communication", "CMOS VLSI Design", "Embedded Systems", "Digital Communication"],
-        "EE":  ["Power System Analysis", "Control Systems", "Electromagnetic Fields", "Switchgear & Protection", "Embedded Systems", "Power Electronics"]
-    }
-}
-
+# --- SUBJECTS & SYLLABUS (compiled from the syllabus files by process_data.py) ---
 @app.route('/get_subjects_dynamic', methods=['POST'])
 def get_subjects_dynamic():
     try:
         data = request.json
         year = data.get('year')
         branch = data.get('branch')
-        subjects = SUBJECT_MAP.get(year, {}).get(branch, [])
+        subjects = kb.syllabus.subjects(year, branch) if kb.syllabus else []
         if not subjects: return jsonify({'subjects': [f"No data for {year} {branch}"]})
-        return jsonify({'subjects': subjects})
+        return jsonify({'subjects': [s['name'] for s in subjects],
+                        'details': [{k: s[k] for k in ('name', 'code', 'kind', 'semesters', 'credits')} for s in subjects]})
     except Exception as e:
         return jsonify({'subjects': []})
 
+@app.route('/syllabus')
+def syllabus_lookup():
+    """?year=2&branch=CSE -> subject list; add &subject=DBMS (name, code or acronym) -> its units."""
+    index = kb.syllabus
+    year, branch, subject = request.args.get('year'), request.args.get('branch'), request.args.get('subject')
+    if not index: return jsonify({'success': False, 'msg': 'Syllabus index not built'}), 503
+    if not (parse_year(year) and branch):
+        return jsonify({'success': True, 'years': {y: YEAR_LABELS.get(y, y) for y in index.years},
+                        'branches': sorted({b for bs in index.years.values() for b in bs})})
+    if subject:
+        found = index.get(year, branch, subject)
+        if not found: return jsonify({'success': False, 'msg': f"No subject '{subject}' for {year} {branch}"}), 404
+        resp = jsonify({'success': True, 'subject': found})
+    else:
+        resp = jsonify({'success': True, 'subjects': [{k: s[k] for k in ('name', 'code', 'kind', 'semesters', 'credits')}
+                                                      for s in index.subjects(year, branch)]})
+    resp.cache_control.public, resp.cache_control.max_age = True, 300
+    return resp
+
 @app.route('/login', methods=['POST'])
 def login(): return jsonify({'success': True, 'email': request.json.get('email')})
 
 @app.route('/get_classes', methods=['POST'])
 def get_classes():
-    if not supabase: return jsonify({'classes': []})
-    res = supabase.table('classes').select('*').eq('teacher_email', request.json.get('email')).execute()
-    return jsonify({'classes': res.data})
+    if not db.enabled: return jsonify({'classes': []})
+    try: return jsonify({'classes': db.get_classes(request.json.get('email'))})
+    except Exception as e:
+        print(f"Classes Load Error: {e}")
+        return jsonify({'classes': [], 'msg': str(e)})
 
 @app.route('/get_students', methods=['POST'])
 def get_students():
-    if not supabase: return jsonify({'students': []})
-    res = supabase.table('students').select('*').eq('teacher_email', request.json.get('email')).execute()
-    return jsonify({'students': res.data})
+    if not db.enabled: return jsonify({'students': []})
+    try: return jsonify({'students': db.get_teacher_students(request.json.get('email'))})
+    except Exception as e:
+        print(f"Students Load Error: {e}")
+        return jsonify({'students': [], 'msg': str(e)})
 
 @app.route('/create_class', methods=['POST'])
 def create_class():
-    if supabase: supabase.table('classes').insert(request.json).execute()
+    try:
+        if db.enabled: db.create_class(request.json)
+    except Exception as e:
+        return jsonify({'success': False, 'msg': str(e)})
+    roster_cache.pop(('teacher', request.json.get('email')))
     return jsonify({'success': True})
 
 @app.route('/delete_student', methods=['POST'])
 def delete_student():
-    if supabase: supabase.table('students').delete().eq('student_id', request.json.get('id')).execute()
+    try:
+        if db.enabled: db.delete_student(request.json.get('id'))
+    except Exception as e:
+        return jsonify({'success': False, 'msg': str(e)})
+    roster_cache.clear()  # The id alone doesn't say which class it belonged to
     return jsonify({'success': True})
 
+# --- 6. SERVER LIFECYCLE (python app.py, or gunicorn -c gunicorn.conf.py) ---
+# Threads and open sockets don't survive fork(), so everything that owns one
+# is (re)created per process here. gunicorn.conf.py sets GUNICORN_PRELOAD=1,
+# imports this module once in the master and calls start_worker() from
+# post_fork in every worker; plain `python app.py` starts it right away.
+worker_pid = None
+started_at = time.time()
+
+def start_worker():
+    global io_pool, history_pool, worker_pid, started_at
+    if worker_pid == os.getpid(): return
+    if worker_pid is not None or os.getenv('GUNICORN_PRELOAD') == '1':
+        io_pool = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix='io')
+        history_pool = ThreadPoolExecutor(max_workers=HISTORY_POOL_SIZE, thread_name_prefix='history')
+        history_manager.pool = io_pool
+        db.client = connect_supabase()  # Own keep-alive pool per worker
+    worker_pid, started_at = os.getpid(), time.time()
+    if watch_interval > 0:
+        threading.Thread(target=watch_artifacts, args=(watch_interval,), daemon=True).start()
+
+def stop_worker():
+    # Graceful shutdown: let queued conversation inserts reach Supabase
+    history_pool.shutdown(wait=True)
+    io_pool.shutdown(wait=False, cancel_futures=True)
+
+# --- HEALTH CHECKS ---
+@app.route('/healthz')
+def healthz():
+    # Liveness: the worker answers requests
+    return jsonify({'status': 'ok', 'pid': os.getpid(), 'uptime': round(time.time() - started_at, 1)})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: the index is loaded. A down database only degrades teacher features.
+    state = kb
+    ready = state.brain is not None
+    body = {'ready': ready, 'pid': os.getpid(), 'kb_version': state.version, 'chunks': len(state.chunks),
+            'timetable': state.timetable is not None, 'llm': bool(api_key),
+            'db': 'disabled' if not db.enabled else db.breaker.state}
+    return jsonify(body), 200 if ready else 503
+
+if os.getenv('GUNICORN_PRELOAD') != '1':
+    start_worker()
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5001))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,279 @@
+import os
+import re
+import glob
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+# --- ON-DISK "BRAIN" FORMAT ---
+# brain/
+#   manifest.json      format version, build id, shapes, analyzer settings
+#   data.npy           CSR values   (float32, rows are L2-normalised TF-IDF)
+#   indices.npy        CSR columns  (int32)
+#   indptr.npy         CSR row ptrs (int32)
+#   idf.npy            IDF weight per term (float32)
+#   vocab.npy          sorted term table, column i == vocab[i]
+#   post_ptr.npy       inverted index: term t's postings are [post_ptr[t], post_ptr[t+1])
+#   post_docs.npy      posting list chunk ids (int32, ascending per term)
+#   post_data.npy      posting list weights (float32, same values as data.npy)
+#   chunks.bin         UTF-8 chunk text, concatenated
+#   chunk_offsets.npy  byte offsets into chunks.bin (len = n_chunks + 1)
+#   meta_<field>.npy   per-chunk metadata code (int16, -1 = unknown) into
+#                      manifest["metadata"][field] (source/type/year/branch/subject)
+#   post_tf.npy        BM25: raw term counts, aligned with post_docs
+#   post_hf.npy        BM25: counts inside the chunk's heading line (field boost)
+#   doc_len.npy        BM25: tokens per chunk
+#   char_*.npy         character n-gram channel (char_wb 3-4 grams): vocab, idf,
+#                      ptr/docs/data postings - matches codes like "DSC-9" or "UK"
+#
+# Everything is opened with mmap, so gunicorn workers share the same pages
+# through the OS page cache and nothing depends on sklearn's pickle format.
+FORMAT_VERSION = 4
+READABLE_VERSIONS = (2, 3, 4)  # v2 = no metadata, v3 = no BM25/char channel
+CHAR_NGRAMS = (3, 4)
+
+def char_wb_ngrams(text, lo=CHAR_NGRAMS[0], hi=CHAR_NGRAMS[1]):
+    """Same n-grams as sklearn's analyzer='char_wb' (lowercased, words padded with spaces)."""
+    grams = []
+    for w in text.lower().split():
+        w = f" {w} "
+        for n in range(lo, hi + 1):
+            if len(w) <= n:
+                grams.append(w)
+                break
+            grams.extend(w[i:i + n] for i in range(len(w) - n + 1))
+    return grams
+
+class ChunkStore:
+    """Read-only list-like view over chunks.bin + chunk_offsets.npy."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self): raise IndexError(i)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)): yield self[i]
+
+class Brain:
+    """A loaded index: chunk text, TF-IDF matrix and a query vectorizer."""
+
+    def __init__(self, path, manifest, chunks, matrix, vocab, idf, postings, meta_codes=None, bm25=None, char=None):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['build_id']
+        self.chunks = chunks
+        self.matrix = matrix
+        self.postings = postings  # CSC view of `matrix`: term -> (chunk ids, weights)
+        self.vocab = vocab
+        self.idf = idf
+        self.meta_values = manifest.get('metadata', {})  # field -> [value, ...]
+        self.meta_codes = meta_codes or {}                # field -> int16 code per chunk
+        self.bm25 = bm25  # (post_tf, post_hf, doc_len) or None on older brains
+        self.char = char  # (vocab, idf, ptr, docs, data) or None on older brains
+        self.stop_words = frozenset(manifest['analyzer']['stop_words'])
+        self.token_re = re.compile(manifest['analyzer']['token_pattern'])
+
+    def chunk_meta(self, i):
+        meta = {}
+        for field, codes in self.meta_codes.items():
+            c = int(codes[i])
+            meta[field] = self.meta_values[field][c] if c >= 0 else None
+        return meta
+
+    def match(self, where):
+        """
+        Boolean mask of chunks whose metadata agrees with `where` ({field: value}).
+        Chunks with no value for a field (e.g. first-year subjects have no
+        branch) still match. Returns None if nothing can be filtered.
+        """
+        mask = None
+        for field, value in (where or {}).items():
+            if field not in self.meta_codes or value is None: continue
+            values = self.meta_values[field]
+            code = values.index(value) if value in values else -2
+            codes = self.meta_codes[field]
+            m = (codes == code) | (codes == -1)
+            mask = m if mask is None else mask & m
+        return mask
+
+    def analyze(self, text):
+        tokens = self.token_re.findall(text.lower())
+        return [t for t in tokens if t not in self.stop_words]
+
+    def query_terms(self, query):
+        """
+        Same maths as TfidfVectorizer.transform (raw tf * idf, then L2 norm),
+        returned as parallel (term ids, weights) arrays.
+        """
+        counts = {}
+        for tok in self.analyze(query):
+            col = np.searchsorted(self.vocab, tok)
+            if col < len(self.vocab) and self.vocab[col] == tok:
+                counts[int(col)] = counts.get(int(col), 0) + 1
+
+        cols = np.array(sorted(counts), dtype=np.int32)
+        vals = np.array([counts[c] for c in cols], dtype=np.float32) * self.idf[cols] if len(cols) else np.zeros(0, np.float32)
+        norm = np.sqrt((vals ** 2).sum())
+        if norm > 0: vals = vals / norm
+        return cols, vals
+
+    def char_terms(self, query):
+        """query_terms() for the character n-gram channel."""
+        vocab, idf = self.char[0], self.char[1]
+        counts = {}
+        for g in char_wb_ngrams(query):
+            col = np.searchsorted(vocab, g)
+            if col < len(vocab) and vocab[col] == g:
+                counts[int(col)] = counts.get(int(col), 0) + 1
+
+        cols = np.array(sorted(counts), dtype=np.int32)
+        # sublinear tf, like the build-time vectorizer
+        vals = (1 + np.log(np.array([counts[c] for c in cols], dtype=np.float32))) * idf[cols] if len(cols) else np.zeros(0, np.float32)
+        norm = np.sqrt((vals ** 2).sum())
+        if norm > 0: vals = vals / norm
+        return cols, vals
+
+    def transform(self, query):
+        cols, vals = self.query_terms(query)
+        return csr_matrix((vals, cols, np.array([0, len(cols)])), shape=(1, len(self.vocab)))
+
+def save_brain(path, chunks, vectorizer, tfidf_matrix, meta=None):
+    """
+    Writes the brain into a temp dir next to `path`, then swaps it in with two
+    renames (brain -> brain.old-<pid>, tmp -> brain), so a running server never
+    sees half-written files. The swap itself is not atomic: a crash between
+    the renames leaves only brain.old-<pid>, which load_brain() falls back to.
+    `meta` is an optional list of per-chunk dicts (same order as `chunks`).
+    """
+    terms = np.asarray(vectorizer.get_feature_names_out())
+    order = np.argsort(terms, kind='stable')
+    matrix = csr_matrix(tfidf_matrix)[:, order].tocsr()
+    matrix.sort_indices()
+    postings = matrix.tocsc()
+    postings.sort_indices()
+    vocab = terms[order].astype(str)
+    idf = vectorizer.idf_[order].astype(np.float32)
+
+    encoded = [c.encode('utf-8') for c in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    meta = meta or []
+    fields = sorted({f for m in meta for f in m})
+    values = {f: sorted({str(m[f]) for m in meta if m.get(f) is not None}) for f in fields}
+    codes = {f: np.array([values[f].index(str(m[f])) if m.get(f) is not None else -1 for m in meta], dtype=np.int16)
+             for f in fields}
+
+    # BM25 needs raw counts; same analyzer/vocabulary, so the sparsity pattern
+    # (and therefore the CSC order) is identical to the TF-IDF postings
+    counter = CountVectorizer(analyzer=vectorizer.build_analyzer(), vocabulary=vectorizer.vocabulary_)
+    tf = counter.transform(chunks)[:, order].tocsc()
+    tf.sort_indices()
+    hf = counter.transform([c.split('\n', 1)[0] for c in chunks])[:, order].tocsc()
+    hf = (hf.multiply(tf > 0)).tocsc()  # Same pattern as tf (a heading term is always a chunk term)
+    hf_aligned = np.zeros(tf.nnz, dtype=np.float32)
+    for t in range(tf.shape[1]):
+        lo, hi = tf.indptr[t], tf.indptr[t + 1]
+        h_lo, h_hi = hf.indptr[t], hf.indptr[t + 1]
+        if h_hi > h_lo:
+            pos = np.searchsorted(tf.indices[lo:hi], hf.indices[h_lo:h_hi])
+            hf_aligned[lo + pos] = hf.data[h_lo:h_hi]
+    doc_len = np.asarray(tf.sum(axis=1)).ravel().astype(np.float32)
+
+    char_vec = TfidfVectorizer(analyzer='char_wb', ngram_range=CHAR_NGRAMS, sublinear_tf=True)
+    char_matrix = char_vec.fit_transform(chunks) if chunks else None
+    if char_matrix is not None:
+        char_terms = np.asarray(char_vec.get_feature_names_out())
+        char_order = np.argsort(char_terms, kind='stable')
+        char_post = char_matrix[:, char_order].tocsc()
+        char_post.sort_indices()
+
+    stop_words = vectorizer.get_stop_words() or []
+    build_id = hashlib.sha1(b''.join(encoded) + vocab.tobytes() + json.dumps(values, sort_keys=True).encode()
+                            + b''.join(codes[f].tobytes() for f in fields)).hexdigest()[:12]
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "build_id": build_id,
+        "built_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "n_chunks": len(encoded),
+        "vocab_size": int(len(vocab)),
+        "nnz": int(matrix.nnz),
+        "analyzer": {"token_pattern": vectorizer.token_pattern, "lowercase": True, "stop_words": sorted(stop_words)},
+        "metadata": values,
+    }
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path): shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, 'data.npy'), matrix.data.astype(np.float32))
+    np.save(os.path.join(tmp_path, 'indices.npy'), matrix.indices.astype(np.int32))
+    np.save(os.path.join(tmp_path, 'indptr.npy'), matrix.indptr.astype(np.int32))
+    np.save(os.path.join(tmp_path, 'idf.npy'), idf)
+    np.save(os.path.join(tmp_path, 'vocab.npy'), vocab)
+    np.save(os.path.join(tmp_path, 'post_ptr.npy'), postings.indptr.astype(np.int32))
+    np.save(os.path.join(tmp_path, 'post_docs.npy'), postings.indices.astype(np.int32))
+    np.save(os.path.join(tmp_path, 'post_data.npy'), postings.data.astype(np.float32))
+    np.save(os.path.join(tmp_path, 'chunk_offsets.npy'), offsets)
+    for f, c in codes.items(): np.save(os.path.join(tmp_path, f'meta_{f}.npy'), c)
+    np.save(os.path.join(tmp_path, 'post_tf.npy'), tf.data.astype(np.float32))
+    np.save(os.path.join(tmp_path, 'post_hf.npy'), hf_aligned)
+    np.save(os.path.join(tmp_path, 'doc_len.npy'), doc_len)
+    if char_matrix is not None:
+        np.save(os.path.join(tmp_path, 'char_vocab.npy'), char_terms[char_order].astype(str))
+        np.save(os.path.join(tmp_path, 'char_idf.npy'), char_vec.idf_[char_order].astype(np.float32))
+        np.save(os.path.join(tmp_path, 'char_ptr.npy'), char_post.indptr.astype(np.int32))
+        np.save(os.path.join(tmp_path, 'char_docs.npy'), char_post.indices.astype(np.int32))
+        np.save(os.path.join(tmp_path, 'char_data.npy'), char_post.data.astype(np.float32))
+    with open(os.path.join(tmp_path, 'chunks.bin'), 'wb') as f: f.write(b''.join(encoded))
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f: json.dump(manifest, f, indent=4)
+
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path): os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    for stale in glob.glob(f"{glob.escape(path)}.old-*"): shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+def previous_build(path):
+    """Newest complete brain.old-<pid> (left behind if save_brain died between its renames)."""
+    olds = [p for p in glob.glob(f"{glob.escape(path)}.old-*") if os.path.exists(os.path.join(p, 'manifest.json'))]
+    return max(olds, key=os.path.getmtime) if olds else None
+
+def load_brain(path):
+    """Opens a brain directory with mmap. Returns None if neither it nor a previous build exists."""
+    manifest_path = os.path.join(path, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        path = previous_build(path)
+        if not path: return None
+        print(f"   ⚠️ {manifest_path} missing, using the previous build in {path}")
+        manifest_path = os.path.join(path, 'manifest.json')
+
+    with open(manifest_path, 'r', encoding='utf-8') as f: manifest = json.load(f)
+    if manifest.get('format_version') not in READABLE_VERSIONS:
+        raise ValueError(f"Unsupported brain format {manifest.get('format_version')} (expected {FORMAT_VERSION})")
+
+    def mm(name): return np.load(os.path.join(path, name), mmap_mode='r')
+
+    matrix = csr_matrix((mm('data.npy'), mm('indices.npy'), mm('indptr.npy')),
+                        shape=(manifest['n_chunks'], manifest['vocab_size']), copy=False)
+    chunks = ChunkStore(np.memmap(os.path.join(path, 'chunks.bin'), dtype=np.uint8, mode='r')
+                        if manifest['n_chunks'] else np.zeros(0, np.uint8), mm('chunk_offsets.npy'))
+    postings = (mm('post_ptr.npy'), mm('post_docs.npy'), mm('post_data.npy'))
+    meta_codes = {f: mm(f'meta_{f}.npy') for f in manifest.get('metadata', {})}
+    has = lambda name: os.path.exists(os.path.join(path, name))
+    bm25 = (mm('post_tf.npy'), mm('post_hf.npy'), mm('doc_len.npy')) if has('post_tf.npy') else None
+    char = tuple(mm(f'char_{n}.npy') for n in ('vocab', 'idf', 'ptr', 'docs', 'data')) if has('char_vocab.npy') else None
+    return Brain(path, manifest, chunks, matrix, mm('vocab.npy'), mm('idf.npy'), postings, meta_codes, bm25, char)
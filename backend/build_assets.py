@@ -0,0 +1,151 @@
+import os
+import io
+import json
+import gzip
+import hashlib
+import PIL.Image
+import PIL.ImageOps
+
+try:
+    import brotli  # Optional: .br copies are skipped without it (gzip is always written)
+except ImportError:
+    brotli = None
+
+# --- CONFIG ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+data_dir = os.path.join(project_root, 'data')
+frontend_dir = os.path.join(project_root, 'frontend')
+image_src_dir = os.path.join(data_dir, 'structured_data')
+image_out_dir = os.path.join(data_dir, 'dist')        # Served at /data/dist/...
+text_out_dir = os.path.join(frontend_dir, 'dist')     # Served at /dist/...
+assets_manifest_path = os.path.join(current_dir, 'assets_manifest.json')
+
+# Bump when widths/qualities change, so every image is re-encoded
+ASSETS_VERSION = 1
+
+# The tour cards are 200 CSS px wide: 320 covers 1x, 640 covers 2-3x screens,
+# 1280 is for anything opened full size.
+IMAGE_WIDTHS = (320, 640, 1280)
+IMAGE_FORMATS = (  # (manifest key, Pillow format, extension, save options) - best first
+    ('avif', 'AVIF', 'avif', {'quality': 50}),
+    ('webp', 'WEBP', 'webp', {'quality': 75, 'method': 6}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 78, 'optimize': True, 'progressive': True}),
+)
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+TEXT_ASSETS = ('script.js', 'style.css')
+
+def digest(data, n=10):
+    return hashlib.sha256(data).hexdigest()[:n]
+
+def file_hash(path):
+    with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+def hashed_name(stem, data, ext):
+    """Canteen.320 + bytes + avif -> Canteen.320.<sha256[:10]>.avif - the URL changes whenever the content does."""
+    return f"{stem}.{digest(data)}.{ext}"
+
+def write_once(path, data):
+    # Hashed names never change content, so an existing file is already right
+    if not os.path.exists(path):
+        with open(path, 'wb') as f: f.write(data)
+
+# --- 1. IMAGES (resized AVIF / WebP / JPEG per width) ---
+def encode(img, fmt, options):
+    out = io.BytesIO()
+    if fmt == 'JPEG' and img.mode != 'RGB': img = img.convert('RGB')
+    img.save(out, fmt, **options)
+    return out.getvalue()
+
+def build_image(src_path, key):
+    with PIL.Image.open(src_path) as raw:
+        img = PIL.ImageOps.exif_transpose(raw)  # Phone photos: bake in the rotation, drop EXIF
+        alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        img = img.convert('RGBA' if alpha else 'RGB')
+    width, height = img.size
+    widths = sorted({min(w, width) for w in IMAGE_WIDTHS})
+    stem = os.path.splitext(os.path.basename(key))[0]
+
+    variants = {name: [] for name, *_ in IMAGE_FORMATS}
+    for w in widths:
+        resized = img if w == width else img.resize((w, round(height * w / width)), PIL.Image.LANCZOS)
+        for name, fmt, ext, options in IMAGE_FORMATS:
+            data = encode(resized, fmt, options)
+            out_name = hashed_name(f"{stem}.{w}", data, ext)
+            write_once(os.path.join(image_out_dir, out_name), data)
+            variants[name].append({'w': w, 'file': f"dist/{out_name}", 'bytes': len(data)})
+    return {'width': width, 'height': height, 'variants': variants}
+
+# --- 2. SCRIPT / STYLESHEET (hashed copy + precompressed siblings) ---
+def build_text(name):
+    with open(os.path.join(frontend_dir, name), 'rb') as f: data = f.read()
+    stem, ext = os.path.splitext(name)
+    out_name = hashed_name(stem, data, ext[1:])
+    out_path = os.path.join(text_out_dir, out_name)
+    write_once(out_path, data)
+    encodings = ['gzip']
+    write_once(out_path + '.gz', gzip.compress(data, 9, mtime=0))
+    if brotli:
+        write_once(out_path + '.br', brotli.compress(data, quality=11))
+        encodings.insert(0, 'br')
+    return {'file': f"dist/{out_name}", 'source_hash': hashlib.sha256(data).hexdigest(),
+            'bytes': len(data), 'encodings': encodings}
+
+# --- 3. MANIFEST + CLEANUP ---
+def load_assets_manifest():
+    try:
+        with open(assets_manifest_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def prune(directory, keep):
+    """Deletes outputs from previous builds that the new manifest no longer references."""
+    if not os.path.isdir(directory): return 0
+    removed = 0
+    for name in os.listdir(directory):
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if base not in keep:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
+
+def build_assets(full=False):
+    print("🖼️  Building static assets...")
+    os.makedirs(image_out_dir, exist_ok=True)
+    os.makedirs(text_out_dir, exist_ok=True)
+    previous = load_assets_manifest()
+    reuse = not full and previous.get('version') == ASSETS_VERSION
+    old_images = previous.get('images', {}) if reuse else {}
+
+    images = {}
+    for name in sorted(os.listdir(image_src_dir)):
+        if not name.lower().endswith(IMAGE_EXTS): continue
+        src_path = os.path.join(image_src_dir, name)
+        key = f"structured_data/{name}"
+        src_hash = file_hash(src_path)
+        old = old_images.get(key)
+        if old and old.get('source_hash') == src_hash and all(
+                os.path.exists(os.path.join(data_dir, v['file'])) for vs in old['variants'].values() for v in vs):
+            images[key] = old
+            continue
+        entry = build_image(src_path, key)
+        entry['source_hash'] = src_hash
+        images[key] = entry
+        thumb = min(vs[0]['bytes'] for vs in entry['variants'].values())
+        print(f"   ✅ {name}: {os.path.getsize(src_path) // 1024} KB -> {thumb // 1024} KB thumbnail")
+
+    files = {name: build_text(name) for name in TEXT_ASSETS}
+
+    manifest = {'version': ASSETS_VERSION, 'images': images, 'files': files}
+    with open(assets_manifest_path, 'w', encoding='utf-8') as f: json.dump(manifest, f, indent=1)
+
+    keep = {os.path.basename(v['file']) for e in images.values() for vs in e['variants'].values() for v in vs}
+    removed = prune(image_out_dir, keep) + prune(text_out_dir, {os.path.basename(e['file']) for e in files.values()})
+    print(f"   ✅ {len(images)} images, {len(files)} scripts/styles -> {assets_manifest_path}"
+          f"{f' ({removed} stale files removed)' if removed else ''}")
+    return manifest
+
+if __name__ == "__main__":
+    import sys
+    # --full re-encodes every image even if its source is unchanged
+    build_assets(full='--full' in sys.argv)
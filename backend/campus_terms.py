@@ -0,0 +1,19 @@
+import re
+
+# --- SHARED CAMPUS VOCABULARY ---
+# One copy of the year/branch/acronym tables, used both when the index is
+# built (process_data.py) and when questions are resolved (retrieval,
+# syllabus and timetable lookups), so the two can't drift apart.
+BRANCHES = ('CSE', 'ECE', 'EE')
+BRANCH_WORDS = {'cse': 'CSE', 'computer science': 'CSE', 'ece': 'ECE', 'ee': 'EE'}
+YEAR_WORDS = {'1st': 1, 'first': 1, '2nd': 2, 'second': 2, '3rd': 3, 'third': 3, '4th': 4, 'fourth': 4}
+YEAR_RE = re.compile(rf"\b(?:({'|'.join(YEAR_WORDS)})\s*(?:year|yr)|year\s*([1-4]))\b")
+SEM_RE = re.compile(r'\bsem(?:ester)?\s*([1-8])\b')
+ROMAN = {'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5, 'VI': 6, 'VII': 7, 'VIII': 8}
+# Left out of subject keys and acronyms: "Analysis and Design of Algorithms" -> ADA
+ACRONYM_SKIP = {'and', 'of', 'for', 'the', 'in', 'to', '&', '-'}
+
+def subject_key(name):
+    """'Database Management Systems' / 'Database Management System' -> 'database management system'"""
+    words = re.findall(r'[a-z0-9]+', name.lower())
+    return ' '.join(w[:-1] if len(w) > 3 and w.endswith('s') else w for w in words if w not in ACRONYM_SKIP)
@@ -0,0 +1,95 @@
+import re
+
+# Gemini averages ~4 characters per token on English text. Good enough for
+# budgeting without a tokenizer round-trip per request.
+CHARS_PER_TOKEN = 4
+
+TAG = re.compile(r'^(\[[^\]]+\])\s*')
+SEPARATOR = re.compile(r'((?<=[.!?])\s+|\n+)')  # Keeps the separators so text can be rebuilt as-is
+MIN_DEDUPE_CHARS = 20  # Short lines ("Unit 1", "---") may legitimately repeat
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def sentences(text):
+    """'A. B\nC' -> [('A.', ' '), ('B', '\n'), ('C', '')]"""
+    parts = SEPARATOR.split(text)
+    return [(parts[i], parts[i + 1] if i + 1 < len(parts) else '') for i in range(0, len(parts), 2)]
+
+def norm(sentence):
+    return re.sub(r'\s+', ' ', sentence.lower()).strip()
+
+def trim_to_tokens(text, max_tokens):
+    """Cuts text at the last sentence boundary that fits in max_tokens."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit: return text
+    out, used = [], 0
+    for sent, sep in sentences(text):
+        if used + len(sent) > limit: break
+        out.append(sent + sep)
+        used += len(sent) + len(sep)
+    return ''.join(out).rstrip()
+
+def split_header(chunk):
+    """'[Source] Subject > Unit\nbody' -> ('[Source] Subject > Unit', 'body')"""
+    m = TAG.match(chunk)
+    if not m: return '', chunk
+    if '\n' in chunk: return tuple(chunk.split('\n', 1))
+    return m.group(1), chunk[m.end():]
+
+class ContextAssembler:
+    """
+    Packs scored chunks into a token budget:
+      1. highest score first; chunks sharing a heading breadcrumb are
+         grouped under it, so the heading is sent once
+      2. sentences already in the context are dropped (overlapping
+         slices of the same section repeat each other at the seams)
+      3. the chunk that overflows is cut at a sentence boundary
+    """
+
+    def __init__(self, max_tokens=1500, separator="\n---\n"):
+        self.max_tokens = max_tokens
+        self.separator = separator
+
+    def assemble(self, hits, chunks):
+        """hits: [(idx, score)]. Returns (text, stats)."""
+        seen = set()
+        groups = {}  # header -> [body, ...], in score order
+        used = 0
+        stats = {'chunks': 0, 'duplicates': 0, 'truncated': False}
+        sep_tokens = estimate_tokens(self.separator)
+
+        for idx, score in sorted(hits, key=lambda h: -h[1]):
+            header, body = split_header(chunks[idx])
+
+            fresh = []
+            for sent, sep in sentences(body):
+                key = norm(sent)
+                if not key: continue
+                if len(key) >= MIN_DEDUPE_CHARS:
+                    if key in seen: continue
+                    seen.add(key)
+                fresh.append(sent + sep)
+
+            body = ''.join(fresh).strip()
+            if not re.search(r'\w', body):  # Nothing new (or only '---' left)
+                stats['duplicates'] += 1
+                continue
+
+            overhead = 1 if header in groups else estimate_tokens(header) + (sep_tokens if groups else 0)
+            remaining = self.max_tokens - used - overhead
+            if estimate_tokens(body) > remaining:
+                body = trim_to_tokens(body, remaining) if remaining > 0 else ''
+                stats['truncated'] = True
+                if body:
+                    groups.setdefault(header, []).append(body)
+                    stats['chunks'] += 1
+                break
+
+            groups.setdefault(header, []).append(body)
+            used += overhead + estimate_tokens(body)
+            stats['chunks'] += 1
+
+        text = self.separator.join("\n".join(([h] if h else []) + bodies) for h, bodies in groups.items())
+        stats['tokens'] = estimate_tokens(text)
+        return text, stats
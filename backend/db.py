@@ -0,0 +1,212 @@
+import os
+import time
+import random
+import threading
+
+import metrics
+from metrics import span
+
+# --- DATA ACCESS (every Supabase call in app.py goes through here) ---
+# One pooled keep-alive HTTP client per process, explicit timeouts, retries
+# with backoff for calls that are safe to repeat, and a circuit breaker so a
+# struggling database fails fast instead of tying up request threads.
+DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', '3'))
+DB_TIMEOUT = float(os.getenv('DB_TIMEOUT', '10'))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '20'))
+DB_READ_RETRIES = int(os.getenv('DB_READ_RETRIES', '3'))
+DB_RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', '0.2'))
+DB_BREAKER_FAILURES = int(os.getenv('DB_BREAKER_FAILURES', '5'))
+DB_BREAKER_COOLDOWN = float(os.getenv('DB_BREAKER_COOLDOWN', '30'))
+UPSERT_BATCH_SIZE = int(os.getenv('UPSERT_BATCH_SIZE', '500'))
+
+# PostgREST codes for "database not reachable / pool exhausted" and Postgres statement timeout
+TRANSIENT_CODES = {'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003', '57014'}
+
+DB_RETRIES = metrics.REGISTRY.counter('cgpa_db_retries_total', 'Supabase calls retried after a transient error', ('op',))
+DB_ERRORS = metrics.REGISTRY.counter('cgpa_db_errors_total', 'Supabase calls that failed', ('op', 'kind'))
+
+class DBUnavailable(Exception):
+    """No client configured, or the circuit breaker is open."""
+
+def connect(url, key):
+    """Supabase client on a shared httpx pool (keep-alive, bounded connections, timeouts)."""
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    timeout = httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT, pool=DB_CONNECT_TIMEOUT)
+    http = httpx.Client(timeout=timeout, follow_redirects=True,
+                        limits=httpx.Limits(max_connections=DB_POOL_SIZE, max_keepalive_connections=DB_POOL_SIZE,
+                                            keepalive_expiry=60))
+    return create_client(url, key, options=ClientOptions(httpx_client=http, postgrest_client_timeout=timeout))
+
+def is_transient(e):
+    """Network trouble or the database being overloaded, as opposed to a bad request."""
+    try:
+        import httpx
+        if isinstance(e, httpx.TransportError): return True
+    except ImportError:
+        pass
+    if isinstance(e, (TimeoutError, ConnectionError)): return True
+    code = str(getattr(e, 'code', '') or '')
+    return code in TRANSIENT_CODES or (len(code) == 3 and code.startswith('5'))
+
+def never_sent(e):
+    """The request failed before reaching the server, so even an insert can be repeated."""
+    try:
+        import httpx
+        return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+    except ImportError:
+        return isinstance(e, ConnectionError)
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; `failures` transient errors in a row open it
+    open      -> calls fail immediately with DBUnavailable for `cooldown` seconds
+    half-open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failures=5, cooldown=30):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None: return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed': return True
+            if state == 'half-open' and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures, self.opened_at, self.trial = 0, None, False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.max_failures:
+                if self.opened_at is None or self.trial:
+                    print(f"🔌 DB circuit open for {self.cooldown:.0f}s after {self.failures} failure(s)")
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+class DataAccess:
+    """Typed helpers over the Supabase tables the app uses."""
+
+    def __init__(self, client, breaker=None, retries=DB_READ_RETRIES, backoff=DB_RETRY_BACKOFF):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker(DB_BREAKER_FAILURES, DB_BREAKER_COOLDOWN)
+        self.retries = max(1, int(retries))  # Attempts per call: DB_READ_RETRIES=0 still makes the one call
+        self.backoff = backoff
+
+    @property
+    def enabled(self):
+        return self.client is not None
+
+    def run(self, op, build, idempotent=True):
+        """
+        Executes `build(client).execute()` as stage db.<op>. Transient errors
+        are retried with exponential backoff + jitter: every attempt for reads
+        and upserts, only never-sent requests for inserts/deletes.
+        """
+        if self.client is None: raise DBUnavailable("Database not configured")
+        for attempt in range(self.retries):
+            if not self.breaker.allow():
+                DB_ERRORS.inc(op=op, kind='circuit_open')
+                raise DBUnavailable(f"Database unavailable (circuit open), skipped {op}")
+            try:
+                with span(f'db.{op}'): res = build(self.client).execute()
+                self.breaker.success()
+                return res.data
+            except Exception as e:
+                transient = is_transient(e)
+                if not transient:
+                    # The database answered: a bad request is not an outage
+                    self.breaker.success()
+                    DB_ERRORS.inc(op=op, kind='rejected')
+                    raise
+                self.breaker.failure()
+                retryable = idempotent or never_sent(e)
+                if not retryable or attempt == self.retries - 1:
+                    DB_ERRORS.inc(op=op, kind='transient')
+                    raise
+                DB_RETRIES.inc(op=op)
+                time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    # --- READS ---
+    def get_class_id(self, email):
+        rows = self.run('select.classes', lambda c: c.table('classes').select('id').eq('teacher_email', email).limit(1))
+        return rows[0]['id'] if rows else None
+
+    def get_classes(self, email):
+        return self.run('select.classes', lambda c: c.table('classes').select('*').eq('teacher_email', email))
+
+    def get_roster(self, cid, columns='*'):
+        return self.run('select.students', lambda c: c.table('students').select(columns).eq('class_id', cid))
+
+    def get_teacher_students(self, email):
+        return self.run('select.students', lambda c: c.table('students').select('*').eq('teacher_email', email))
+
+    def get_attendance(self, cid):
+        return self.run('select.attendance_records', lambda c: c.table('attendance_records')
+                        .select('student_id, date, status').eq('class_id', cid))
+
+    def get_history(self, email, limit=50):
+        return self.run('select.conversations', lambda c: c.table('conversations').select('*')
+                        .eq('user_email', email).order('created_at', desc=False).limit(limit))
+
+    # --- WRITES ---
+    def append_history(self, email, role, message):
+        return self.run('insert.conversations', lambda c: c.table('conversations')
+                        .insert({'user_email': email, 'role': role, 'message': message}), idempotent=False)
+
+    def create_class(self, row):
+        return self.run('insert.classes', lambda c: c.table('classes').insert(row), idempotent=False)
+
+    def delete_student(self, student_id):
+        return self.run('delete.students', lambda c: c.table('students').delete().eq('student_id', student_id),
+                        idempotent=False)
+
+    def bulk_upsert(self, table, rows, on_conflict, batch_size=None):
+        """
+        Upserts rows in batches (one round-trip per batch). If the database
+        rejects a batch, its rows are retried one by one so a single bad row
+        doesn't sink the rest; if it's unreachable (transient error that used up
+        its retries, or circuit open) the remaining rows fail at once.
+        Returns (saved_rows, [(row, error), ...]).
+        """
+        batch_size = batch_size or UPSERT_BATCH_SIZE
+        saved, failed = [], []
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            try:
+                self.run(f'upsert.{table}', lambda c: c.table(table).upsert(batch, on_conflict=on_conflict))
+                saved.extend(batch)
+            except Exception as batch_error:
+                print(f"Bulk Upsert Error ({table}, {len(batch)} rows): {batch_error}")
+                if isinstance(batch_error, DBUnavailable) or is_transient(batch_error):
+                    failed.extend((row, str(batch_error)) for row in rows[i:])  # No point hammering a dead DB row by row
+                    break
+                for row in batch:
+                    try:
+                        self.run(f'upsert.{table}', lambda c: c.table(table).upsert(row, on_conflict=on_conflict))
+                        saved.append(row)
+                    except Exception as e:
+                        failed.append((row, str(e)))
+        return saved, failed
+
+    def bulk_upsert_attendance(self, rows):
+        return self.bulk_upsert('attendance_records', rows, on_conflict="student_id, class_id, date")
+
+    def upsert_students(self, rows):
+        return self.bulk_upsert('students', rows, on_conflict="class_id, student_id")
@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from brain_store import load_brain
+from retrieval import RetrievalEngine, RANKERS, query_filters
+from process_data import (data_dir, structured_chunker, subject_aliases, subject_key,
+                          unit_number, heading_of, SUBJECT_RE)
+
+# --- RETRIEVAL EVAL: query -> expected chunk ---
+# A chunk counts as relevant when it contains every string in "expect"
+# (case-insensitive). Expectations are raw source text, so the set survives
+# rebuilds and chunker changes.
+#
+#   python eval_retrieval.py --build        regenerate retrieval_eval.json from data/knowledge_source
+#   python eval_retrieval.py                recall@k / MRR / latency for every ranker
+#   python eval_retrieval.py --rankers bm25,hybrid --misses 10
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+eval_path = os.path.join(current_dir, 'retrieval_eval.json')
+brain_dir = os.path.join(current_dir, 'brain')
+
+ORDINAL = {1: '1st', 2: '2nd', 3: '3rd', 4: '4th'}
+DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY']
+
+# Hand-picked general questions (answers checked against fot_complete_info.txt)
+GENERAL = [
+    ("is there a hostel for fot students", ["No dedicated hostel for FoT students"]),
+    ("what are the tuition fees", ["Tuition Fees"]),
+    ("fot landline contact number", ["Contact Landline"]),
+    ("placement cell contact", ["placement@du.ac.in"]),
+    ("how do i get admission to btech", ["Admission Procedure"]),
+    ("library access for students", ["Central Science Library"]),
+    ("when was the faculty of technology established", ["Established: 2023"]),
+    ("fee concession documents", ["Required Documents for Fee Concession"]),
+]
+
+def read(name):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path): return ""
+    with open(path, 'r', encoding='utf-8') as f: return f.read()
+
+def build_eval_set():
+    """Generates queries + expectations from the knowledge source files."""
+    cases = []
+    timetable = read('timetable.txt')
+    aliases = subject_aliases(timetable)
+
+    # 1. Syllabus units: "DBMS unit 2", "Database Management Systems unit 2 syllabus"
+    for name in ('first_year_syllabus.txt', 'second_year_syllabus.txt', 'third_year_syllabus.txt'):
+        tag = name.replace('.txt', '').replace('_', ' ').title()
+        for text, meta in structured_chunker(read(name), tag, aliases):
+            if meta['type'] != 'syllabus_unit': continue
+            unit_line = text.split('\n')[1]
+            n = unit_number(unit_line)
+            subject = meta['subject']
+            scope = f" {meta['branch']}" if meta['branch'] else ''
+            expect = [subject, unit_line]
+            cases.append({"category": "syllabus", "query": f"{subject} unit {n} syllabus", "expect": expect})
+            if subject_key(subject) in aliases:  # Only acronyms students actually use (timetable key)
+                acr = aliases[subject_key(subject)]
+                cases.append({"category": "syllabus_acronym", "query": f"{acr}{scope} unit {n}", "expect": expect})
+
+    # 2. Course codes: "DSC-9 2nd year CSE"
+    for name, year in (('first_year_syllabus.txt', 1), ('second_year_syllabus.txt', 2), ('third_year_syllabus.txt', 3)):
+        tag = name.replace('.txt', '').replace('_', ' ').title()
+        seen = set()
+        for text, meta in structured_chunker(read(name), tag, aliases):
+            header = text.split('\n')[0]
+            for title in re.findall(r'\] (.+?\((?:DSC|DSE)-\d+[^)]*\))', header):
+                sm = SUBJECT_RE.match(title)
+                if not sm or title in seen: continue
+                seen.add(title)
+                code = sm.group(2).split('/')[0]
+                branch = f" {meta['branch']}" if meta['branch'] else ''
+                cases.append({"category": "course_code", "query": f"{code} {ORDINAL[year]} year{branch}",
+                              "expect": [sm.group(1).strip()]})
+
+    # 3. Faculty profiles: "Dr. Vanita Jain education"
+    name = None
+    for line in read('faculty_profiles.txt').split('\n'):
+        h = heading_of(line.strip())
+        if not h: continue
+        level, title = h
+        if level == 2 and title.startswith(('Dr', 'Prof', 'Mr', 'Ms')):
+            name = title
+            cases.append({"category": "faculty", "query": f"{name} email", "expect": [name, "Email"]})
+        elif level == 3 and name:
+            cases.append({"category": "faculty", "query": f"{name} {title.lower()}", "expect": [name, title]})
+
+    # 4. Timetable days: "2nd year CSE-A tuesday timetable"
+    section = None
+    for line in timetable.split('\n'):
+        h = heading_of(line.strip())
+        if not h: continue
+        level, title = h
+        m = re.match(r'(\d)(?:st|nd|rd|th)\s+YEAR\s*[–-]\s*([A-Z]+(?:-[A-Z])?)', title)
+        if level <= 3:
+            section = (int(m.group(1)), m.group(2), title.split('(')[0].strip()) if m else None
+        elif level == 7 and section and title in DAYS:
+            year, sec, heading = section
+            cases.append({"category": "timetable", "query": f"{ORDINAL[year]} year {sec} {title.lower()} timetable",
+                          "expect": [heading, title]})
+
+    # 5. Initials & acronyms: "who is AKS", "what is DBMS"
+    in_faculty = in_subjects = False
+    for line in timetable.split('\n'):
+        s = line.strip()
+        if s.startswith('#'):
+            in_faculty = 'faculty acronyms' in s.lower()
+            in_subjects = 'subject acronym key' in s.lower() or 'year subjects' in s.lower()
+            continue
+        if (in_faculty or in_subjects) and s.count('|') == 1:
+            code, full = [p.strip() for p in s.split('|')]
+            if not code or not code.replace('-', '').replace(' ', '').isalnum(): continue
+            query = f"who is {code}" if in_faculty else f"what is {code}"
+            cases.append({"category": "initials" if in_faculty else "acronym", "query": query, "expect": [f"{code} | {full}"]})
+
+    # 6. Rooms: "where is room 313"
+    for m in re.finditer(r'^- Room (\w+)', read('class_rooms.txt'), re.M):
+        cases.append({"category": "room", "query": f"where is room {m.group(1)}", "expect": ["[Class Rooms]", f"Room {m.group(1)}"]})
+
+    for query, expect in GENERAL:
+        cases.append({"category": "general", "query": query, "expect": expect})
+
+    # Same query may be generated twice (e.g. duplicate acronym rows) - keep the first
+    unique = {}
+    for c in cases: unique.setdefault(c['query'].lower(), c)
+    return list(unique.values())
+
+def relevant_ids(brain, expect):
+    wanted = [e.lower() for e in expect]
+    return {i for i, text in enumerate(brain.chunks) if all(w in text.lower() for w in wanted)}
+
+def evaluate(engine, cases, ks=(1, 3, 5, 8), use_filters=True):
+    """Runs every case through the same search get_context does. Returns the report dict."""
+    brain = engine.brain
+    hits_at = {k: 0 for k in ks}
+    rr, latencies, returned, misses, skipped = [], [], [], [], 0
+    per_cat = {}
+
+    for case in cases:
+        rel = relevant_ids(brain, case['expect'])
+        if not rel:
+            skipped += 1  # Source changed and the expectation no longer exists
+            continue
+
+        t0 = time.perf_counter()
+        where = query_filters(case['query'], brain) if use_filters else {}
+        hits = engine.search(case['query'], k=max(ks), where=where)
+        if not hits and where: hits = engine.search(case['query'], k=max(ks))
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        ids = [i for i, _ in hits]
+        returned.append(len(ids))
+        rank = next((pos + 1 for pos, i in enumerate(ids) if i in rel), None)
+        rr.append(1 / rank if rank else 0)
+        for k in ks:
+            if rank and rank <= k: hits_at[k] += 1
+        cat = per_cat.setdefault(case['category'], [0, 0])
+        cat[0] += 1
+        cat[1] += 1 if rank and rank <= max(ks) else 0
+        if not rank: misses.append((case, ids[:3]))
+
+    n = len(rr) or 1
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "queries": len(rr), "skipped": skipped,
+        "recall": {k: hits_at[k] / n for k in ks},
+        "mrr": sum(rr) / n,
+        "avg_returned": sum(returned) / n,
+        "p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)), "max_ms": float(lat.max()),
+        "per_category": {c: v[1] / v[0] for c, v in sorted(per_cat.items())},
+        "misses": misses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval relevance & latency benchmark")
+    parser.add_argument('--build', action='store_true', help="regenerate retrieval_eval.json from data/knowledge_source")
+    parser.add_argument('--rankers', default=','.join(RANKERS), help="comma-separated: " + ', '.join(RANKERS))
+    parser.add_argument('--no-filters', action='store_true', help="skip year/branch/subject pre-filtering")
+    parser.add_argument('--misses', type=int, default=0, help="print the first N misses per ranker")
+    args = parser.parse_args()
+
+    if args.build or not os.path.exists(eval_path):
+        cases = build_eval_set()
+        with open(eval_path, 'w', encoding='utf-8') as f: json.dump(cases, f, indent=1, ensure_ascii=False)
+        print(f"✅ Eval set: {len(cases)} queries -> {eval_path}")
+        if args.build: return
+
+    with open(eval_path, 'r', encoding='utf-8') as f: cases = json.load(f)
+    brain = load_brain(brain_dir)
+    if brain is None: sys.exit("❌ No brain/ found. Run process_data.py first.")
+
+    print(f"🧪 {len(cases)} queries against build {brain.version} ({len(brain.chunks)} chunks)\n")
+    print(f"{'ranker':<8} {'R@1':>6} {'R@3':>6} {'R@5':>6} {'R@8':>6} {'MRR':>6} {'avg k':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    reports = {}
+    for name in args.rankers.split(','):
+        engine = RetrievalEngine(brain, ranker=name.strip())
+        r = reports[name] = evaluate(engine, cases, use_filters=not args.no_filters)
+        rc = r['recall']
+        print(f"{name:<8} {rc[1]:>6.3f} {rc[3]:>6.3f} {rc[5]:>6.3f} {rc[8]:>6.3f} {r['mrr']:>6.3f} "
+              f"{r['avg_returned']:>6.1f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f}")
+
+    print("\nRecall@8 by category:")
+    cats = sorted({c for r in reports.values() for c in r['per_category']})
+    print(f"{'':<18}" + ''.join(f"{n:>8}" for n in reports))
+    for c in cats:
+        print(f"{c:<18}" + ''.join(f"{reports[n]['per_category'].get(c, 0):>8.3f}" for n in reports))
+
+    for name, r in reports.items():
+        if r['skipped']: print(f"⚠️ {name}: {r['skipped']} queries skipped (expected text not in the brain)")
+        for case, top in r['misses'][:args.misses]:
+            print(f"   ✗ [{name}] {case['query']!r} -> {[brain.chunks[i].split(chr(10))[0][:70] for i in top]}")
+
+if __name__ == "__main__":
+    main()
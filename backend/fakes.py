@@ -0,0 +1,252 @@
+import re
+import json
+import time
+import random
+import threading
+from types import SimpleNamespace
+
+# In-process stand-ins for the Gemini model and the Supabase client, so the
+# Flask app can be driven at full speed without network access or quota.
+# Used by load_test.py; swap them in with `app.make_model = FakeGemini(...).make_model`
+# and `app.db = DataAccess(FakeSupabase(...))`.
+
+# --- 1. FAKE GEMINI ---
+class FakeUsage:
+    def __init__(self, prompt, output):
+        self.prompt_token_count = prompt
+        self.candidates_token_count = output
+
+class FakeResponse:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+class FakeStream:
+    """Yields the reply word by word at `tokens_per_sec` after the first-token latency."""
+
+    def __init__(self, words, latency, tokens_per_sec, usage):
+        self.words = words
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.usage_metadata = usage
+
+    def __iter__(self):
+        time.sleep(self.latency)
+        gap = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        for i, w in enumerate(self.words):
+            if i and gap: time.sleep(gap)
+            yield SimpleNamespace(text=w)
+
+class FakeChat:
+    def __init__(self, model, history, system_instruction=None):
+        self.model = model
+        self.history = history
+        self.system_instruction = system_instruction or ''
+
+    def send_message(self, message, stream=False):
+        m = self.model
+        text = m.reply(message, self.history)
+        prompt_chars = len(self.system_instruction) + sum(len(p) for h in self.history for p in h['parts']) + len(message)
+        words = re.findall(r'\S+\s*', text) or ['']
+        usage = FakeUsage(prompt_chars // 4, len(words))
+        latency = m.first_token_latency()
+
+        with m.lock: m.calls += 1
+        if stream: return FakeStream(words, latency, m.tokens_per_sec, usage)
+
+        time.sleep(latency + (len(words) / m.tokens_per_sec if m.tokens_per_sec > 0 else 0))
+        return FakeResponse(text, usage)
+
+class FakeModel:
+    """What app.make_model() returns: the shared fake bound to one system instruction."""
+
+    def __init__(self, fake, system_instruction):
+        self.fake = fake
+        self.system_instruction = system_instruction
+
+    def start_chat(self, history=None):
+        return FakeChat(self.fake, history or [], self.system_instruction)
+
+    def generate_content(self, prompt):
+        return FakeChat(self.fake, [], self.system_instruction).send_message(prompt)
+
+class FakeGemini:
+    """
+    Drop-in for genai.GenerativeModel (start_chat / send_message, with
+    stream=True, and generate_content). Teacher commands get the same JSON
+    actions the real prompt asks for; anything else gets a fixed-length
+    canned answer. Install with `app.model = fake; app.make_model = fake.make_model`.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.0, tokens_per_sec=80, reply_words=60, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_words = reply_words
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def make_model(self, system_instruction=None):
+        return FakeModel(self, system_instruction)
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history or [])
+
+    def generate_content(self, prompt):
+        return FakeChat(self, []).send_message(prompt)
+
+    def first_token_latency(self):
+        if not self.jitter: return self.latency
+        with self.lock: return max(0.0, self.rng.gauss(self.latency, self.latency * self.jitter))
+
+    def reply(self, message, history):
+        q = message.lower()
+        date = time.strftime('%Y-%m-%d')
+
+        m = re.search(r'ending (?:in|with) (\w+)', q)
+        if q.startswith('mark') and m:
+            return json.dumps({"action": "update_attendance", "status": "Present", "date": date,
+                               "pattern": {"field": "id", "type": "endswith", "value": m.group(1)}})
+        ids = re.findall(r'\b\d{2,}\b', q)
+        if q.startswith('mark') and ids:
+            status = 'Absent' if 'absent' in q else 'Present'
+            return json.dumps({"action": "update_attendance", "ids": ids, "status": status, "date": date})
+
+        m = re.search(r'attendance\s*([<>]=?|==)\s*(\d+)', q)
+        if m:
+            return json.dumps({"action": "analyze_data", "filter_type": "attendance",
+                               "operator": m.group(1), "value": int(m.group(2))})
+
+        return ' '.join(['Answer'] + ['lorem'] * (self.reply_words - 1)) + '.'
+
+# --- 2. FAKE SUPABASE ---
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    """Covers the builder chains app.py uses: select/eq/order/limit, insert, upsert, delete."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op, self.payload, self.on_conflict = 'select', None, None
+        self.columns = None
+        self.filters, self.order_by, self.max_rows = [], None, None
+
+    def select(self, columns='*'):
+        self.op = 'select'
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.op, self.payload, self.on_conflict = 'upsert', rows, on_conflict
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    def execute(self):
+        return self.db.execute(self)
+
+class FakeSupabase:
+    """
+    In-memory table store behind the supabase-py builder API. Every
+    execute() sleeps `latency` seconds to stand in for the HTTP round-trip,
+    and calls are counted per (table, op). `fail_rate` makes that share of
+    calls raise ConnectionError, to exercise retries and the circuit breaker.
+    """
+
+    def __init__(self, latency=0.02, tables=None, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.indexes = {}  # (table, conflict columns) -> {key: row}
+        self.next_id = 1
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rows(self, name):
+        return self.tables.setdefault(name, [])
+
+    def index(self, table, keys):
+        idx = self.indexes.get((table, keys))
+        if idx is None:
+            idx = self.indexes[(table, keys)] = {tuple(str(r.get(k)) for k in keys): r for r in self.rows(table)}
+        return idx
+
+    def drop_indexes(self, table):
+        for k in [k for k in self.indexes if k[0] == table]: del self.indexes[k]
+
+    def execute(self, q):
+        if self.latency: time.sleep(self.latency)
+        with self.lock:
+            self.calls[(q.table, q.op)] = self.calls.get((q.table, q.op), 0) + 1
+            if self.fail_rate and self.rng.random() < self.fail_rate:
+                raise ConnectionError(f"fake: connection reset ({q.op} {q.table})")
+            rows = self.rows(q.table)
+            match = lambda r: all(str(r.get(c)) == str(v) for c, v in q.filters)
+
+            if q.op == 'select':
+                out = [r for r in rows if match(r)]
+                if q.order_by:
+                    col, desc = q.order_by
+                    out.sort(key=lambda r: str(r.get(col, '')), reverse=desc)
+                if q.max_rows is not None: out = out[:q.max_rows]
+                if q.columns: return FakeResult([{c: r.get(c) for c in q.columns} for r in out])
+                return FakeResult([dict(r) for r in out])
+
+            if q.op == 'delete':
+                gone = [r for r in rows if match(r)]
+                self.tables[q.table] = [r for r in rows if not match(r)]
+                self.drop_indexes(q.table)
+                return FakeResult(gone)
+
+            payload = q.payload if isinstance(q.payload, list) else [q.payload]
+            if q.op == 'insert':
+                new = []
+                for r in payload:
+                    r = dict(r)
+                    r.setdefault('id', self.next_id)
+                    r.setdefault('created_at', f"{time.time():.6f}")
+                    self.next_id += 1
+                    rows.append(r)
+                    new.append(dict(r))
+                self.drop_indexes(q.table)
+                return FakeResult(new)
+
+            # upsert: rows matching on the conflict columns are updated in place
+            keys = tuple(c.strip() for c in (q.on_conflict or 'id').split(','))
+            if len({tuple(str(r.get(k)) for k in keys) for r in payload}) < len(payload):
+                raise Exception("ON CONFLICT DO UPDATE command cannot affect row a second time")
+            index = self.index(q.table, keys)
+            for other in [k for k in self.indexes if k[0] == q.table and k[1] != keys]: del self.indexes[other]
+            for r in payload:
+                key = tuple(str(r.get(k)) for k in keys)
+                if key in index: index[key].update(r)
+                else:
+                    index[key] = dict(r)
+                    rows.append(index[key])
+            return FakeResult([dict(r) for r in payload])
@@ -0,0 +1,45 @@
+import os
+import multiprocessing
+
+# --- PRODUCTION SERVER (gunicorn -c backend/gunicorn.conf.py) ---
+# Threaded workers: a request spends nearly all its time waiting on Gemini or
+# Supabase, so each worker serves GUNICORN_THREADS of them at once and a slow
+# LLM call no longer blocks everyone else. The app (and the knowledge base)
+# is loaded once in the master before forking, so workers share those pages
+# copy-on-write; app.start_worker() then sets up each worker's own threads
+# and connections.
+os.environ['GUNICORN_PRELOAD'] = '1'
+
+chdir = os.path.dirname(os.path.abspath(__file__))  # app.py imports its siblings
+wsgi_app = 'app:app'
+preload_app = True
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 4))))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# gthread workers heartbeat from their main loop, so `timeout` only fires on a
+# wedged worker, not on a long (streamed) LLM reply.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# On deploy/restart, in-flight chats get this long to finish
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Optional recycling (0 = off); restarted workers fork from the preloaded master
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None  # '-' for stdout
+errorlog = '-'
+
+def post_fork(server, worker):
+    import app
+    app.start_worker()
+
+def worker_exit(server, worker):
+    import app
+    app.stop_worker()
+
+def when_ready(server):
+    server.log.info(f"🚀 {workers} workers x {threads} threads on {bind} (KB preloaded)")
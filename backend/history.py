@@ -0,0 +1,116 @@
+import os
+import hashlib
+import threading
+
+from query_cache import TTLCache
+from context_builder import CHARS_PER_TOKEN, trim_to_tokens
+
+# --- BOUNDED CONVERSATION HISTORY ---
+# The client resends the whole chat every turn. Only the last HISTORY_KEEP
+# messages go to the model verbatim; older ones are folded, HISTORY_FOLD_STEP
+# at a time, into a running summary that is cached per conversation prefix.
+HISTORY_KEEP = int(os.getenv('HISTORY_KEEP', '6'))
+HISTORY_FOLD_STEP = int(os.getenv('HISTORY_FOLD_STEP', '4'))
+HISTORY_MAX_VERBATIM = int(os.getenv('HISTORY_MAX_VERBATIM', '16'))  # While a summary is still being written
+HISTORY_SUMMARY_TOKENS = int(os.getenv('HISTORY_SUMMARY_TOKENS', '250'))
+
+SUMMARY_PROMPT = """Update the running summary of a chat between a user and the FoT campus assistant.
+Keep names, roll numbers, class/subject/year/branch, dates and anything the user asked the assistant to do or remember.
+Drop greetings and repeated syllabus/timetable text. Plain text, at most {words} words.
+
+[SUMMARY SO FAR]
+{previous}
+
+[NEW MESSAGES]
+{messages}"""
+
+def message_line(m):
+    return f"{'User' if m['isUser'] else 'Assistant'}: {m['text']}"
+
+def prefix_hashes(messages):
+    """h[i] identifies messages[:i]; chained so all prefixes cost one pass."""
+    hashes, h = [''], hashlib.sha1()
+    for m in messages:
+        h.update(b'U' if m['isUser'] else b'M')
+        h.update(m['text'].encode('utf-8'))
+        h.update(b'\0')
+        hashes.append(h.copy().hexdigest())
+    return hashes
+
+def extractive_summary(previous, messages, max_tokens):
+    """Fallback when the model can't be used: previous summary + the user's requests, newest kept."""
+    lines = ([previous] if previous else []) + [f"- {m['text'][:160]}" for m in messages if m['isUser']]
+    out, used = [], 0
+    for line in reversed(lines):
+        if used + len(line) + 1 > max_tokens * CHARS_PER_TOKEN: break
+        out.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(out))
+
+class HistoryManager:
+    """
+    build(history) -> (summary, recent_messages)
+
+    Summaries are written in the background (pool), so a turn never waits
+    on one: until it lands, the previous summary plus a longer verbatim
+    tail (capped at max_verbatim) is used instead.
+    """
+
+    def __init__(self, summarize=None, pool=None, keep=HISTORY_KEEP, step=HISTORY_FOLD_STEP,
+                 max_verbatim=HISTORY_MAX_VERBATIM, max_tokens=HISTORY_SUMMARY_TOKENS, cache=None):
+        self.summarize = summarize  # fn(prompt) -> text, or None for the extractive fallback
+        self.pool = pool
+        self.keep = keep
+        self.step = max(2, step - step % 2)  # Even, so folds stay on user/assistant pairs
+        self.max_verbatim = max(max_verbatim, keep)
+        self.max_tokens = max_tokens
+        self.cache = cache or TTLCache(int(os.getenv('HISTORY_CACHE_SIZE', '1024')), float(os.getenv('HISTORY_CACHE_TTL', '21600')))
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def fold(self, previous, messages):
+        if self.summarize:
+            prompt = SUMMARY_PROMPT.format(words=self.max_tokens * 3 // 4, previous=previous or '(none)',
+                                           messages="\n".join(message_line(m) for m in messages))
+            try: return trim_to_tokens(self.summarize(prompt).strip(), self.max_tokens)
+            except Exception as e: print(f"History Summary Error: {e}")
+        return extractive_summary(previous, messages, self.max_tokens)
+
+    def write_summary(self, key, previous, messages):
+        try: self.cache.set(key, self.fold(previous, messages))
+        finally:
+            with self.lock: self.pending.discard(key)
+
+    def schedule(self, key, previous, messages):
+        with self.lock:
+            if key in self.pending: return
+            self.pending.add(key)
+        if self.pool: self.pool.submit(self.write_summary, key, previous, messages)
+        else: self.write_summary(key, previous, messages)
+
+    def build(self, history):
+        msgs = [{'isUser': bool(m.get('isUser')), 'text': str(m.get('text', ''))} for m in history or [] if m.get('text')]
+        fold_to = (max(0, len(msgs) - self.keep) // self.step) * self.step
+        if not fold_to: return '', self.align(msgs)
+
+        hashes = prefix_hashes(msgs[:fold_to])
+        summary = self.cache.get(hashes[fold_to])
+        if summary is not None:
+            return summary, self.align(msgs[fold_to:])
+
+        # Newest summary we already have (one step behind on a normal turn), extended in the background
+        done, previous = 0, ''
+        for n in range(fold_to - self.step, 0, -self.step):
+            cached = self.cache.get(hashes[n])
+            if cached is not None:
+                done, previous = n, cached
+                break
+        self.schedule(hashes[fold_to], previous, msgs[done:fold_to])
+        return previous, self.align(msgs[done:][-self.max_verbatim:])
+
+    @staticmethod
+    def align(recent):
+        # Gemini wants the replayed history to open with a user turn; a leading
+        # assistant reply is dropped (it is part of the next summary anyway)
+        while recent and not recent[0]['isUser']: recent = recent[1:]
+        return recent
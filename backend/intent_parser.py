@@ -0,0 +1,178 @@
+import re
+import json
+from datetime import datetime, timedelta
+
+# --- TEACHER COMMANDS WITHOUT THE LLM ---
+# A small grammar for the routine commands ("mark 101, 102 present",
+# "show students with attendance < 50%") that builds the same action dicts
+# the system prompt asks Gemini for. Anything the grammar doesn't cover
+# exactly returns None and goes to the model as before.
+
+ACTIONS = ('update_attendance', 'analyze_data')
+
+# Words that change the meaning in ways the grammar doesn't model
+AMBIGUOUS = re.compile(r"\b(not|n't|dont|except|but|unless|instead|undo|unmark|if|or|without|excluding|only)\b")
+SAFE_PHRASES = re.compile(r'\bnot (more|less|greater|fewer|higher|lower) than\b')
+
+POLITE = r"(?:(?:please|pls|kindly|can you|could you|would you|hey|ok|okay)\s+)*"
+STATUS = r"(?P<status>present|absent)"
+DATE = (r"(?:\s+(?:for|on)?\s*(?P<date>today|yesterday|\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?"
+        r"|\d{1,2}(?:st|nd|rd|th)?\s+[a-z]{3,9}))?")
+END = r"\s*(?:please)?\s*[.!]*$"
+
+MARK_TARGET_FIRST = re.compile(rf"^{POLITE}mark\s+(?:(?:the\s+)?attendance\s+(?:of|for)\s+)?(?P<target>.+?)\s+(?:as\s+)?{STATUS}{DATE}{END}")
+MARK_STATUS_FIRST = re.compile(rf"^{POLITE}mark\s+(?:attendance\s+)?(?:as\s+)?{STATUS}\s+(?:for\s+|to\s+)?(?P<target>.+?){DATE}{END}")
+
+OPS = (r"(?P<op><=|>=|==|=|<|>|below|under|less than|lower than|fewer than|above|over|more than|greater than"
+       r"|higher than|at least|at most|not more than|not less than|equal to|exactly)")
+OP_MAP = {
+    '<': '<', 'below': '<', 'under': '<', 'less than': '<', 'lower than': '<', 'fewer than': '<',
+    '>': '>', 'above': '>', 'over': '>', 'more than': '>', 'greater than': '>', 'higher than': '>',
+    '<=': '<=', 'at most': '<=', 'not more than': '<=',
+    '>=': '>=', 'at least': '>=', 'not less than': '>=',
+    '==': '==', '=': '==', 'equal to': '==', 'exactly': '==',
+}
+FIELD = r"(?P<field>attendance|marks?|scores?|cgpa)"
+NUM = r"(?P<value>\d+(?:\.\d+)?)\s*%?"
+SHOW = r"(?:show|list|find|get|display|give|fetch|which|who are)(?:\s+(?:me|all|the|those|of))*"
+STUDENTS = r"(?:students?|kids|people)?"
+HAVING = r"(?:with|having|whose|who have|that have|where)?"
+
+FILTER_FIELD_FIRST = re.compile(rf"^{POLITE}{SHOW}\s+{STUDENTS}\s*{HAVING}\s*{FIELD}\s*(?:is|are|of)?\s*{OPS}\s*{NUM}{END}")
+FILTER_VALUE_FIRST = re.compile(rf"^{POLITE}{SHOW}\s+{STUDENTS}\s*{HAVING}\s*{OPS}\s*{NUM}\s*{FIELD}{END}")
+RECORD_OF = re.compile(rf"^{POLITE}(?:{SHOW}|check|what is|what's)?\s*(?:the\s+)?(?P<field>attendance|marks|record|records|details|data|report|performance)\s+(?:of|for)\s+(?P<name>[a-z][a-z .']{{1,40}}?){END}")
+RECORD_POSSESSIVE = re.compile(rf"^{POLITE}(?:{SHOW}|check|what is|what's)?\s*(?P<name>[a-z][a-z .]{{1,40}}?)'s\s+(?P<field>attendance|marks|record|records|details|data|report|performance){END}")
+CLASS_REPORT = re.compile(rf"^{POLITE}{SHOW}\s+(?:the\s+)?(?:full\s+|class\s+|whole\s+|complete\s+|overall\s+)*attendance(?:\s+report)?(?:\s+(?:of|for)\s+(?:the\s+|my\s+|this\s+)?(?:class|all students|everyone))?{END}")
+
+ALL_TARGET = re.compile(r"^(?:all(?:\s+students)?|everyone|everybody|(?:the\s+)?(?:whole|entire)\s+class)$")
+KIND_WORDS = {
+    'ending': 'endswith', 'ends': 'endswith', 'end': 'endswith',
+    'starting': 'startswith', 'starts': 'startswith', 'start': 'startswith',
+    'beginning': 'startswith', 'begins': 'startswith', 'begin': 'startswith',
+    'containing': 'contains', 'contains': 'contains', 'contain': 'contains', 'having': 'contains',
+}
+ID_NOUN = r"(?:roll(?:\s+(?:numbers?|nos?\.?|no\.?|ids?))?|rolls|ids?)"
+PATTERN_TARGET = re.compile(
+    rf"^(?:(?:the\s+|all\s+)?(?:students?\s+)?(?:(?:with|whose|that|which|who)\s+)?(?:(?P<idnoun>{ID_NOUN})|(?P<namenoun>names?))?\s*)?"
+    r"(?P<kind>ending|ends?|starting|starts?|beginning|begins?|containing|contains?|having)\s+(?:in|with)?\s*(?P<value>[a-z0-9]+)$")
+ID_LIST_TARGET = re.compile(rf"^(?:(?:the\s+)?(?:students?\s+)?(?:{ID_NOUN}\s+)?)(?P<list>[a-z0-9][a-z0-9\s,&-]*)$")
+ID_TOKEN = re.compile(r"^[a-z]*\d[a-z0-9]*$")
+RANGE_TOKEN = re.compile(r"^(\d+)-(\d+)$")
+MAX_RANGE = 200
+
+MONTHS = {m: i for i, m in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+def normalize(msg):
+    text = msg.lower().strip()
+    text = re.sub(r"[’`]", "'", text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.replace('roll no.', 'roll no')
+
+def parse_date(word, today):
+    """'today' / 'yesterday' / ISO / dd-mm(-yyyy) / '15 jan' -> 'YYYY-MM-DD', or None if unreadable."""
+    if not word or word == 'today': return today.isoformat()
+    if word == 'yesterday': return (today - timedelta(days=1)).isoformat()
+    try:
+        if re.match(r'^\d{4}-', word): return datetime.strptime(word, '%Y-%m-%d').date().isoformat()
+        m = re.match(r'^(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?$', word)
+        if m:
+            year = int(m.group(3) or today.year)
+            if year < 100: year += 2000
+            return today.replace(year=year, month=int(m.group(2)), day=int(m.group(1))).isoformat()
+        m = re.match(r'^(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]{3})', word)
+        if m and m.group(2) in MONTHS:
+            return today.replace(month=MONTHS[m.group(2)], day=int(m.group(1))).isoformat()
+    except ValueError:
+        pass
+    return None
+
+def parse_target(target):
+    """'101, 102 and 105-107' / 'roll numbers ending in 77' / 'everyone' -> {'ids': [...]} or {'pattern': {...}}"""
+    target = target.strip()
+    if ALL_TARGET.match(target):
+        return {'pattern': {'field': 'id', 'type': 'contains', 'value': ''}}
+
+    m = PATTERN_TARGET.match(target)
+    if m:
+        value = m.group('value')
+        field = 'id' if m.group('idnoun') else 'name' if m.group('namenoun') else ('id' if value.isdigit() else 'name')
+        return {'pattern': {'field': field, 'type': KIND_WORDS[m.group('kind')], 'value': value}}
+
+    m = ID_LIST_TARGET.match(target)
+    if not m: return None
+    ids = []
+    for tok in re.split(r'\s*(?:,|&|\band\b|\s)\s*', m.group('list')):
+        if not tok: continue
+        r = RANGE_TOKEN.match(tok)
+        if r:
+            lo, hi = int(r.group(1)), int(r.group(2))
+            if hi < lo or hi - lo >= MAX_RANGE: return None
+            width = len(r.group(1))
+            ids += [str(n).zfill(width) for n in range(lo, hi + 1)]
+        elif ID_TOKEN.match(tok):
+            ids.append(tok.upper() if not tok.isdigit() else tok)
+        else:
+            return None  # A word we can't read as an id: let the model handle it
+    return {'ids': list(dict.fromkeys(ids))} if ids else None
+
+def parse_command(msg, today=None):
+    """
+    Returns the action dict for a routine teacher command, or None when the
+    message isn't one (or is ambiguous) and should go to the LLM.
+    """
+    text = normalize(msg)
+    if not text or len(text) > 300: return None
+    if AMBIGUOUS.search(SAFE_PHRASES.sub('', text)): return None
+    if text.count('present') + text.count('absent') > 1: return None
+    today = today or datetime.now().date()
+
+    m = MARK_TARGET_FIRST.match(text) or MARK_STATUS_FIRST.match(text)
+    if m:
+        target = parse_target(m.group('target'))
+        date = parse_date(m.group('date'), today)
+        if not target or not date: return None
+        return {'action': 'update_attendance', 'status': m.group('status').capitalize(), 'date': date, **target}
+
+    m = FILTER_FIELD_FIRST.match(text) or FILTER_VALUE_FIRST.match(text)
+    if m:
+        f_type = 'attendance' if m.group('field') == 'attendance' else 'marks'
+        value = float(m.group('value'))
+        return {'action': 'analyze_data', 'search_name': '', 'filter_type': f_type,
+                'operator': OP_MAP[m.group('op')], 'value': int(value) if value.is_integer() else value}
+
+    m = RECORD_OF.match(text) or RECORD_POSSESSIVE.match(text)
+    if m:
+        name = m.group('name').strip(" .'")
+        if name in ('the class', 'class', 'my class', 'this class', 'all students', 'everyone', 'all'):
+            return {'action': 'analyze_data', 'search_name': '', 'filter_type': 'attendance'}
+        f_type = 'marks' if m.group('field') == 'marks' else 'attendance'
+        return {'action': 'analyze_data', 'search_name': name, 'filter_type': f_type}
+
+    if CLASS_REPORT.match(text):
+        return {'action': 'analyze_data', 'search_name': '', 'filter_type': 'attendance'}
+    return None
+
+def resolves(cmd, students):
+    """
+    Checks a parsed command against the class roster: every id must match
+    exactly one student and a searched name must exist. Otherwise the
+    message goes to the LLM, which can see the roster and ask back.
+    """
+    if cmd.get('search_name'):
+        name = cmd['search_name'].lower()
+        return any(name in str(s.get('name', '')).lower() for s in students)
+    if 'ids' in cmd:
+        roster_ids = [str(s['student_id']) for s in students]
+        return all(sum(1 for sid in roster_ids if sid.endswith(tid)) == 1 for tid in cmd['ids'])
+    return True
+
+def extract_action(txt):
+    """Action dict from a model reply (bare JSON or a ```json block), or None for plain text."""
+    if not txt or '{' not in txt: return None
+    clean = txt.replace('```json', '').replace('```', '').strip()
+    if not clean.startswith('{'): return None  # Prose that happens to contain braces
+    try:
+        cmd = json.loads(clean[:clean.rindex('}') + 1])
+    except ValueError:
+        return None
+    return cmd if isinstance(cmd, dict) and cmd.get('action') in ACTIONS else None
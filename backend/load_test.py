@@ -0,0 +1,260 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import FakeGemini, FakeSupabase
+from db import DataAccess
+from metrics import quantile
+
+# --- OFFLINE LOAD TEST: the real Flask app against fake Gemini + Supabase ---
+# Requests go through app.test_client() (full routing, hooks and handlers),
+# only the two network clients are swapped for the in-process fakes.
+#
+#   python load_test.py                                  all scenarios, 100 requests each, 8 concurrent
+#   python load_test.py -s guest_chat -n 500 -c 32 --stream
+#   python load_test.py --save bench.json                keep a baseline
+#   python load_test.py --baseline bench.json            exit 1 if p95 / throughput regressed
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+eval_path = os.path.join(current_dir, 'retrieval_eval.json')
+
+TEACHER = 'teacher@bench.local'
+CLASS_ID = 'bench-class'
+FIRST = ['Aarav', 'Diya', 'Kabir', 'Meera', 'Rohan', 'Sana', 'Vikram', 'Isha', 'Yash', 'Tara', 'Arjun', 'Naina']
+LAST = ['Sharma', 'Verma', 'Singh', 'Gupta', 'Iyer', 'Khan', 'Das', 'Mehta', 'Rao', 'Jain']
+GUEST_FALLBACK = ["where is room 313", "DBMS unit 2 syllabus", "is there a hostel for fot students",
+                  "what are the tuition fees", "who teaches operating systems"]
+
+def roll(i):
+    return f"2023{i:05d}"
+
+def student_name(i):
+    return f"{FIRST[i % len(FIRST)]} {LAST[(i // len(FIRST)) % len(LAST)]}"
+
+def seed_tables(students, days, seed):
+    """One class with `students` students and `days` days of attendance history."""
+    rng = random.Random(seed)
+    roster = [{"student_id": roll(i), "name": student_name(i), "class_id": CLASS_ID, "teacher_email": TEACHER,
+               "details": {"Attendance": f"{rng.randint(30, 100)}%", "Marks": round(rng.uniform(4, 10), 1)}}
+              for i in range(students)]
+    records = [{"student_id": s['student_id'], "class_id": CLASS_ID, "date": f"2025-01-{d + 1:02d}",
+                "status": "Present" if rng.random() < 0.75 else "Absent"}
+               for d in range(days) for s in roster]
+    return {
+        'classes': [{"id": CLASS_ID, "name": "Bench CSE-A", "teacher_email": TEACHER}],
+        'students': roster,
+        'attendance_records': records,
+        'conversations': [],
+    }
+
+# --- 1. SCENARIOS: request i -> (path, kwargs for client.post) ---
+def guest_questions():
+    try:
+        with open(eval_path, 'r', encoding='utf-8') as f: return [c['query'] for c in json.load(f)]
+    except (OSError, ValueError):
+        return GUEST_FALLBACK
+
+def session_history(i, opts):
+    """--history N: a prior conversation of N messages, shared by every request of session i % 8."""
+    rng = random.Random(opts['seed'] + i % 8)
+    hist = []
+    for _ in range(opts['history'] // 2):
+        hist.append({'text': rng.choice(opts['questions']), 'isUser': True})
+        hist.append({'text': ' '.join(['Earlier', 'answer'] + ['lorem'] * 80) + '.', 'isUser': False})
+    return hist
+
+def scenario_guest_chat(rng, i, opts):
+    q = rng.choice(opts['questions'])
+    return '/chat', {'json': {'message': q, 'role': 'guest', 'email': f'guest{i % 50}@bench.local',
+                              'history': session_history(i, opts)}}
+
+def scenario_teacher_chat(rng, i, opts):
+    name = student_name(rng.randrange(opts['students']))
+    q = rng.choice([f"is {name} in this class?", f"show details of {name}", "list all students",
+                    "who has the highest marks", "DBMS unit 3 syllabus", "what is my timetable on monday"])
+    return '/chat', {'json': {'message': q, 'role': 'teacher', 'email': TEACHER, 'class_id': CLASS_ID,
+                              'history': session_history(i, opts)}}
+
+def scenario_bulk_attendance(rng, i, opts):
+    if rng.random() < 0.5:
+        q = f"mark roll numbers ending in {rng.randrange(10)} present"
+    else:
+        ids = rng.sample(range(opts['students']), min(5, opts['students']))
+        q = "mark " + ", ".join(roll(x)[-3:] for x in ids) + " absent"
+    return '/chat', {'json': {'message': q, 'role': 'teacher', 'email': TEACHER, 'class_id': CLASS_ID, 'history': []}}
+
+def scenario_roster_upload(rng, i, opts):
+    rows = ["Roll Number,Name"] + [f"{roll(x)},{student_name(x)}" for x in range(opts['upload_rows'])]
+    data = {'file': (io.BytesIO("\n".join(rows).encode()), 'roster.csv'),
+            'class_id': f"bench-upload-{i}", 'email': TEACHER}
+    return '/upload_smart_roster', {'data': data, 'content_type': 'multipart/form-data'}
+
+SCENARIOS = {
+    'guest_chat': scenario_guest_chat,
+    'teacher_chat': scenario_teacher_chat,
+    'bulk_attendance': scenario_bulk_attendance,
+    'roster_upload': scenario_roster_upload,
+}
+
+# --- 2. RUNNER ---
+def parse_server_timing(header):
+    """'get_context;dur=1.4, llm;dur=300.2' -> {'get_context': 1.4, 'llm': 300.2}"""
+    out = {}
+    for part in (header or '').split(','):
+        name, _, dur = part.strip().partition(';dur=')
+        if name and dur: out[name] = float(dur)
+    return out
+
+def read_reply(resp, stream):
+    """(success, stage timings in ms, LLM prompt tokens or None) for one response."""
+    if stream and resp.mimetype == 'text/event-stream':
+        done = [l[6:] for l in resp.get_data(as_text=True).splitlines() if l.startswith('data: ')][-1:]
+        payload = json.loads(done[0]) if done else {}
+        timing = payload.get('timing', {})
+        return bool(payload.get('success')), timing.get('stages_ms', {}), timing.get('llm_prompt_tokens')
+    body = resp.get_json(silent=True) or {}
+    stages = parse_server_timing(resp.headers.get('Server-Timing'))
+    stages.pop('total', None)
+    notes = json.loads(resp.headers.get('X-Chat-Stats') or '{}')
+    return resp.status_code == 200 and bool(body.get('success')), stages, notes.get('llm_prompt_tokens')
+
+def run_scenario(flask_app, name, opts):
+    build = SCENARIOS[name]
+    stream = opts['stream'] and name != 'roster_upload'
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'client'): local.client = flask_app.test_client()
+        rng = random.Random(opts['seed'] * 1_000_003 + i)  # Same request i on every run, whatever the thread order
+        path, kwargs = build(rng, i, opts)
+        if stream and path == '/chat': path = '/chat/stream'
+
+        t0 = time.perf_counter()
+        try:
+            resp = local.client.post(path, headers={'X-Debug-Timing': '1'}, **kwargs)
+            ok, stages, tokens = read_reply(resp, stream)
+        except Exception as e:
+            print(f"   ❌ {name} #{i}: {e}")
+            ok, stages, tokens = False, {}, None
+        return (time.perf_counter() - t0) * 1000, ok, stages, tokens
+
+    with ThreadPoolExecutor(max_workers=opts['concurrency']) as pool:
+        list(pool.map(one, range(-opts['warmup'], 0)))  # Warm caches/imports, not measured
+        t0 = time.perf_counter()
+        results = list(pool.map(one, range(opts['requests'])))
+        wall = time.perf_counter() - t0
+
+    lat = sorted(r[0] for r in results)
+    stage_samples = {}
+    for _, _, stages, _ in results:
+        for s, ms in stages.items(): stage_samples.setdefault(s, []).append(ms)
+    tokens = sorted(r[3] for r in results if r[3] is not None)
+
+    return {
+        'requests': len(results), 'errors': sum(1 for r in results if not r[1]),
+        'wall_s': wall, 'rps': len(results) / wall if wall else 0.0,
+        'p50_ms': quantile(lat, 0.5), 'p95_ms': quantile(lat, 0.95), 'p99_ms': quantile(lat, 0.99), 'max_ms': lat[-1],
+        'stages_p50_ms': {s: quantile(sorted(v), 0.5) for s, v in stage_samples.items()},
+        'stages_p95_ms': {s: quantile(sorted(v), 0.95) for s, v in stage_samples.items()},
+        'llm_prompt_tokens_p50': quantile(tokens, 0.5) if tokens else 0,
+    }
+
+def compare(results, baseline, tolerance):
+    """Returns the list of regressions against a saved run."""
+    problems = []
+    for name, r in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base: continue
+        if r['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            problems.append(f"{name}: p95 {r['p95_ms']:.1f} ms vs {base['p95_ms']:.1f} ms baseline")
+        if r['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f"{name}: {r['rps']:.1f} req/s vs {base['rps']:.1f} req/s baseline")
+        if r['errors'] > base['errors']:
+            problems.append(f"{name}: {r['errors']} errors vs {base['errors']} baseline")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput & latency benchmark (fake Gemini + Supabase)")
+    parser.add_argument('-s', '--scenarios', default=','.join(SCENARIOS), help="comma-separated: " + ', '.join(SCENARIOS))
+    parser.add_argument('-n', '--requests', type=int, default=100, help="measured requests per scenario")
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stream', action='store_true', help="use /chat/stream for chat scenarios")
+    parser.add_argument('--llm-latency', type=float, default=0.3, help="fake Gemini first-token latency (s)")
+    parser.add_argument('--llm-jitter', type=float, default=0.0, help="relative std-dev of the LLM latency")
+    parser.add_argument('--llm-tps', type=float, default=200, help="fake Gemini output tokens per second")
+    parser.add_argument('--db-latency', type=float, default=0.01, help="fake Supabase round-trip (s)")
+    parser.add_argument('--db-fail-rate', type=float, default=0.0, help="share of DB calls that fail with a connection error")
+    parser.add_argument('--history', type=int, default=0, help="prior messages sent with each chat request")
+    parser.add_argument('--students', type=int, default=120, help="students in the seeded class")
+    parser.add_argument('--days', type=int, default=30, help="days of seeded attendance history")
+    parser.add_argument('--upload-rows', type=int, default=500, help="rows per uploaded roster")
+    parser.add_argument('--no-cache', action='store_true', help="disable retrieval/answer/roster caches")
+    parser.add_argument('--save', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a saved JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression vs --baseline")
+    args = parser.parse_args()
+
+    # Must be set before app is imported: no real clients, no watcher thread, debug timings on
+    os.environ.update({'GEMINI_API_KEY': '', 'SUPABASE_URL': '', 'SUPABASE_KEY': '',
+                       'KB_WATCH_INTERVAL': '0', 'METRICS_DEBUG': '1'})
+    if args.no_cache:
+        os.environ.update({'RETRIEVAL_CACHE_SIZE': '0', 'ANSWER_CACHE_SIZE': '0', 'ROSTER_CACHE_SIZE': '0'})
+
+    app = importlib.import_module('app')
+    app.model = FakeGemini(latency=args.llm_latency, jitter=args.llm_jitter, tokens_per_sec=args.llm_tps, seed=args.seed)
+    app.make_model = app.model.make_model
+    app.history_manager.summarize = app.summarize_history  # Summaries cost fake LLM calls too
+    fake_db = FakeSupabase(latency=args.db_latency, tables=seed_tables(args.students, args.days, args.seed),
+                           fail_rate=args.db_fail_rate, seed=args.seed)
+    app.db = DataAccess(fake_db)
+
+    opts = {'requests': args.requests, 'concurrency': args.concurrency, 'warmup': args.warmup, 'seed': args.seed,
+            'stream': args.stream, 'history': args.history, 'students': args.students, 'upload_rows': args.upload_rows,
+            'questions': guest_questions()}
+
+    print(f"\n🏋️ {args.requests} requests/scenario, concurrency {args.concurrency}, "
+          f"LLM {args.llm_latency * 1000:.0f} ms + {args.llm_tps:.0f} tok/s, DB {args.db_latency * 1000:.0f} ms"
+          f"{f' ({args.db_fail_rate:.0%} failing)' if args.db_fail_rate else ''}"
+          f"{', streaming' if args.stream else ''}{', caches off' if args.no_cache else ''}\n")
+    print(f"{'scenario':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'LLM in':>7}")
+
+    results = {}
+    for name in [s.strip() for s in args.scenarios.split(',') if s.strip()]:
+        if name not in SCENARIOS: sys.exit(f"❌ Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        llm_before = app.model.calls
+        r = results[name] = run_scenario(app.app, name, opts)
+        r['llm_calls'] = app.model.calls - llm_before
+        print(f"{name:<16} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['errors']:>7} {r['llm_prompt_tokens_p50']:>7}")
+
+    print("\nStage p50 / p95 (ms):")
+    for name, r in results.items():
+        top = sorted(r['stages_p50_ms'].items(), key=lambda kv: -kv[1])[:6]
+        print(f"   {name:<16} " + ", ".join(f"{s} {ms:.1f}/{r['stages_p95_ms'][s]:.1f}" for s, ms in top))
+
+    app.history_pool.shutdown(wait=True)  # Let queued conversation inserts land before counting
+    calls = sorted(fake_db.calls.items(), key=lambda kv: -kv[1])
+    print("\nDB calls: " + ", ".join(f"{t}.{op} {n}" for (t, op), n in calls))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=1)
+        print(f"💾 Results -> {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f: baseline = json.load(f)
+        problems = compare(results, baseline, args.tolerance)
+        for p in problems: print(f"⚠️ Regression: {p}")
+        if problems: sys.exit(1)
+        print(f"✅ Within {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
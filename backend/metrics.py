@@ -0,0 +1,210 @@
+import os
+import math
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# In-process metrics with Prometheus text exposition (no client library).
+# Every worker process keeps its own registry, so scrape each worker (or
+# sum the series) when running more than one.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Quantiles are computed over the most recent observations per series
+WINDOW = int(os.getenv('METRICS_WINDOW', '1024'))
+
+def fmt_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ''
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in pairs) + '}'
+
+def fmt_value(v):
+    if v == float('inf'): return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile of an already sorted list."""
+    if not sorted_values: return 0.0
+    i = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, '') for l in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock: items = sorted(self.values.items())
+        out += [f"{self.name}{fmt_labels(self.labels, k)} {fmt_value(v)}" for k, v in items]
+        return out
+
+class Histogram:
+    """
+    Cumulative buckets + sum/count (Prometheus histogram), plus a sliding
+    window of recent observations exported as `<name>_recent` p50/p95/p99.
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # label values -> [bucket counts, sum, count, recent]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, '') for l in self.labels)
+        with self.lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, deque(maxlen=WINDOW)]
+            s[0][bisect.bisect_left(self.buckets, value)] += 1
+            s[1] += value
+            s[2] += 1
+            s[3].append(value)
+
+    def quantiles(self, **labels):
+        key = tuple(labels.get(l, '') for l in self.labels)
+        with self.lock:
+            s = self.series.get(key)
+            recent = sorted(s[3]) if s else []
+        return {q: quantile(recent, q) for q in QUANTILES}
+
+    def render(self):
+        hist = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        recent_name = f"{self.name}_recent"
+        summ = [f"# HELP {recent_name} {self.help} (last {WINDOW} observations)", f"# TYPE {recent_name} summary"]
+
+        with self.lock:
+            snapshot = [(k, list(s[0]), s[1], s[2], sorted(s[3])) for k, s in sorted(self.series.items())]
+
+        for key, counts, total, n, recent in snapshot:
+            running = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                running += c
+                hist.append(f"{self.name}_bucket{fmt_labels(self.labels, key, [('le', fmt_value(bound))])} {running}")
+            hist.append(f"{self.name}_sum{fmt_labels(self.labels, key)} {fmt_value(total)}")
+            hist.append(f"{self.name}_count{fmt_labels(self.labels, key)} {n}")
+
+            for q in QUANTILES:
+                summ.append(f"{recent_name}{fmt_labels(self.labels, key, [('quantile', q)])} {fmt_value(quantile(recent, q))}")
+            summ.append(f"{recent_name}_sum{fmt_labels(self.labels, key)} {fmt_value(sum(recent))}")
+            summ.append(f"{recent_name}_count{fmt_labels(self.labels, key)} {len(recent)}")
+        return hist + summ
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        m = Counter(name, help, labels)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        m = Histogram(name, help, labels, buckets)
+        self.metrics.append(m)
+        return m
+
+    def collector(self, fn):
+        """fn() -> [(name, type, help, [(labels_dict, value), ...]), ...], read at scrape time."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        out = []
+        for m in self.metrics: out += m.render()
+        for fn in self.collectors:
+            try: families = fn()
+            except Exception as e:
+                print(f"Metrics Collector Error: {e}")
+                continue
+            for name, kind, help, samples in families:
+                out += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                out += [f"{name}{fmt_labels(list(l), list(l.values()))} {fmt_value(v)}" for l, v in samples]
+        return "\n".join(out) + "\n"
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('cgpa_stage_seconds', 'Time spent in one pipeline stage', ('stage',))
+
+# --- PER-REQUEST TRACE ---
+class Trace:
+    """Stage timings and counters for one request (feeds the debug headers)."""
+
+    def __init__(self, debug=False):
+        self.started = time.perf_counter()
+        self.debug = debug
+        self.deferred = False  # Streamed responses are finished by the body generator, not teardown
+        self.stages = {}  # stage -> seconds (summed if a stage runs twice)
+        self.notes = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value: 'get_context;dur=3.1, llm;dur=812.4'"""
+        parts = [f"{s.replace(' ', '_')};dur={t * 1000:.1f}" for s, t in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self):
+        return {'stages_ms': {s: round(t * 1000, 1) for s, t in self.stages.items()},
+                'total_ms': round(self.elapsed() * 1000, 1), **self.notes}
+
+_local = threading.local()
+
+def start_trace(debug=False):
+    _local.trace = Trace(debug)
+    return _local.trace
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+def resume_trace(trace):
+    """Re-attaches a trace on the thread that iterates a streamed body."""
+    _local.trace = trace
+
+def end_trace():
+    _local.trace = None
+
+def note(**values):
+    """Attaches values (tokens, cache result...) to the current request's trace."""
+    trace = current_trace()
+    if trace: trace.notes.update(values)
+
+def record(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = current_trace()
+    if trace: trace.add(stage, seconds)
+
+@contextmanager
+def span(stage):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+def bind(fn):
+    """Wraps fn so spans inside it land on the caller's trace when run on a pool thread."""
+    trace = current_trace()
+    def run(*args, **kwargs):
+        _local.trace = trace
+        try: return fn(*args, **kwargs)
+        finally: _local.trace = None
+    return run
@@ -2,12 +2,18 @@ import os
 import json
 import re
 import time
-import pickle
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from itertools import chain
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pypdf import PdfReader
 import PIL.Image
 from sklearn.feature_extraction.text import TfidfVectorizer
+from brain_store import save_brain
+from campus_terms import BRANCHES, YEAR_WORDS, ROMAN, ACRONYM_SKIP, subject_key
 
 # --- CONFIG ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,8 +23,13 @@ env_path = os.path.join(project_root, '.env')
 
 # Paths for Saving the Brain
 kb_path = os.path.join(current_dir, 'knowledge_base.json')
-vectorizer_path = os.path.join(current_dir, 'vectorizer.pkl')
-matrix_path = os.path.join(current_dir, 'tfidf_matrix.pkl')
+brain_dir = os.path.join(current_dir, 'brain')
+timetable_index_path = os.path.join(current_dir, 'timetable_index.json')
+syllabus_index_path = os.path.join(current_dir, 'syllabus_index.json')
+build_manifest_path = os.path.join(current_dir, 'build_manifest.json')
+
+# Bump when structured_chunker changes, so cached chunks get re-split
+CHUNKER_VERSION = 4
 
 load_dotenv(env_path)
 api_key = os.getenv('GEMINI_API_KEY')
@@ -30,36 +41,170 @@ else:
     model = None
 
 def clean_text(text):
-    return re.sub(r'\s+', ' ', text).strip()
+    """Tidies whitespace but keeps line breaks - the chunker splits on them."""
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+# --- 1. STRUCTURE-AWARE CHUNKER (Headings -> small, typed chunks) ---
+# Every chunk is (text, meta). The text starts with "[Source] heading > path"
+# so it reads on its own in a prompt; meta drives retrieval pre-filtering.
+MAX_CHUNK_CHARS = 1500
+META_FIELDS = ('source', 'type', 'year', 'branch', 'subject')
+
+HEADING_RE = re.compile(r'^(#{1,6})\s*(.+?)\s*#*$')
+BOLD_LINE_RE = re.compile(r'^\*\*([^*]{2,60}?)\*\*:?$')         # **MONDAY**, **Practicals**
+CAPS_LINE_RE = re.compile(r'^[^a-z|:]{3,60}$')                    # 🎓 BASIC INFORMATION (PDF/plain text)
+UNIT_RE = re.compile(r'^\**\s*(?:Unit|Module)[\s-]*([IVX]+|\d+)\b', re.I)
+RULE_RE = re.compile(r'^\s*(?:-{3,}|\*{3,}|_{3,}|={3,})\s*$')
+KEY_LINE_RE = re.compile(r'^[^|]{1,24}\|[^|]+$')                 # CW | Computer Workshop
+SUBJECT_RE = re.compile(r'^(.+?)\s*\(((?:DSC|DSE|GE|SEC|AEC|VAC)[^)]*)\)')
+BRANCH_RE = re.compile(rf"\b({'|'.join(BRANCHES)})\b")
+# Keep 1-char tokens: unit numbers, semesters and course codes ("DSC-9") are single digits
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+
+def subject_aliases(text):
+    """{subject_key: acronym} from the timetable's acronym key ('DBMS | Database Management System')."""
+    aliases, in_key = {}, False
+    for line in text.split('\n'):
+        line = line.strip()
+        if line.startswith('#'):
+            in_key = 'subject' in line.lower()
+            continue
+        if in_key and line.count('|') == 1:
+            code, name = [p.strip() for p in line.split('|')]
+            if code.replace('-', '').replace(' ', '').isalnum() and code.isupper():
+                aliases.setdefault(subject_key(name), code)
+    return aliases
+
+def subject_acronym(name, aliases=None):
+    """Timetable acronym if known, else initials: 'Operating System' -> 'OS'"""
+    if aliases and subject_key(name) in aliases: return aliases[subject_key(name)]
+    words = [w for w in re.split(r'[\s/]+', name) if w and w.lower() not in ACRONYM_SKIP]
+    return ''.join(w[0] for w in words if w[0].isalpha()).upper()
+
+def unit_number(line):
+    """'**Unit-III: Calculus**' / '**Unit 3:** ...' -> 3"""
+    label = UNIT_RE.match(line).group(1).upper()
+    return ROMAN.get(label) or int(label)
+
+def heading_of(line):
+    """(level, title) if the line is a heading, else None. Unit lines are handled separately."""
+    m = HEADING_RE.match(line)
+    if m: return len(m.group(1)), m.group(2).strip('* ')
+    if UNIT_RE.match(line): return None
+    m = BOLD_LINE_RE.match(line)
+    if m: return 7, m.group(1).strip()
+    if CAPS_LINE_RE.match(line) and re.search(r'[A-Z]{4,}', line): return 2, line.strip()
+    return None
 
-# --- 1. UNIVERSAL SAFETY CHUNKER (Keep Syllabus Intact) ---
-def universal_chunker(text, source_tag, max_chunk_size=4000):
+def source_type(source):
+    s = source.lower()
+    if 'timetable' in s: return 'timetable'
+    if 'faculty' in s: return 'faculty_profile'
+    if 'room' in s: return 'rooms'
+    if 'syllabus' in s: return 'syllabus'
+    return 'general'
+
+def split_body(body, limit):
+    """Packs lines into pieces of at most `limit` chars (long lines are cut at sentences)."""
+    lines = []
+    for line in body.split('\n'):
+        while len(line) > limit:
+            cut = max(line.rfind('. ', 0, limit), line.rfind(' ', 0, limit))
+            cut = cut + 1 if cut > 0 else limit
+            lines.append(line[:cut].strip())
+            line = line[cut:].strip()
+        lines.append(line)
+
+    pieces, cur = [], ''
+    for line in lines:
+        if cur and len(cur) + len(line) + 1 > limit:
+            pieces.append(cur)
+            cur = ''
+        cur = f"{cur}\n{line}" if cur else line
+    if cur.strip(): pieces.append(cur)
+    return pieces
+
+def structured_chunker(text, source_tag, aliases=None, max_chunk_size=MAX_CHUNK_CHARS):
     """
-    Splits text by Headers/Units first, then by size if needed.
-    Tags every chunk with its source (e.g., [Syllabus]).
+    Splits on the heading hierarchy (Markdown #, whole-line **bold**, CAPS
+    lines from PDFs) and on Unit/Module lines, so each chunk is one syllabus
+    unit / faculty profile section / timetable day. Headings are kept as a
+    breadcrumb on every chunk; syllabus subjects also get their acronym
+    (from `aliases`) so "DBMS" finds "Database Management Systems".
+    Returns [(text, meta), ...].
     """
-    # Step A: Semantic Split (Headers, Units, Horizontal Rules)
-    semantic_chunks = re.split(r'(?=\n## |\n---|Unit \d|Module \d)', text)
-    
-    final_chunks = []
-    
-    for chunk in semantic_chunks:
-        chunk = chunk.strip()
-        if not chunk: continue
-        
-        # Add Source Tag
-        tagged_chunk = f"[{source_tag}] {chunk}"
-        
-        # Step B: Size Safety Check
-        if len(tagged_chunk) <= max_chunk_size:
-            final_chunks.append(tagged_chunk)
-        else:
-            # If chunk is massive, slice it with overlap
-            for i in range(0, len(chunk), max_chunk_size - 200):
-                slice_text = chunk[i : i + max_chunk_size]
-                final_chunks.append(f"[{source_tag}] {slice_text}")
-                
-    return final_chunks
+    kind = source_type(source_tag)
+    m = re.match(r'(first|second|third|fourth) year', source_tag.lower())
+    doc_year = YEAR_WORDS[m.group(1)] if m else None
+    # Syllabus files put subjects (##) under branch headings (### ... (CSE CORE)),
+    # so the last branch heading scopes the subjects that follow it
+    sticky = kind == 'syllabus'
+
+    # Day markers are sometimes glued to neighbouring timetable lines
+    text = re.sub(r'\s*(\*\*(?:MONDAY|TUESDAY|WEDNESDAY|THURSDAY|FRIDAY|SATURDAY)\*\*)\s*', r'\n\1\n', text)
+
+    chunks = []
+    path = []                      # [(level, title)]
+    branch_scope = None
+    block, unit = [], None
+
+    def flush():
+        body = '\n'.join(l for l in block if not RULE_RE.match(l)).strip()
+        if not re.search(r'\w', body): return
+
+        titles = [t for lvl, t in path if lvl > 1]  # The document title is just the source again
+        year, branch, subject = doc_year, branch_scope, None
+        for _, t in path:
+            y = re.search(r'(\d)(?:st|nd|rd|th)\s+YEAR', t, re.I)
+            if y: year = int(y.group(1))
+            b = BRANCH_RE.search(t)
+            if b: branch = b.group(1)
+            sm = SUBJECT_RE.match(t)
+            if sm and kind == 'syllabus': subject = sm.group(1).strip()
+
+        crumb = []
+        for t in titles:
+            sm = SUBJECT_RE.match(t)
+            acr = subject_acronym(sm.group(1), aliases) if sm else ''
+            crumb.append(f"{t} [{acr}]" if len(acr) >= 2 and acr not in t else t)
+        if unit: crumb.append(f"Unit {unit}")  # Arabic, so "unit 2" also finds "Unit-II"
+        scope = ", ".join(x for x in [f"Year {year}" if year else '', branch or ''] if x)
+        header = " ".join(x for x in [f"[{source_tag}]", " > ".join(crumb), f"({scope})" if scope else ''] if x)
+
+        meta = {'source': source_tag,
+                'type': 'syllabus_unit' if kind == 'syllabus' and unit else kind,
+                'year': str(year) if year else None, 'branch': branch, 'subject': subject}
+        # Acronym keys ("CW | Computer Workshop") get one chunk per entry: a
+        # question about one code then matches a short chunk instead of a long
+        # list where that code is a single line among thirty
+        lines = body.split('\n')
+        if len(lines) > 1 and all(KEY_LINE_RE.match(l) for l in lines): pieces = lines
+        else: pieces = split_body(body, max(200, max_chunk_size - len(header) - 1))
+        for piece in pieces:
+            chunks.append((f"{header}\n{piece}", meta))
+
+    for raw in text.split('\n'):
+        line = raw.strip()
+        h = heading_of(line) if line else None
+        if h:
+            flush()
+            block, unit = [], None
+            level, title = h
+            while path and path[-1][0] >= level: path.pop()
+            if sticky and level <= 3 and not SUBJECT_RE.match(title):
+                path = [p for p in path if not SUBJECT_RE.match(p[1])]  # A section heading closes the subject
+                b = BRANCH_RE.search(title)
+                branch_scope = b.group(1) if b else None
+            path.append(h)
+            continue
+        if UNIT_RE.match(line):
+            flush()
+            block, unit = [], unit_number(line)
+        block.append(line)
+    flush()
+    return chunks
 
 # --- 2. FILE READERS ---
 def analyze_image(image_path):
@@ -83,64 +228,464 @@ def extract_pdf_text(pdf_path):
     except Exception: return ""
     return clean_text(text)
 
-# --- 3. TRAINING THE BRAIN ---
-def create_knowledge_base():
+def read_text(fp):
+    try:
+        with open(fp, 'r', encoding='utf-8') as txt: return txt.read()
+    except Exception:
+        return ""
+
+# --- 3. STRUCTURED TIMETABLE & ROOM INDEX ---
+DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY']
+
+def to_minutes(hhmm):
+    h, m = hhmm.split(':')
+    return int(h) * 60 + int(m)
+
+def normalize_room(raw):
+    """'Room R1 (DUCC)' / 'r1' / '313 ' -> 'R1' / 'R1' / '313'"""
+    raw = re.sub(r'(?i)^room\s*', '', raw.strip())
+    raw = re.sub(r'\s*\(.*?\)\s*$', '', raw)
+    return raw.strip().upper()
+
+def parse_timetable(text):
+    """
+    Turns timetable.txt into flat slot rows:
+    {day, start, end, year, section, subject, room, faculty} (times in minutes).
+    Tolerates the file's quirks: '-' vs '–', missing spaces, and day headers
+    glued onto the end/start of entry lines.
+    """
+    slots, faculty = [], {}
+    entry_re = re.compile(r'^(\d{1,2}:\d{2})\s*[–-]\s*(\d{1,2}:\d{2})\s*:\s*(.+)$')
+    section_re = re.compile(r'^#+\s*(\d)(?:st|nd|rd|th)\s+YEAR\s*[–-]\s*([A-Z]+(?:-[A-Z])?)', re.I)
+    year, section, day = None, None, None
+    in_faculty_table = False
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            m = section_re.match(stripped)
+            year, section = (int(m.group(1)), m.group(2).upper()) if m else (None, None)
+            day = None
+            in_faculty_table = 'faculty acronyms' in stripped.lower()
+            continue
+
+        if in_faculty_table:
+            if '|' in stripped:
+                code, name = [p.strip() for p in stripped.split('|', 1)]
+                if code and code.isupper(): faculty.setdefault(code, name)
+            continue
+
+        if not section: continue
+
+        # Some lines carry a day header and an entry separated by a run of spaces
+        for piece in re.split(r'\s{3,}', stripped):
+            piece = piece.strip()
+            if not piece: continue
+            if piece.strip('*').strip().upper() in DAYS:
+                day = piece.strip('*').strip().upper()
+                continue
+            m = entry_re.match(piece)
+            if not m or not day: continue
+
+            body = m.group(3).strip()
+            room, fac = None, None
+            # Last parenthesised group is "(Room X, FAC)" or just "(FAC)"
+            tail = re.search(r'\(([^()]*)\)\s*$', body)
+            if tail:
+                inner = tail.group(1)
+                rm = re.match(r'\s*Room\s*([^,]+?)\s*,\s*(.+)$', inner, re.I)
+                if rm:
+                    room, fac = normalize_room(rm.group(1)), rm.group(2).strip()
+                    body = body[:tail.start()].strip()
+                elif re.fullmatch(r'[A-Z/ ]+', inner.strip()):
+                    fac = inner.strip()
+                    body = body[:tail.start()].strip()
+
+            slots.append({
+                "day": day, "start": to_minutes(m.group(1)), "end": to_minutes(m.group(2)),
+                "year": year, "section": section, "subject": body,
+                "room": room, "faculty": fac,
+            })
+
+    return slots, faculty
+
+def parse_room_inventory(text):
+    """
+    Reads class_rooms.txt into {room: {type, desc}} plus the floor-plan lines
+    used to answer "where is X?".
+    """
+    rooms, layout = {}, []
+    kind, building = None, None
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('###'):
+            building = stripped.strip('#').strip()
+        elif stripped.startswith('##'):
+            building = None
+        elif stripped.upper() == '[LECTURE HALLS]':
+            kind = 'lecture'
+        elif stripped.upper() == '[LABORATORIES]':
+            kind = 'lab'
+        elif stripped.startswith('* **') and building:
+            m = re.match(r'\*\s*\*\*(.+?):\*\*\s*(.+)$', stripped)
+            if m: layout.append({"building": building, "floor": m.group(1), "desc": m.group(2)})
+        elif stripped.startswith('- Room') and kind:
+            name, _, desc = stripped[2:].partition(':')
+            rooms[normalize_room(name)] = {"type": kind, "desc": desc.strip()}
+        elif not stripped.startswith(('-', '(')) and stripped:
+            kind = None
+
+    return rooms, layout
+
+def build_timetable_index():
+    """Compiles timetable.txt + class_rooms.txt into timetable_index.json."""
+    tt_path = os.path.join(data_dir, 'timetable.txt')
+    cr_path = os.path.join(data_dir, 'class_rooms.txt')
+    if not os.path.exists(tt_path) or not os.path.exists(cr_path): return
+
+    with open(tt_path, 'r', encoding='utf-8') as f: slots, faculty = parse_timetable(f.read())
+    with open(cr_path, 'r', encoding='utf-8') as f: rooms, layout = parse_room_inventory(f.read())
+
+    index = {"slots": slots, "faculty": faculty, "rooms": rooms, "layout": layout}
+    with open(timetable_index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+
+    print(f"   ✅ Timetable Index Saved: {len(slots)} slots, {len(rooms)} rooms.")
+
+# --- 3.5 STRUCTURED SYLLABUS INDEX (year -> branch -> subject -> units) ---
+CITE_RE = re.compile(r'\s*\[cite(?:_start|_end)?(?::[^\]]*)?\]')
+TABLE_CODE_RE = re.compile(r'^([A-Z]{2,3})(?:-(\d+(?:/\d+)*))?$')
+UNIT_LINE_RE = re.compile(r'^\**\s*(?:Unit|Module)[\s-]*(?:[IVX]+|\d+)\b\s*[:.-]?\s*(.*)$', re.I)
+JOB_LINE_RE = re.compile(r'^\*\*\s*Job\s*(\d+)\s*[.:]\s*(.+?)\s*\*\*$', re.I)  # Workshops list practical jobs, not units
+SUMMARY_ITEM_RE = re.compile(r'^[*-]\s*\*\*(.+?):?\*\*:?\s*(.*)$')
+
+def table_codes(cell):
+    """'DSC-2/5' -> ['DSC-2', 'DSC-5'], 'SEC' -> ['SEC']"""
+    m = TABLE_CODE_RE.match(cell.replace(' ', ''))
+    if not m: return []
+    return [f"{m.group(1)}-{n}" for n in m.group(2).split('/')] if m.group(2) else [m.group(1)]
+
+def parse_syllabus(text, year, aliases=None):
+    """
+    One year's syllabus file -> [subject, ...] with units, plus the
+    semester/credits from the course-structure tables. Subjects before any
+    SECTION banner (first year) are common to every branch.
+    """
+    subjects, structure = [], {}  # (branch, code) -> {semesters, credits}
+    branch, semester, cur, unit, summary = None, None, None, None, False
+
+    for raw in text.split('\n'):
+        line = CITE_RE.sub('', raw).strip()
+        if not line or RULE_RE.match(line): continue
+
+        if line.upper().startswith('SECTION') and BRANCH_RE.search(line):
+            branch, semester, cur, unit = BRANCH_RE.search(line).group(1), None, None, None
+            continue
+
+        h = HEADING_RE.match(line)
+        if h:
+            title = h.group(2).strip('* ')
+            sem = re.search(r'SEMESTER\s*(\d)', title, re.I)
+            sm = SUBJECT_RE.match(title)
+            semester = int(sem.group(1)) if sem and 'STRUCTURE' in title.upper() else None
+            unit, summary = None, 'SUMMARY' in title.upper()
+            cur = None
+            if sm:
+                cur = {'name': sm.group(1).strip(), 'code': sm.group(2).strip(), 'branch': branch,
+                       'objectives': '', 'units': [], 'summary': ''}
+                subjects.append(cur)
+            continue
+
+        if line.startswith('|'):
+            cells = [c.strip(' *') for c in line.strip('|').split('|')]
+            if semester and len(cells) >= 3:
+                for code in table_codes(cells[0]):
+                    row = structure.setdefault((branch, code), {'semesters': [], 'credits': None})
+                    if semester not in row['semesters']: row['semesters'].append(semester)
+                    if cells[2].isdigit(): row['credits'] = int(cells[2])
+            continue
+
+        if summary:
+            m = SUMMARY_ITEM_RE.match(line)
+            if m:
+                subjects.append({'name': m.group(1).strip(), 'code': 'DSE', 'branch': branch,
+                                 'objectives': '', 'units': [], 'summary': m.group(2).strip()})
+            continue
+
+        if CAPS_LINE_RE.match(line) and re.search(r'[A-Z]{4,}', line):
+            cur, unit = None, None  # DETAILED SYLLABUS - SEMESTER 2
+            continue
+        if not cur: continue
+        job = JOB_LINE_RE.match(line)
+        if job:
+            unit = {'n': int(job.group(1)), 'title': job.group(2).strip(' :'), 'text': ''}
+            cur['units'].append(unit)
+        elif UNIT_RE.match(line):
+            rest = UNIT_LINE_RE.match(line).group(1).strip()
+            if rest.startswith('**'): title, body = '', rest.strip('* ')       # **Unit 1:** Fundamentals: ...
+            elif rest.endswith('**'): title, body = rest.strip('* :'), ''      # **Unit-I: Matrices** + lines below
+            else: title, body = '', rest
+            if not title and ':' in body[:40]: title, body = [p.strip() for p in body.split(':', 1)]
+            unit = {'n': unit_number(line), 'title': title, 'text': body}
+            cur['units'].append(unit)
+        elif line.startswith('**Course Objectives:**'):
+            cur['objectives'] = line.split(':**', 1)[1].strip()
+        elif line.startswith('**'):
+            unit = None  # **Suggested Readings:**, **Credits:** ... end the unit text
+        elif unit:
+            unit['text'] = f"{unit['text']} {line.lstrip('*- ')}".strip()
+        elif not cur['units']:
+            cur['summary'] = f"{cur['summary']} {line.strip('*_ ')}".strip()
+
+    for s in subjects:
+        row = structure.get((s['branch'], s['code'].split('/')[0])) or structure.get((None, s['code'].split('/')[0])) or {}
+        s['semesters'] = sorted(row.get('semesters', []))
+        s['credits'] = row.get('credits')
+        s['year'] = str(year)
+        s['acronym'] = subject_acronym(s['name'], aliases)
+        s['kind'] = 'core' if s['code'].startswith('DSC') else 'elective' if s['code'].startswith(('DSE', 'GE')) else 'other'
+    return subjects
+
+def build_syllabus_index(aliases=None):
+    """Compiles *_year_syllabus.txt into syllabus_index.json: {years: {year: {branch: [subject]}}}."""
+    years = {}
+    for f in sorted(os.listdir(data_dir)):
+        m = re.match(r'(first|second|third|fourth)_year_syllabus\.txt$', f)
+        if not m: continue
+        year = YEAR_WORDS[m.group(1)]
+        with open(os.path.join(data_dir, f), 'r', encoding='utf-8') as fh: subjects = parse_syllabus(fh.read(), year, aliases)
+
+        branches = {b: [] for b in BRANCHES}
+        for s in subjects:
+            branch = s.pop('branch')
+            scope = [branch] if branch else list(BRANCHES)
+            s['branches'] = scope
+            for b in scope: branches[b].append(s)
+        for subs in branches.values():
+            subs.sort(key=lambda s: ({'core': 0, 'other': 1, 'elective': 2}[s['kind']], s['semesters'][:1] or [99]))
+        years[str(year)] = branches
+
+    with open(syllabus_index_path, 'w', encoding='utf-8') as f:
+        json.dump({'years': years}, f, indent=1)
+
+    total = sum(len(subs) for branches in years.values() for subs in branches.values())
+    print(f"   ✅ Syllabus Index Saved: {len(years)} years, {total} subject entries.")
+
+# --- 4. BUILD MANIFEST (Incremental Rebuilds) ---
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): h.update(block)
+    return h.hexdigest()
+
+def load_build_manifest():
+    """
+    {file: {hash, content, chunks, chunker_version, aliases}} from the last run.
+    Extracted text is reused whenever the hash matches (so images are never
+    re-sent to Gemini); chunks are reused if the chunker hasn't changed.
+    Files that gave no text are kept as {hash, failed: true} entries.
+    """
+    if not os.path.exists(build_manifest_path): return {}
+    try:
+        with open(build_manifest_path, 'r', encoding='utf-8') as f: return json.load(f).get('files', {})
+    except Exception:
+        return {}
+
+def save_build_manifest(files):
+    # Temp file + rename: a crash mid-write never leaves a truncated manifest
+    tmp_path = build_manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"chunker_version": CHUNKER_VERSION, "files": files}, f, indent=1)
+    os.replace(tmp_path, build_manifest_path)
+
+# --- 5. PARALLEL INGESTION ---
+# PDFs are CPU-bound (pure-Python parsing) -> process pool.
+# Images wait on Gemini -> threads, with a token bucket instead of sleep(1).
+# Each pool is only started when there are files of its kind to extract
+# (the current knowledge_source is all .txt, so neither runs today).
+PDF_WORKERS = int(os.getenv('INGEST_PDF_WORKERS', str(os.cpu_count() or 2)))
+IMAGE_WORKERS = int(os.getenv('INGEST_IMAGE_WORKERS', '4'))
+IMAGE_RATE = float(os.getenv('INGEST_IMAGE_RATE', '1'))      # Vision calls per second (sustained)
+IMAGE_BURST = int(os.getenv('INGEST_IMAGE_BURST', '2'))
+
+class TokenBucket:
+    """Thread-safe rate limiter: `rate` acquisitions/sec, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def extract_sources(jobs):
+    """
+    jobs: [(filename, path)]. Yields (filename, text) as each extraction
+    finishes, so chunking overlaps with the slow files still in flight.
+    """
+    pdfs = [(f, fp) for f, fp in jobs if f.lower().endswith('.pdf')]
+    images = [(f, fp) for f, fp in jobs if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    texts = [(f, fp) for f, fp in jobs if f.lower().endswith('.txt')]
+
+    bucket = TokenBucket(IMAGE_RATE, IMAGE_BURST)
+    def limited_image(fp):
+        if model: bucket.acquire()  # Only real API calls are rate-limited
+        return analyze_image(fp)
+
+    with ExitStack() as stack:
+        futures = {}
+        if pdfs:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=max(1, min(PDF_WORKERS, len(pdfs)))))
+            for f, fp in pdfs:
+                print(f"   📄 Processing PDF: {f}")
+                futures[pool.submit(extract_pdf_text, fp)] = f
+        if images:
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=max(1, min(IMAGE_WORKERS, len(images)))))
+            for f, fp in images: futures[pool.submit(limited_image, fp)] = f
+
+        # Text files are just a read - do them while the pools work
+        for f, fp in texts:
+            print(f"   📝 Processing Text: {f}")
+            yield f, read_text(fp)
+
+        for fut in as_completed(futures):
+            try:
+                yield futures[fut], fut.result()
+            except Exception as e:
+                print(f"   ⚠️  Extraction failed for {futures[fut]}: {e}")
+                yield futures[fut], ""
+
+# --- 6. TRAINING THE BRAIN ---
+def create_knowledge_base(full=False, retry_failed=False):
     print("------------------------------------------------")
     print("🧠 TRAINING AI BRAIN (TF-IDF + CHUNKING)")
     print("------------------------------------------------")
     
     if not os.path.exists(data_dir): return
 
-    # We now use a FLAT LIST for TF-IDF, not a Dictionary
-    all_knowledge_chunks = []
-    files = os.listdir(data_dir)
+    previous = {} if full else load_build_manifest()
+    current = {}
+    changed = False
 
-    for f in files:
+    # Subject acronyms (DBMS, ADA, ...) from the timetable key, stamped onto syllabus chunks
+    aliases = {}
+    tt_path = os.path.join(data_dir, 'timetable.txt')
+    if os.path.exists(tt_path):
+        with open(tt_path, 'r', encoding='utf-8') as tt: aliases = subject_aliases(tt.read())
+    alias_digest = hashlib.sha1(json.dumps(aliases, sort_keys=True).encode()).hexdigest()[:12]
+
+    # 1. FIND SOURCES & WHAT CAN BE REUSED
+    sources = {}  # file -> (path, hash, cached entry)
+    for f in sorted(os.listdir(data_dir)):
         if f.startswith('.'): continue
         fp = os.path.join(data_dir, f)
-        content = ""
-        
-        # 1. READ CONTENT
-        if f.lower().endswith(('.png', '.jpg', '.jpeg')):
-            content = analyze_image(fp)
-            time.sleep(1) 
-        elif f.lower().endswith('.pdf'):
-            print(f"   📄 Processing PDF: {f}")
-            content = extract_pdf_text(fp)
-        elif f.lower().endswith('.txt'):
-            try:
-                print(f"   📝 Processing Text: {f}")
-                with open(fp, 'r', encoding='utf-8') as txt: content = txt.read()
-            except: pass
+        if not f.lower().endswith(('.png', '.jpg', '.jpeg', '.pdf', '.txt')): continue
+        sources[f] = (fp, file_hash(fp), previous.get(f))
+
+    def fresh_chunker(cached):
+        return cached and cached.get('chunker_version') == CHUNKER_VERSION and cached.get('aliases') == alias_digest
 
-        if not content: continue
+    def retry(f, cached):
+        # A recorded failure is retried on request, or once images can actually be read
+        is_image = f.lower().endswith(('.png', '.jpg', '.jpeg'))
+        return retry_failed or (is_image and bool(model) and not cached.get('model'))
+
+    def reuse_content(f, digest, cached):
+        # Byte-identical files skip extraction (images are never re-sent to Gemini);
+        # PDFs are cheap to re-read and their cleaning changes with the chunker
+        if not cached or cached['hash'] != digest: return False
+        if cached.get('failed'): return not retry(f, cached)
+        return fresh_chunker(cached) or not f.lower().endswith('.pdf')
+
+    pending = [(f, fp) for f, (fp, digest, cached) in sources.items() if not reuse_content(f, digest, cached)]
+    reused = ((f, cached['content']) for f, (fp, digest, cached) in sources.items() if reuse_content(f, digest, cached))
+    if pending: changed = True
+
+    # 2. EXTRACT (in parallel) & CHUNK EACH FILE AS IT ARRIVES
+    for f, content in chain(reused, extract_sources(pending)):
+        fp, digest, cached = sources[f]
+        # A failed image/PDF extraction is recorded against its hash, so an
+        # unchanged file doesn't dirty every build; it's retried when the file
+        # changes or with --retry-failed
+        if not content and not f.lower().endswith('.txt'):
+            if not (cached and cached.get('failed') and cached['hash'] == digest):
+                print(f"   ⚠️  No text from {f} (skipped until it changes, or --retry-failed)")
+            current[f] = {"hash": digest, "content": "", "chunks": [], "failed": True, "model": bool(model)}
+            continue
 
-        # 2. PROCESS CHUNKS
         # We use the filename as the "Source Tag" so the AI knows where data came from
         tag = f.replace('.txt', '').replace('.pdf', '').replace('_', ' ').title()
-        
-        chunks = universal_chunker(content, source_tag=tag)
-        all_knowledge_chunks.extend(chunks)
-        print(f"      -> Extracted {len(chunks)} segments.")
 
-    # 3. SAVE TEXT DATABASE
-    # This is the human-readable text
-    with open(kb_path, 'w', encoding='utf-8') as f: 
-        json.dump(all_knowledge_chunks, f, indent=4)
-    
-    print(f"   ✅ Text Database Saved: {len(all_knowledge_chunks)} total chunks.")
+        if cached and cached['hash'] == digest and fresh_chunker(cached):
+            chunks = cached['chunks']
+        else:
+            changed = True
+            chunks = [list(c) for c in structured_chunker(content, tag, aliases)] if content else []
+            if chunks: print(f"      -> {f}: {len(chunks)} segments.")
+
+        current[f] = {"hash": digest, "content": content, "chunks": chunks,
+                      "chunker_version": CHUNKER_VERSION, "aliases": alias_digest}
+
+    # Files finish in any order; the brain is always built in filename order (stable build id)
+    current = {f: current[f] for f in sorted(current)}
 
-    # 4. TRAIN VECTORIZER (The "Regression" Part)
+    if set(current) != set(previous): changed = True  # Added or deleted files
+
+    if not changed and all(os.path.exists(p) for p in (os.path.join(brain_dir, 'manifest.json'), timetable_index_path, syllabus_index_path)):
+        print(f"   ♻️  No source changes ({len(current)} files). Brain is up to date.")
+        return
+
+    # 3. TRAIN VECTORIZER (The "Regression" Part)
+    # IDF depends on every chunk, so this is always a refit - but on cached
+    # chunks it's milliseconds; the slow part (extraction/OCR) is skipped above.
+    # The fit is not streamed: IDF, the BM25 statistics and the char n-gram
+    # channel all need the whole corpus, and save_brain() passes over the
+    # chunks several times, so they are held in one list (memory grows with
+    # the corpus - a few MB for a few thousand chunks).
     print("   ⚙️  Training Math Model (TF-IDF)...")
-    vectorizer = TfidfVectorizer(stop_words='english')
+    vectorizer = TfidfVectorizer(stop_words='english', token_pattern=TOKEN_PATTERN)
+    all_knowledge_chunks = [text for entry in current.values() for text, _ in entry['chunks']]
+    all_meta = [meta for entry in current.values() for _, meta in entry['chunks']]
     tfidf_matrix = vectorizer.fit_transform(all_knowledge_chunks)
+
+    # 4. SAVE TEXT DATABASE
+    # This is the human-readable text (with each chunk's metadata)
+    with open(kb_path, 'w', encoding='utf-8') as f: 
+        json.dump([{"text": t, **m} for t, m in zip(all_knowledge_chunks, all_meta)], f, indent=4)
     
-    # 5. SAVE THE BRAIN
-    with open(vectorizer_path, 'wb') as f: pickle.dump(vectorizer, f)
-    with open(matrix_path, 'wb') as f: pickle.dump(tfidf_matrix, f)
+    print(f"   ✅ Text Database Saved: {len(all_knowledge_chunks)} total chunks.")
+
+    # 5. SAVE THE BRAIN (mmap-friendly .npy arrays, no pickles)
+    manifest = save_brain(brain_dir, all_knowledge_chunks, vectorizer, tfidf_matrix, meta=all_meta)
     
     print(f"   ✅ Model Trained! Vocab Size: {len(vectorizer.vocabulary_)}")
-    print(f"   ✅ Saved to {vectorizer_path}")
+    print(f"   ✅ Saved to {brain_dir} (build {manifest['build_id']})")
+
+    # 6. STRUCTURED TIMETABLE (For Room/Vacancy lookups)
+    build_timetable_index()
+
+    # 7. STRUCTURED SYLLABUS (For subject/unit lookups)
+    build_syllabus_index(aliases)
+
+    # 8. BUILD MANIFEST - last, so a run that dies above is redone next time
+    # instead of being marked up to date over half-written outputs
+    save_build_manifest(current)
 
 if __name__ == "__main__":
-    create_knowledge_base()
\ No newline at end of file
+    import sys
+    # --full ignores the build manifest and re-extracts every file;
+    # --retry-failed re-extracts only the files that gave no text last time
+    create_knowledge_base(full='--full' in sys.argv, retry_failed='--retry-failed' in sys.argv)
\ No newline at end of file
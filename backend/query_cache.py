@@ -0,0 +1,65 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+def normalize_query(text):
+    """'  Where is ROOM 313?? ' -> 'where is room 313'"""
+    text = re.sub(r'\s+', ' ', text.lower()).strip()
+    return re.sub(r'^[^\w]+|[^\w]+$', '', text)
+
+def text_hash(*parts):
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live. Oldest entries are
+    evicted once `maxsize` is reached; expired entries are dropped on read.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0: return
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
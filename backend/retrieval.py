@@ -0,0 +1,232 @@
+import os
+import re
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from campus_terms import YEAR_RE, SEM_RE, BRANCH_WORDS, YEAR_WORDS
+
+DEFAULT_TOP_K = 8
+DEFAULT_THRESHOLD = 0.1
+
+def top_k(ids, scores, k, threshold):
+    """
+    Drops scores <= threshold first, then picks the k best with a partial
+    select (O(n)) and only sorts those k. Returns [(chunk_id, score), ...].
+    """
+    keep = scores > threshold
+    ids, scores = ids[keep], scores[keep]
+    if len(scores) > k:
+        # kth best score via partition; ties at the cut go to the lowest chunk ids
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        ties = ties[np.argsort(ids[ties], kind='stable')][:k - len(above)]
+        sel = np.concatenate([above, ties])
+        ids, scores = ids[sel], scores[sel]
+    order = np.lexsort((ids, -scores))  # Score desc, ties by chunk id
+    return [(int(ids[i]), float(scores[i])) for i in order]
+
+def query_filters(query, brain):
+    """
+    Metadata the question pins down explicitly: "2nd year", "sem 5",
+    "CSE", or a subject's full name -> {'year': '2', 'branch': 'CSE', ...}.
+    Only fields the brain actually has are returned.
+    """
+    q = query.lower()
+    where = {}
+
+    m = YEAR_RE.search(q)
+    if m: where['year'] = str(YEAR_WORDS.get(m.group(1), m.group(2)))
+    else:
+        m = SEM_RE.search(q)
+        if m: where['year'] = str((int(m.group(1)) + 1) // 2)
+
+    for word, branch in BRANCH_WORDS.items():
+        if re.search(rf'\b{word}\b', q):
+            where['branch'] = branch
+            break
+
+    subjects = [s for s in brain.meta_values.get('subject', []) if s.lower() in q]
+    if subjects: where['subject'] = max(subjects, key=len)  # "Electrical Machines-II" over "Electrical Machines"
+
+    return {f: v for f, v in where.items() if f in brain.meta_codes}
+
+def scoring_query(query, where):
+    """
+    The query minus the year words a `where` filter already applies: "DSC-1
+    1st year" must not rank every "1st YEAR" timetable heading above the
+    course table once only first-year chunks are left anyway.
+    """
+    if not where or 'year' not in where: return query
+    rest = SEM_RE.sub(' ', YEAR_RE.sub(' ', query.lower()))
+    return rest if re.search(r'\w', rest) else query
+
+def gather(ptr, docs, data, terms, weights):
+    """Sum of weight * posting value per chunk over the given terms -> (chunk ids, scores)."""
+    if not len(terms): return np.zeros(0, np.int32), np.zeros(0, np.float32)
+    hit_docs, contrib = [], []
+    for t, w in zip(terms, weights):
+        lo, hi = ptr[t], ptr[t + 1]
+        hit_docs.append(docs[lo:hi])
+        contrib.append(data[lo:hi] * w)
+    hit_docs = np.concatenate(hit_docs)
+    uniq, inverse = np.unique(hit_docs, return_inverse=True)
+    return uniq, np.bincount(inverse, weights=np.concatenate(contrib)).astype(np.float32)
+
+# --- RANKERS ---
+# Every ranker scores into roughly [0, 1] so one threshold scale works for all.
+
+class TfidfRanker:
+    """Cosine similarity over the TF-IDF postings (the original behaviour)."""
+    name = 'tfidf'
+    threshold = DEFAULT_THRESHOLD
+
+    def __init__(self, brain):
+        self.brain = brain
+        self.post_ptr, self.post_docs, self.post_data = brain.postings
+
+    def score(self, query):
+        terms, weights = self.brain.query_terms(query)
+        return gather(self.post_ptr, self.post_docs, self.post_data, terms, weights)
+
+class BM25Ranker:
+    """
+    Okapi BM25 with a boost for terms in the chunk's heading line
+    ("[Second Year Syllabus] Database Management Systems (DSC-9) [DBMS]").
+    Scores are divided by the query's best possible score (every term
+    saturated), so 1.0 means "every query term, heavily".
+    """
+    name = 'bm25'
+    threshold = float(os.getenv('BM25_THRESHOLD', '0.25'))
+
+    def __init__(self, brain, k1=1.2, b=0.75, field_boost=None):
+        if brain.bm25 is None: raise ValueError("brain has no BM25 statistics (rebuild with process_data.py)")
+        self.brain = brain
+        self.k1, self.b = k1, b
+        self.field_boost = float(os.getenv('BM25_FIELD_BOOST', '3')) if field_boost is None else field_boost
+        self.post_ptr, self.post_docs, _ = brain.postings
+        self.post_tf, self.post_hf, doc_len = brain.bm25
+        self.len_norm = 1 - b + b * (np.asarray(doc_len) / max(float(np.mean(doc_len)), 1.0))
+        n = len(brain.chunks)
+        df = np.diff(np.asarray(self.post_ptr)).astype(np.float32)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def score(self, query):
+        terms, _ = self.brain.query_terms(query)
+        if not len(terms): return np.zeros(0, np.int32), np.zeros(0, np.float32)
+
+        hit_docs, contrib = [], []
+        for t in terms:
+            lo, hi = self.post_ptr[t], self.post_ptr[t + 1]
+            docs = self.post_docs[lo:hi]
+            tf = self.post_tf[lo:hi] + (self.field_boost - 1) * self.post_hf[lo:hi]
+            hit_docs.append(docs)
+            contrib.append(self.idf[t] * tf * (self.k1 + 1) / (tf + self.k1 * self.len_norm[docs]))
+
+        hit_docs = np.concatenate(hit_docs)
+        uniq, inverse = np.unique(hit_docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contrib))
+        ceiling = float(self.idf[terms].sum()) * (self.k1 + 1)
+        return uniq, (scores / ceiling).astype(np.float32)
+
+class CharNgramRanker:
+    """Cosine over character 3-4 grams: survives codes, initials and odd spellings."""
+    name = 'char'
+    threshold = DEFAULT_THRESHOLD
+
+    def __init__(self, brain):
+        if brain.char is None: raise ValueError("brain has no char n-gram channel (rebuild with process_data.py)")
+        self.brain = brain
+        _, _, self.ptr, self.docs, self.data = brain.char
+
+    def score(self, query):
+        terms, weights = self.brain.char_terms(query)
+        return gather(self.ptr, self.docs, self.data, terms, weights)
+
+class HybridRanker:
+    """
+    Weighted sum of other rankers' scores (weights are normalised to sum to 1).
+    Default blend: BM25 (heading boost) + TF-IDF cosine (no length penalty for
+    the longer table chunks) + char n-grams (codes, initials, typos).
+    """
+    name = 'hybrid'
+    threshold = float(os.getenv('HYBRID_THRESHOLD', '0.15'))
+
+    def __init__(self, brain, channels=None):
+        if channels is None:
+            channels = [(BM25Ranker(brain), float(os.getenv('HYBRID_BM25_WEIGHT', '0.4'))),
+                        (TfidfRanker(brain), float(os.getenv('HYBRID_TFIDF_WEIGHT', '0.4'))),
+                        (CharNgramRanker(brain), float(os.getenv('HYBRID_CHAR_WEIGHT', '0.2')))]
+        total = sum(w for _, w in channels) or 1.0
+        self.channels = [(r, w / total) for r, w in channels if w > 0]
+
+    def score(self, query):
+        parts = [(r.score(query), w) for r, w in self.channels]
+        ids = np.unique(np.concatenate([p[0] for p, _ in parts])) if parts else np.zeros(0, np.int32)
+        total = np.zeros(len(ids), np.float32)
+        for (p_ids, p_scores), w in parts:
+            total[np.searchsorted(ids, p_ids)] += w * p_scores
+        return ids.astype(np.int32), total
+
+RANKERS = {'tfidf': TfidfRanker, 'bm25': BM25Ranker, 'char': CharNgramRanker, 'hybrid': HybridRanker}
+
+def make_ranker(name, brain):
+    """Builds a ranker by name, falling back to TF-IDF on brains built before BM25/char support."""
+    try:
+        return RANKERS[name](brain)
+    except (KeyError, ValueError) as e:
+        print(f"⚠️ Ranker '{name}' unavailable ({e}); using tfidf")
+        return TfidfRanker(brain)
+
+class RetrievalEngine:
+    """
+    Top-k search over the brain's inverted index with a pluggable ranker
+    (tfidf / bm25 / char / hybrid). Only chunks that share at least one
+    term (or n-gram) with the query are ever touched.
+    """
+
+    def __init__(self, brain, ranker='tfidf'):
+        self.brain = brain
+        self.ranker = make_ranker(ranker, brain) if isinstance(ranker, str) else ranker
+        self.n_chunks = len(brain.chunks)
+
+    def score(self, query):
+        """(chunk ids, scores) for every chunk sharing a term with the query."""
+        return self.ranker.score(query)
+
+    def search(self, query, k=DEFAULT_TOP_K, threshold=None, where=None):
+        """
+        `threshold` defaults to the ranker's own. `where` ({field: value})
+        drops chunks with other metadata before ranking.
+        """
+        ids, scores = self.score(scoring_query(query, where))
+        mask = self.brain.match(where)
+        if mask is not None and len(ids):
+            keep = mask[ids]
+            ids, scores = ids[keep], scores[keep]
+        return top_k(ids, scores, k, self.ranker.threshold if threshold is None else threshold)
+
+    def search_batch(self, queries, k=DEFAULT_TOP_K, threshold=None):
+        """
+        TF-IDF: scores many queries in one sparse-sparse product (queries x
+        chunks), which only materialises (query, chunk) pairs that share a
+        term. Other rankers fall back to one search per query.
+        """
+        if not isinstance(self.ranker, TfidfRanker):
+            return [self.search(q, k, threshold) for q in queries]
+        threshold = self.ranker.threshold if threshold is None else threshold
+
+        indptr, cols, vals = [0], [], []
+        for q in queries:
+            t, w = self.brain.query_terms(q)
+            cols.append(t); vals.append(w)
+            indptr.append(indptr[-1] + len(t))
+        if not queries: return []
+
+        Q = csr_matrix((np.concatenate(vals), np.concatenate(cols), np.array(indptr)),
+                       shape=(len(queries), len(self.brain.vocab)))
+        S = (Q @ self.brain.matrix.T).tocsr()
+        S.sort_indices()
+
+        return [top_k(S.indices[S.indptr[i]:S.indptr[i + 1]], S.data[S.indptr[i]:S.indptr[i + 1]], k, threshold)
+                for i in range(len(queries))]
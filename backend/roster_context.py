@@ -0,0 +1,53 @@
+import re
+
+# Words that mean the teacher is talking about the class rather than the syllabus
+ROSTER_WORDS = re.compile(r'\b(mark|present|absent|attendance|students?|roll|roster|class list|who|list|show)\b')
+DETAIL_WORDS = re.compile(r'\b(marks|scores?|grades?|cgpa|sgpa|results?|data|details?|records?)\b')
+
+def roster_intent(msg, students):
+    """
+    None      -> question isn't about the class (send only a one-line summary)
+    'ids'     -> ids + names are enough (marking attendance, finding a student)
+    'details' -> the question needs the per-student details columns
+    """
+    q = msg.lower()
+    if DETAIL_WORDS.search(q): return 'details'
+    if ROSTER_WORDS.search(q): return 'ids'
+
+    # "Is Yash here today?" - a student's name alone is enough to need the roster
+    words = set(re.findall(r'[a-z]{3,}', q))
+    if any(part in words for s in students for part in str(s.get('name', '')).lower().split()):
+        return 'ids'
+    return None
+
+def detail_columns(students):
+    """Union of detail keys in first-seen order."""
+    cols = {}
+    for s in students:
+        if isinstance(s.get('details'), dict):
+            for k in s['details']: cols.setdefault(k, None)
+    return list(cols)
+
+def encode_roster(students, intent, budget=6000):
+    """
+    Compact pipe-separated roster for the system prompt, with only the
+    columns the intent needs, truncated to `budget` characters.
+    """
+    if not students: return ""
+    if intent is None:
+        return f"[CLASS ROSTER]\nClass has {len(students)} students (roster omitted: not needed for this question).\n"
+
+    cols = detail_columns(students) if intent == 'details' else []
+    lines = ["id|name" + "".join(f"|{c}" for c in cols)]
+    used = len(lines[0])
+
+    for i, s in enumerate(students):
+        details = s.get('details') if isinstance(s.get('details'), dict) else {}
+        row = f"{s['student_id']}|{s['name']}" + "".join(f"|{details.get(c, '')}" for c in cols)
+        if used + len(row) + 1 > budget:
+            lines.append(f"...and {len(students) - i} more students (actions still apply to the full class).")
+            break
+        lines.append(row)
+        used += len(row) + 1
+
+    return f"[CLASS ROSTER & DATA] {len(students)} students\n" + "\n".join(lines) + "\n"
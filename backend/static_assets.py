@@ -0,0 +1,84 @@
+import os
+import re
+import json
+import hashlib
+import mimetypes
+from flask import send_from_directory
+
+# --- STATIC ASSET SERVING (variants and hashes come from build_assets.py) ---
+# Content-hashed files never change under the same URL, so browsers may keep
+# them for a year without asking again. Everything else is revalidated with
+# an ETag (a 304 costs one round-trip, no body).
+IMMUTABLE_MAX_AGE = 31536000
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', '3600'))  # Originals under /data (photos rarely change)
+HASHED_RE = re.compile(r'\.[0-9a-f]{10}\.[a-z0-9]+$')
+COMPRESSIBLE = ('.js', '.css', '.html', '.json', '.svg', '.txt')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # Preferred first
+
+# Not in every platform's mime.types yet
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+class AssetManifest:
+    """Read-only view of assets_manifest.json; empty (originals only) if it was never built."""
+
+    def __init__(self, path, frontend_dir):
+        try:
+            with open(path, 'r', encoding='utf-8') as f: data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.images = data.get('images', {})
+        self.files = {}
+        for name, entry in data.get('files', {}).items():
+            # A hashed copy of an older script.js would silently serve stale code
+            try:
+                with open(os.path.join(frontend_dir, name), 'rb') as f: current = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                continue
+            if current == entry.get('source_hash'): self.files[name] = entry['file']
+            else: print(f"⚠️ {name} changed since the last asset build - serving it unhashed (run build_assets.py)")
+
+    def public_images(self):
+        """What the tour cards need: intrinsic size and the srcset candidates per format."""
+        return {key: {'width': e['width'], 'height': e['height'],
+                      'variants': {fmt: [{'w': v['w'], 'file': v['file']} for v in vs] for fmt, vs in e['variants'].items()}}
+                for key, e in self.images.items()}
+
+    def rewrite_html(self, html):
+        """index.html -> references to the hashed copies (the static deploy keeps the plain names)."""
+        for name, hashed in self.files.items():
+            html = re.sub(rf'(\b(?:src|href)=")(?:\./)?{re.escape(name)}"', rf'\g<1>{hashed}"', html)
+        return html
+
+def accepted_encodings(header):
+    """Accept-Encoding -> set of codings the client takes (q=0 means refused)."""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding and not re.search(r'q\s*=\s*0(?:\.0*)?\s*$', params): accepted.add(coding.strip().lower())
+    return accepted
+
+def send_asset(directory, filename, accept_encoding='', max_age=ASSET_MAX_AGE):
+    """
+    send_from_directory plus: a precompressed .br/.gz sibling when the client
+    accepts it, `immutable` caching for content-hashed names, and ETag/304
+    revalidation for the rest.
+    """
+    immutable = bool(HASHED_RE.search(filename))
+    sent, coding = filename, None
+    if filename.endswith(COMPRESSIBLE):
+        accepted = accepted_encodings(accept_encoding)
+        for name, ext in ENCODINGS:
+            if name in accepted and os.path.isfile(os.path.join(directory, filename + ext)):
+                sent, coding = filename + ext, name
+                break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    resp = send_from_directory(directory, sent, mimetype=mimetype, conditional=True,
+                               max_age=IMMUTABLE_MAX_AGE if immutable else max_age)
+    if coding: resp.headers['Content-Encoding'] = coding  # The sibling's path gives it its own ETag
+    if filename.endswith(COMPRESSIBLE): resp.headers['Vary'] = 'Accept-Encoding'
+    resp.cache_control.public = True
+    if immutable: resp.cache_control.immutable = True
+    elif not max_age: resp.cache_control.no_cache = True
+    return resp
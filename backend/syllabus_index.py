@@ -0,0 +1,137 @@
+import os
+import re
+import json
+
+from campus_terms import YEAR_RE, SEM_RE, BRANCH_WORDS, BRANCHES, YEAR_WORDS, ROMAN, subject_key
+
+# --- SYLLABUS LOOKUP (year -> branch -> subject -> units) ---
+YEAR_LABELS = {'1': 'First Year', '2': 'Second Year', '3': 'Third Year', '4': 'Fourth Year'}
+ROMAN_UNITS = {k.lower(): v for k, v in ROMAN.items()}
+# Initials that are also ordinary words ("is it", "unit ii") never identify a subject
+WEAK_ALIASES = set(ROMAN_UNITS) | {'it', 'is', 'as', 'an', 'at', 'be', 'do', 'if', 'in', 'me', 'my', 'no', 'of', 'on', 'or', 'so', 'to', 'up', 'us', 'we'}
+
+# Questions about what a course covers; "who teaches DBMS" still goes to search
+SYLLABUS_WORDS = re.compile(r'\b(syllabus|units?|modules?|topics?|chapters?|contents?|covered|covers|curriculum|credits?|portion)\b')
+# "Which room is DBMS in" / "where is OS covered" belong to the timetable rules
+ROOM_WORDS = re.compile(r'\b(rooms?|vacant|free|empty|where)\b')
+UNIT_QUERY_RE = re.compile(r'\b(?:unit|module)[\s-]*(\d|i{1,3}|iv|v|vi)\b')
+
+def parse_year(value):
+    """'Second Year' / '2nd year' / 'year 2' / 2 -> '2' (None if unreadable)."""
+    if value is None: return None
+    v = str(value).strip().lower()
+    if v in YEAR_LABELS: return v
+    m = re.match(r'^(first|second|third|fourth|1st|2nd|3rd|4th)\b', v)
+    if m: return str(YEAR_WORDS[m.group(1)])
+    m = YEAR_RE.search(v)
+    return m.group(2) if m and m.group(2) else None
+
+def query_year(q):
+    """Year a question names itself: '2nd year ...' or 'sem 4 ...' -> '2'."""
+    m = YEAR_RE.search(q)
+    if m: return str(YEAR_WORDS.get(m.group(1), m.group(2)))
+    m = SEM_RE.search(q)
+    return str((int(m.group(1)) + 1) // 2) if m else None
+
+class SyllabusIndex:
+    """
+    In-memory view over syllabus_index.json (built by process_data.py).
+    Every subject is reachable by (year, branch) and by its name key, code
+    and acronym, so "Syllabus for DBMS" for a 2nd-year CSE student is a
+    couple of dict lookups and only that subject's units go to the LLM.
+    """
+
+    def __init__(self, data):
+        self.years = data.get('years', {})
+        self.by_name = {}  # (year, branch, alias) -> subject
+        self.anywhere = {}  # alias -> [(year, branch, subject)]
+        for year, branches in self.years.items():
+            for branch, subjects in branches.items():
+                for s in subjects:
+                    for alias in self.aliases(s):
+                        self.by_name.setdefault((year, branch, alias), s)
+                        self.anywhere.setdefault(alias, []).append((year, branch, s))
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path): return None
+        with open(path, 'r', encoding='utf-8') as f: return cls(json.load(f))
+
+    @staticmethod
+    def aliases(s):
+        out = {subject_key(s['name'])}
+        acr = (s.get('acronym') or '').lower()
+        if len(acr) >= 2 and acr not in WEAK_ALIASES: out.add(acr)
+        if s.get('code') and re.search(r'\d', s['code']): out.update(c.lower() for c in s['code'].split('/'))
+        return out
+
+    def __len__(self):
+        return sum(len(subs) for branches in self.years.values() for subs in branches.values())
+
+    # --- LOOKUPS ---
+    def subjects(self, year, branch):
+        return self.years.get(parse_year(year) or '', {}).get(str(branch or '').upper(), [])
+
+    def get(self, year, branch, subject):
+        """Exact lookup by name, code ('DSC-9') or acronym ('DBMS')."""
+        year, branch = parse_year(year), str(branch or '').upper()
+        s = str(subject or '').strip()
+        return self.by_name.get((year, branch, subject_key(s))) or self.by_name.get((year, branch, s.lower()))
+
+    def mentioned(self, query):
+        """Aliases of any subject named in the query (longest first)."""
+        q = ' ' + subject_key(query) + ' '
+        raw = ' ' + re.sub(r'[^a-z0-9-]+', ' ', query.lower()) + ' '
+        found = [a for a in self.anywhere if f' {a} ' in q or f' {a} ' in raw]
+        return sorted(found, key=len, reverse=True)
+
+    def resolve(self, query, year=None, branch=None, subject=None):
+        """
+        The one subject the question is about, or None if it names none or
+        several. An explicit `subject` (a clicked chip) wins; year/branch come
+        from the question itself, else from the student's selection.
+        """
+        q = query.lower()
+        # A year/branch named in the question beats the sidebar selection
+        year = query_year(q) or parse_year(year)
+        branch = next((b for w, b in BRANCH_WORDS.items() if re.search(rf'\b{w}\b', q)), None) or branch
+        branch = str(branch).upper() if branch else None
+
+        if subject:
+            found = self.get(year, branch, subject) if year and branch else None
+            if found: return found
+        for alias in self.mentioned(query):
+            hits = [(y, b, s) for y, b, s in self.anywhere[alias]
+                    if (not year or y == year) and (not branch or b == branch)]
+            # First-year subjects are listed once per branch: same year + code is one subject
+            if len({(y, s['code'], s['name']) for y, _, s in hits}) == 1: return hits[0][2]
+        return None
+
+    def context(self, s, query=''):
+        """The [SYLLABUS] block for one subject; a question about "unit 3" gets just that unit."""
+        m = UNIT_QUERY_RE.search(query.lower())
+        wanted = None
+        if m: wanted = int(m.group(1)) if m.group(1).isdigit() else ROMAN_UNITS.get(m.group(1))
+        units = [u for u in s['units'] if not wanted or u['n'] == wanted] or s['units']
+
+        facts = [YEAR_LABELS.get(s['year'], f"Year {s['year']}"), ', '.join(s['branches'])]
+        if s.get('semesters'): facts.append(f"Semester {'/'.join(map(str, s['semesters']))}")
+        if s.get('credits'): facts.append(f"{s['credits']} credits")
+        acr = f" [{s['acronym']}]" if s.get('acronym') and s['acronym'] not in s['name'] else ''
+        lines = [f"[SYLLABUS] {s['name']} ({s['code']}){acr} - {', '.join(facts)}"]
+        if s.get('objectives'): lines.append(f"Objectives: {s['objectives']}")
+        for u in units:
+            lines.append(f"Unit {u['n']}: {u['title'] + ' - ' if u['title'] else ''}{u['text']}".rstrip(' -'))
+        if not s['units'] and s.get('summary'): lines.append(s['summary'])
+        return "\n".join(lines)
+
+    def lookup(self, query, year=None, branch=None, subject=None):
+        """
+        Context for a syllabus question about one known subject, else '' (falls
+        through to search). A selected `subject` only says which subject a
+        syllabus question means; "who teaches it?" still goes to search.
+        """
+        q = query.lower()
+        if ROOM_WORDS.search(q) or not SYLLABUS_WORDS.search(q): return ''
+        s = self.resolve(query, year, branch, subject)
+        return self.context(s, query) if s else ''
@@ -0,0 +1,84 @@
+import random
+import unittest
+
+from analytics import attendance_table, filter_table, first_numeric
+
+# --- ATTENDANCE REPORTS ---
+#   python -m unittest test_analytics      (from backend/)
+
+def reference_report(students, records, search_name='', f_type='attendance', op=None, value=None):
+    """The per-student scan analyze_data used before the group-by (O(students x records))."""
+    total = len({r['date'] for r in records})
+    rows = []
+    for s in students:
+        present = sum(1 for r in records if r['student_id'] == s['student_id'] and r['status'] == 'Present')
+        pct = round(present / total * 100, 1) if total > 0 else 0.0
+        marks = 0
+        if s['details'] and isinstance(s['details'], dict):
+            for v in s['details'].values():
+                if isinstance(v, (int, float)):
+                    marks = v
+                    break
+        rows.append({'name': s['name'], 'id': s['student_id'], 'attendance': pct, 'present': present, 'marks': marks})
+
+    out = []
+    for item in rows:
+        if search_name and search_name.lower() not in item['name'].lower(): continue
+        if op and value is not None:
+            target = item['attendance'] if f_type == 'attendance' else item['marks']
+            v = float(value)
+            if not {'>': target > v, '<': target < v, '>=': target >= v, '<=': target <= v, '==': target == v}[op]: continue
+        out.append(item)
+    return out, total
+
+def random_class(rng):
+    names = ['Aarav Sharma', 'Diya Verma', 'Kabir Singh', 'Meera Iyer', 'Rohan Das', 'Sana Khan']
+    students = [{'student_id': f"23{i:04d}", 'name': rng.choice(names) + f" {i}",
+                 'details': rng.choice([None, {}, {'Attendance': '0%'}, {'Marks': rng.randint(0, 10)},
+                                        {'Note': 'x', 'CGPA': round(rng.uniform(4, 10), 1)}])}
+                for i in range(rng.randint(0, 25))]
+    days = [f"2025-01-{d:02d}" for d in range(1, rng.randint(0, 12) + 1)]
+    records = [{'student_id': s['student_id'], 'date': d, 'status': rng.choice(['Present', 'Present', 'Absent'])}
+               for d in days for s in students if rng.random() < 0.9]
+    return students, records
+
+class AttendanceTableTest(unittest.TestCase):
+    def test_matches_per_student_scan(self):
+        rng = random.Random(11)
+        for _ in range(200):
+            students, records = random_class(rng)
+            search = rng.choice(['', 'sharma', 'KABIR', 'zzz'])
+            f_type = rng.choice(['attendance', 'marks'])
+            op = rng.choice([None, '>', '<', '>=', '<=', '=='])
+            value = rng.choice([0, 5, 50, 75.5, 100])
+
+            df, total = attendance_table(students, records)
+            got = filter_table(df, search, f_type, op, value)
+            want, want_total = reference_report(students, records, search, f_type, op, value)
+
+            self.assertEqual(total, want_total)
+            self.assertEqual(got[['name', 'id', 'attendance', 'present', 'marks']].to_dict('records'), want)
+
+    def test_no_records(self):
+        df, total = attendance_table([{'student_id': '1', 'name': 'A', 'details': None}], [])
+        self.assertEqual(total, 0)
+        self.assertEqual(df.iloc[0]['present'], 0)
+        self.assertEqual(df.iloc[0]['attendance'], 0.0)
+
+    def test_int_and_str_ids_match(self):
+        students = [{'student_id': 101, 'name': 'A', 'details': None}]
+        records = [{'student_id': '101', 'date': '2025-01-01', 'status': 'Present'}]
+        df, _ = attendance_table(students, records)
+        self.assertEqual(df.iloc[0]['present'], 1)
+
+class FilterTableTest(unittest.TestCase):
+    def test_bad_value_does_not_filter(self):
+        df, _ = attendance_table([{'student_id': '1', 'name': 'A', 'details': None}], [])
+        self.assertEqual(len(filter_table(df, op='>', value='lots')), 1)
+
+    def test_first_numeric_skips_bools(self):
+        self.assertEqual(first_numeric({'Paid': True, 'Marks': 7}), 7)
+        self.assertEqual(first_numeric(None), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from context_builder import ContextAssembler, estimate_tokens, trim_to_tokens, split_header
+
+# --- TOKEN-BUDGETED CONTEXT ASSEMBLY ---
+#   python -m unittest test_context_builder      (from backend/)
+
+SENTENCES = ["Unit 1 covers relational algebra and SQL joins.", "Lab sessions run in Room 513 on Fridays.",
+             "Normalisation up to BCNF is examined in the midterm.", "Transactions and recovery close the course.",
+             "Short line.", "Indexing uses B+ trees and hashing techniques."]
+
+class ContextAssemblerTest(unittest.TestCase):
+    def test_never_exceeds_budget(self):
+        rng = random.Random(3)
+        for _ in range(300):
+            chunks = [f"[Syllabus] Subject {rng.randint(1, 4)} > Unit {rng.randint(1, 3)}\n"
+                      + " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 12))) for _ in range(10)]
+            hits = [(i, rng.random()) for i in rng.sample(range(10), rng.randint(1, 10))]
+            budget = rng.randint(20, 400)
+            text, stats = ContextAssembler(max_tokens=budget).assemble(hits, chunks)
+            self.assertLessEqual(estimate_tokens(text), budget)
+            self.assertEqual(stats['tokens'], estimate_tokens(text))
+
+    def test_highest_score_first_and_shared_heading_sent_once(self):
+        chunks = ["[A] DBMS > Unit 1\nRelational algebra basics are covered first.",
+                  "[A] DBMS > Unit 1\nSQL joins and subqueries follow after that.",
+                  "[B] OS > Unit 2\nProcess scheduling algorithms are compared."]
+        text, stats = ContextAssembler(max_tokens=500).assemble([(0, 0.2), (2, 0.9), (1, 0.5)], chunks)
+        self.assertTrue(text.startswith("[B] OS > Unit 2"))
+        self.assertEqual(text.count("[A] DBMS > Unit 1"), 1)
+        self.assertEqual(stats['chunks'], 3)
+
+    def test_repeated_sentences_dropped(self):
+        body = "Normalisation up to BCNF is examined in the midterm."
+        chunks = [f"[A] X\n{body}", f"[A] Y\n{body}", "[A] Z\nShort line. Short line."]
+        text, stats = ContextAssembler(max_tokens=500).assemble([(0, 0.9), (1, 0.8), (2, 0.7)], chunks)
+        self.assertEqual(text.count(body), 1)
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(text.count("Short line."), 2)  # Below MIN_DEDUPE_CHARS: kept
+
+    def test_overflowing_chunk_cut_at_sentence(self):
+        chunks = ["[A] X\n" + " ".join(SENTENCES[:4])]
+        text, stats = ContextAssembler(max_tokens=30).assemble([(0, 1.0)], chunks)
+        self.assertTrue(stats['truncated'])
+        self.assertTrue(text.endswith('.'))
+
+class HelpersTest(unittest.TestCase):
+    def test_trim_to_tokens(self):
+        text = "One sentence here. Another one follows. And a third."
+        self.assertEqual(trim_to_tokens(text, 100), text)
+        self.assertEqual(trim_to_tokens(text, 10), "One sentence here. Another one follows.")
+
+    def test_split_header(self):
+        self.assertEqual(split_header("[Src] A > B\nbody"), ("[Src] A > B", "body"))
+        self.assertEqual(split_header("no header"), ('', "no header"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from db import CircuitBreaker, DataAccess, DBUnavailable, is_transient
+
+# --- DATA ACCESS: CIRCUIT BREAKER, RETRIES, BATCHED UPSERTS ---
+#   python -m unittest test_db      (from backend/)
+
+class Clock:
+    def __init__(self): self.now = 1000.0
+    def __call__(self): return self.now
+
+class Rejected(Exception):
+    """What postgrest raises when the database refuses a request (unique violation)."""
+    code = '23505'
+
+class Script:
+    """A client whose execute() plays back `outcomes` in order (exception -> raised, else -> .data)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def call(self, op):
+        def execute():
+            self.calls.append(op)
+            out = self.outcomes.pop(0) if self.outcomes else []
+            if isinstance(out, Exception): raise out
+            return SimpleNamespace(data=out)
+        return SimpleNamespace(execute=execute)
+
+def data_access(client, retries=3, failures=5):
+    return DataAccess(client, breaker=CircuitBreaker(failures, 30), retries=retries, backoff=0)
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('db.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failures=3, cooldown=30)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2): self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_count(self):
+        self.breaker.failure(); self.breaker.failure()
+        self.breaker.success()
+        self.breaker.failure(); self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_lets_one_trial_through(self):
+        for _ in range(3): self.breaker.failure()
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # Only one trial at a time
+
+    def test_trial_success_closes(self):
+        for _ in range(3): self.breaker.failure()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_trial_failure_reopens_for_a_full_cooldown(self):
+        for _ in range(3): self.breaker.failure()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.clock.now += 29
+        self.assertEqual(self.breaker.state, 'open')
+
+class RunTest(unittest.TestCase):
+    def test_transient_errors_are_retried(self):
+        client = Script(TimeoutError(), TimeoutError(), [{'id': 1}])
+        self.assertEqual(data_access(client).run('select.x', lambda c: c.call('select')), [{'id': 1}])
+        self.assertEqual(len(client.calls), 3)
+
+    def test_gives_up_after_the_last_attempt(self):
+        client = Script(TimeoutError(), TimeoutError(), TimeoutError(), [{'id': 1}])
+        with self.assertRaises(TimeoutError): data_access(client).run('select.x', lambda c: c.call('select'))
+        self.assertEqual(len(client.calls), 3)
+
+    def test_rejected_request_not_retried_and_not_an_outage(self):
+        client = Script(Rejected())
+        db = data_access(client, failures=1)
+        with self.assertRaises(Rejected): db.run('insert.x', lambda c: c.call('insert'))
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(db.breaker.state, 'closed')
+
+    def test_zero_retries_still_makes_one_call(self):
+        client = Script([{'id': 1}])
+        self.assertEqual(data_access(client, retries=0).run('select.x', lambda c: c.call('select')), [{'id': 1}])
+
+    def test_non_idempotent_retried_only_if_never_sent(self):
+        import httpx
+        client = Script(httpx.ConnectError('refused'), [{'id': 1}])
+        self.assertEqual(data_access(client).run('insert.x', lambda c: c.call('insert'), idempotent=False), [{'id': 1}])
+
+        client = Script(httpx.ReadTimeout('slow'), [{'id': 1}])
+        with self.assertRaises(httpx.ReadTimeout):
+            data_access(client).run('insert.x', lambda c: c.call('insert'), idempotent=False)
+        self.assertEqual(len(client.calls), 1)
+
+    def test_delete_not_retried_after_timeout(self):
+        client = Script(TimeoutError(), [])
+        client.table = lambda name: SimpleNamespace(delete=lambda: SimpleNamespace(eq=lambda *a: client.call('delete')))
+        with self.assertRaises(TimeoutError): data_access(client).delete_student('101')
+        self.assertEqual(client.calls, ['delete'])
+
+    def test_open_circuit_fails_fast(self):
+        client = Script(TimeoutError())
+        db = data_access(client, retries=1, failures=1)
+        with self.assertRaises(TimeoutError): db.run('select.x', lambda c: c.call('select'))
+        with self.assertRaises(DBUnavailable): db.run('select.x', lambda c: c.call('select'))
+        self.assertEqual(len(client.calls), 1)
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(TimeoutError()))
+        self.assertTrue(is_transient(SimpleNamespace(code='503')))
+        self.assertFalse(is_transient(Rejected()))
+
+class BulkUpsertTest(unittest.TestCase):
+    def upsert(self, client, n=5, batch_size=2, retries=2):
+        client.table = lambda name: SimpleNamespace(upsert=lambda rows, on_conflict: client.call(len(rows) if isinstance(rows, list) else 1))
+        rows = [{'id': i} for i in range(n)]
+        return data_access(client, retries=retries).bulk_upsert('t', rows, 'id', batch_size=batch_size)
+
+    def test_all_batches_saved(self):
+        client = Script()
+        saved, failed = self.upsert(client)
+        self.assertEqual((len(saved), failed), (5, []))
+        self.assertEqual(client.calls, [2, 2, 1])
+
+    def test_rejected_batch_falls_back_to_single_rows(self):
+        client = Script([], Rejected(), [], Rejected(), [])
+        saved, failed = self.upsert(client)
+        self.assertEqual([r['id'] for r in saved], [0, 1, 2, 4])
+        self.assertEqual([r['id'] for r, _ in failed], [3])
+        self.assertEqual(client.calls, [2, 2, 1, 1, 1])
+
+    def test_transient_failure_stops_without_row_retries(self):
+        client = Script([], TimeoutError(), TimeoutError())
+        saved, failed = self.upsert(client)
+        self.assertEqual([r['id'] for r in saved], [0, 1])
+        self.assertEqual([r['id'] for r, _ in failed], [2, 3, 4])
+        self.assertEqual(client.calls, [2, 2, 2])  # First batch + the second batch's two attempts
+
+if __name__ == '__main__':
+    unittest.main()
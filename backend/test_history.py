@@ -0,0 +1,82 @@
+import unittest
+
+from context_builder import CHARS_PER_TOKEN
+from history import HistoryManager, extractive_summary, prefix_hashes
+from query_cache import TTLCache
+
+# --- BOUNDED CHAT HISTORY ---
+#   python -m unittest test_history      (from backend/)
+
+def chat(n):
+    """n messages, user first: u0, m1, u2, m3, ..."""
+    return [{'isUser': i % 2 == 0, 'text': f"{'u' if i % 2 == 0 else 'm'}{i}"} for i in range(n)]
+
+class ExtractiveSummaryTest(unittest.TestCase):
+    def test_keeps_user_requests_only(self):
+        self.assertEqual(extractive_summary('', chat(4), 100), "- u0\n- u2")
+
+    def test_previous_summary_comes_first(self):
+        self.assertEqual(extractive_summary('earlier', chat(2), 100), "earlier\n- u0")
+
+    def test_fits_budget_keeping_newest(self):
+        msgs = [{'isUser': True, 'text': f"request number {i} " + 'x' * 40} for i in range(20)]
+        out = extractive_summary('old summary', msgs, 30)
+        self.assertLessEqual(len(out), 30 * CHARS_PER_TOKEN)
+        self.assertTrue(out.endswith('x' * 40))
+        self.assertIn('request number 19', out)
+        self.assertNotIn('old summary', out)
+
+class HistoryManagerTest(unittest.TestCase):
+    def manager(self, summarize=None, **kw):
+        return HistoryManager(summarize=summarize, pool=None, keep=4, step=4, max_verbatim=8, max_tokens=100,
+                              cache=TTLCache(64, 3600), **kw)
+
+    def test_short_history_is_sent_verbatim(self):
+        summary, recent = self.manager().build(chat(4))
+        self.assertEqual(summary, '')
+        self.assertEqual([m['text'] for m in recent], ['u0', 'm1', 'u2', 'm3'])
+
+    def test_first_fold_is_written_then_served_from_cache(self):
+        prompts = []
+        hm = self.manager(summarize=lambda p: prompts.append(p) or 'S1')
+
+        # No summary yet: the whole tail (capped) is sent while it is written
+        summary, recent = hm.build(chat(9))
+        self.assertEqual(summary, '')
+        self.assertEqual([m['text'] for m in recent], ['u2', 'm3', 'u4', 'm5', 'u6', 'm7', 'u8'])
+        self.assertEqual(len(prompts), 1)
+
+        summary, recent = hm.build(chat(9))
+        self.assertEqual(summary, 'S1')
+        self.assertEqual([m['text'] for m in recent], ['u4', 'm5', 'u6', 'm7', 'u8'])
+        self.assertEqual(len(prompts), 1)  # Cached per prefix
+
+    def test_next_fold_extends_the_previous_summary(self):
+        prompts = []
+        hm = self.manager(summarize=lambda p: prompts.append(p) or f"S{len(prompts)}")
+        hm.build(chat(9))
+        summary, _ = hm.build(chat(13))
+        self.assertEqual(summary, 'S1')            # Previous summary while the next is written
+        self.assertIn('S1', prompts[-1])          # ...and it is what gets extended
+        self.assertIn('User: u4', prompts[-1])
+        self.assertNotIn('User: u0', prompts[-1])
+        self.assertEqual(hm.build(chat(13))[0], 'S2')
+
+    def test_summarizer_failure_falls_back_to_extractive(self):
+        def boom(prompt): raise RuntimeError('quota')
+        hm = self.manager(summarize=boom)
+        hm.build(chat(9))
+        self.assertEqual(hm.build(chat(9))[0], "- u0\n- u2")
+
+    def test_replayed_history_opens_with_a_user_turn(self):
+        msgs = [{'isUser': False, 'text': 'welcome'}] + chat(3)
+        _, recent = self.manager().build(msgs)
+        self.assertTrue(recent[0]['isUser'])
+
+    def test_prefix_hashes_are_chained(self):
+        a, b = prefix_hashes(chat(3)), prefix_hashes(chat(3)[:2] + [{'isUser': True, 'text': 'other'}])
+        self.assertEqual(a[:3], b[:3])
+        self.assertNotEqual(a[3], b[3])
+
+if __name__ == '__main__':
+    unittest.main()
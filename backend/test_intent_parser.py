@@ -0,0 +1,79 @@
+import unittest
+from datetime import date
+
+from intent_parser import parse_command, parse_target, parse_date, resolves, extract_action
+
+# --- RULE-BASED TEACHER COMMANDS ---
+#   python -m unittest test_intent_parser      (from backend/)
+
+TODAY = date(2025, 3, 14)
+
+def parse(msg):
+    return parse_command(msg, today=TODAY)
+
+class AttendanceCommandTest(unittest.TestCase):
+    def test_ids_status_and_default_date(self):
+        self.assertEqual(parse("mark 101, 102 and 105 present"),
+                         {'action': 'update_attendance', 'status': 'Present', 'date': '2025-03-14', 'ids': ['101', '102', '105']})
+
+    def test_status_first_with_date(self):
+        cmd = parse("Please mark absent for 23001 yesterday")
+        self.assertEqual((cmd['status'], cmd['date'], cmd['ids']), ('Absent', '2025-03-13', ['23001']))
+
+    def test_ranges_keep_leading_zeros(self):
+        self.assertEqual(parse("mark 007-010 present")['ids'], ['007', '008', '009', '010'])
+
+    def test_patterns_and_everyone(self):
+        self.assertEqual(parse("mark roll numbers ending in 77 present")['pattern'],
+                         {'field': 'id', 'type': 'endswith', 'value': '77'})
+        self.assertEqual(parse("mark students whose names start with ra absent")['pattern'],
+                         {'field': 'name', 'type': 'startswith', 'value': 'ra'})
+        self.assertEqual(parse("mark everyone present")['pattern'], {'field': 'id', 'type': 'contains', 'value': ''})
+
+    def test_ambiguous_commands_go_to_the_llm(self):
+        for msg in ["mark everyone present except 101", "mark 101 present and 102 absent",
+                    "don't mark 101 present", "mark 101 or 102 present", "mark rahul present",
+                    "mark 1-500 present", "what is the weather", ""]:
+            self.assertIsNone(parse(msg), msg)
+
+class AnalyticsCommandTest(unittest.TestCase):
+    def test_filters(self):
+        self.assertEqual(parse("show students with attendance below 75%"),
+                         {'action': 'analyze_data', 'search_name': '', 'filter_type': 'attendance', 'operator': '<', 'value': 75})
+        cmd = parse("list students having more than 8.5 marks")
+        self.assertEqual((cmd['filter_type'], cmd['operator'], cmd['value']), ('marks', '>', 8.5))
+        self.assertEqual(parse("show students with cgpa not less than 7")['operator'], '>=')
+
+    def test_student_records(self):
+        self.assertEqual(parse("show attendance of Meera Iyer"),
+                         {'action': 'analyze_data', 'search_name': 'meera iyer', 'filter_type': 'attendance'})
+        self.assertEqual(parse("what's rohan's marks")['filter_type'], 'marks')
+
+    def test_class_report(self):
+        self.assertEqual(parse("show the full attendance report"),
+                         {'action': 'analyze_data', 'search_name': '', 'filter_type': 'attendance'})
+
+class HelpersTest(unittest.TestCase):
+    def test_parse_date(self):
+        self.assertEqual(parse_date('15 jan', TODAY), '2025-01-15')
+        self.assertEqual(parse_date('3/4', TODAY), '2025-04-03')
+        self.assertEqual(parse_date('2025-02-30', TODAY), None)
+
+    def test_parse_target_rejects_words(self):
+        self.assertIsNone(parse_target('101 and rahul'))
+        self.assertEqual(parse_target('ab12, 101')['ids'], ['AB12', '101'])
+
+    def test_resolves_against_roster(self):
+        roster = [{'student_id': '2023101', 'name': 'Meera Iyer'}, {'student_id': '2023201', 'name': 'Rohan Das'}]
+        self.assertTrue(resolves({'ids': ['101']}, roster))
+        self.assertFalse(resolves({'ids': ['01']}, roster))      # Matches two students
+        self.assertFalse(resolves({'search_name': 'kabir'}, roster))
+        self.assertTrue(resolves({'pattern': {'field': 'id', 'type': 'contains', 'value': ''}}, roster))
+
+    def test_extract_action(self):
+        self.assertEqual(extract_action('```json\n{"action": "analyze_data", "filter_type": "marks"}\n```')['action'], 'analyze_data')
+        self.assertIsNone(extract_action('Use {curly} braces in SQL'))
+        self.assertIsNone(extract_action('{"action": "drop_table"}'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import unittest
+
+from fakes import FakeGemini, FakeSupabase
+from load_test import compare, parse_server_timing, seed_tables, roll
+
+# --- LOAD-TEST HARNESS: the fakes must behave like the real clients ---
+#   python -m unittest test_load_test      (from backend/)
+
+class FakeSupabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeSupabase(latency=0, tables={'students': [
+            {'student_id': '1', 'class_id': 'a', 'name': 'Meera'},
+            {'student_id': '2', 'class_id': 'a', 'name': 'Rohan'},
+            {'student_id': '3', 'class_id': 'b', 'name': 'Sana'}]})
+
+    def test_select_filters_orders_and_projects(self):
+        out = self.db.table('students').select('name').eq('class_id', 'a').order('name', desc=True).limit(1).execute().data
+        self.assertEqual(out, [{'name': 'Rohan'}])
+
+    def test_upsert_updates_on_conflict_and_inserts_new(self):
+        self.db.table('students').upsert([{'student_id': '1', 'class_id': 'a', 'name': 'Meera Iyer'},
+                                          {'student_id': '4', 'class_id': 'a', 'name': 'Kabir'}],
+                                         on_conflict='student_id,class_id').execute()
+        rows = self.db.table('students').select('*').eq('class_id', 'a').execute().data
+        self.assertEqual(sorted(r['name'] for r in rows), ['Kabir', 'Meera Iyer', 'Rohan'])
+
+    def test_upsert_rejects_duplicate_keys_in_one_batch(self):
+        # Postgres refuses an ON CONFLICT batch that touches a row twice; so must the fake
+        with self.assertRaises(Exception):
+            self.db.table('students').upsert([{'student_id': '9'}, {'student_id': '9'}], on_conflict='student_id').execute()
+
+    def test_delete_then_upsert_sees_the_deletion(self):
+        self.db.table('students').upsert([{'student_id': '1', 'name': 'x'}], on_conflict='student_id').execute()
+        self.db.table('students').delete().eq('student_id', '1').execute()
+        self.db.table('students').upsert([{'student_id': '1', 'name': 'y'}], on_conflict='student_id').execute()
+        self.assertEqual([r['name'] for r in self.db.table('students').select('*').eq('student_id', '1').execute().data], ['y'])
+
+    def test_insert_assigns_ids_and_calls_are_counted(self):
+        new = self.db.table('conversations').insert({'message': 'hi'}).execute().data
+        self.assertIn('id', new[0])
+        self.assertEqual(self.db.calls[('conversations', 'insert')], 1)
+
+    def test_fail_rate_raises_connection_errors(self):
+        db = FakeSupabase(latency=0, fail_rate=1.0)
+        with self.assertRaises(ConnectionError): db.table('students').select('*').execute()
+
+class FakeGeminiTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGemini(latency=0, tokens_per_sec=0, reply_words=10)
+
+    def test_teacher_commands_get_json_actions(self):
+        action = json.loads(self.fake.generate_content("mark 101 102 absent").text)
+        self.assertEqual((action['action'], action['ids'], action['status']), ('update_attendance', ['101', '102'], 'Absent'))
+        action = json.loads(self.fake.generate_content("attendance < 75").text)
+        self.assertEqual((action['operator'], action['value']), ('<', 75))
+
+    def test_stream_yields_the_same_reply(self):
+        chat = self.fake.make_model('system').start_chat([])
+        streamed = ''.join(c.text for c in chat.send_message("hello", stream=True))
+        self.assertEqual(streamed, chat.send_message("hello").text)
+        self.assertEqual(len(streamed.split()), 10)
+        self.assertEqual(self.fake.calls, 2)
+
+class HarnessTest(unittest.TestCase):
+    def test_seed_tables(self):
+        tables = seed_tables(students=5, days=3, seed=1)
+        self.assertEqual(len(tables['students']), 5)
+        self.assertEqual(len(tables['attendance_records']), 15)
+        self.assertEqual(tables['students'][0]['student_id'], roll(0))
+        self.assertEqual(tables, seed_tables(students=5, days=3, seed=1))
+
+    def test_parse_server_timing(self):
+        self.assertEqual(parse_server_timing("get_context;dur=1.4, llm;dur=300.2, bad"), {'get_context': 1.4, 'llm': 300.2})
+        self.assertEqual(parse_server_timing(None), {})
+
+    def test_compare_flags_regressions_only_beyond_tolerance(self):
+        base = {'results': {'chat': {'p95_ms': 100, 'rps': 50, 'errors': 0}}}
+        self.assertEqual(compare({'chat': {'p95_ms': 120, 'rps': 45, 'errors': 0}}, base, 0.25), [])
+        problems = compare({'chat': {'p95_ms': 130, 'rps': 30, 'errors': 1}}, base, 0.25)
+        self.assertEqual(len(problems), 3)
+        self.assertEqual(compare({'other': {'p95_ms': 999, 'rps': 0, 'errors': 9}}, base, 0.25), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+from query_cache import TTLCache, normalize_query, text_hash
+
+# --- TTL / LRU CACHE ---
+#   python -m unittest test_query_cache      (from backend/)
+
+class Clock:
+    """Stands in for time.monotonic so expiry is tested without sleeping."""
+    def __init__(self): self.now = 1000.0
+    def __call__(self): return self.now
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('query_cache.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entry_expires_after_ttl(self):
+        cache = TTLCache(maxsize=8, ttl=10)
+        cache.set('a', 1)
+        self.clock.now += 9.9
+        self.assertEqual(cache.get('a'), 1)
+        self.clock.now += 0.2
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)  # Dropped on read
+
+    def test_set_refreshes_ttl(self):
+        cache = TTLCache(maxsize=8, ttl=10)
+        cache.set('a', 1)
+        self.clock.now += 8
+        cache.set('a', 2)
+        self.clock.now += 8
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')      # 'b' is now the oldest
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_hit_and_miss_counts(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.get('a'); cache.get('a'); cache.get('x')
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_falsy_values_are_hits(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('empty', [])
+        self.assertEqual(cache.get('empty', 'missing'), [])
+
+    def test_pop_clear_and_disabled(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set('a', 1); cache.set('b', 2)
+        cache.pop('a'); cache.pop('never-set')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+        off = TTLCache(maxsize=0, ttl=60)
+        off.set('a', 1)
+        self.assertIsNone(off.get('a'))
+
+class KeyTest(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('  Where is ROOM   313?? '), 'where is room 313')
+
+    def test_text_hash_separates_parts(self):
+        self.assertNotEqual(text_hash('ab', 'c'), text_hash('a', 'bc'))
+
+if __name__ == '__main__':
+    unittest.main()
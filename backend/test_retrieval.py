@@ -0,0 +1,53 @@
+import random
+import unittest
+import numpy as np
+
+from retrieval import top_k, scoring_query
+
+# --- TOP-K SELECTION + QUERY SCORING ---
+#   python -m unittest test_retrieval      (from backend/)
+
+def full_sort(ids, scores, k, threshold):
+    """The old path: drop <= threshold, sort everything (score desc, ties by chunk id), take k."""
+    pairs = [(int(i), float(s)) for i, s in zip(ids, scores) if s > threshold]
+    pairs.sort(key=lambda p: (-p[1], p[0]))
+    return pairs[:k]
+
+class TopKTest(unittest.TestCase):
+    def test_matches_full_sort_on_random_scores(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            n = rng.randint(0, 60)
+            ids = np.array(rng.sample(range(1000), n), dtype=np.int32)
+            # Few distinct values, so ties (also at the cut) are common
+            scores = np.array([rng.choice([0.0, 0.05, 0.1, 0.2, 0.3, 0.5, 0.9]) for _ in range(n)], dtype=np.float32)
+            k, threshold = rng.randint(1, 12), rng.choice([0.0, 0.1, 0.25])
+            self.assertEqual(top_k(ids, scores, k, threshold), full_sort(ids, scores, k, threshold))
+
+    def test_ties_at_the_cut_go_to_the_lowest_ids(self):
+        ids = np.array([9, 4, 7, 2, 5], dtype=np.int32)
+        scores = np.array([0.9, 0.5, 0.5, 0.5, 0.5], dtype=np.float32)
+        self.assertEqual([i for i, _ in top_k(ids, scores, 3, 0.1)], [9, 2, 4])
+
+    def test_threshold_is_exclusive(self):
+        ids = np.array([1, 2, 3], dtype=np.int32)
+        scores = np.array([0.1, 0.11, 0.0], dtype=np.float32)
+        self.assertEqual([i for i, _ in top_k(ids, scores, 8, 0.1)], [2])
+
+    def test_empty_input(self):
+        self.assertEqual(top_k(np.zeros(0, np.int32), np.zeros(0, np.float32), 8, 0.1), [])
+
+class ScoringQueryTest(unittest.TestCase):
+    def test_year_words_dropped_once_filtered(self):
+        self.assertEqual(scoring_query("DSC-1 1st year", {'year': '1'}).split(), ['dsc-1'])
+        self.assertEqual(scoring_query("OS syllabus sem 4", {'year': '2'}).split(), ['os', 'syllabus'])
+
+    def test_unfiltered_query_untouched(self):
+        self.assertEqual(scoring_query("DSC-1 1st year", {}), "DSC-1 1st year")
+        self.assertEqual(scoring_query("DSC-1 1st year", {'branch': 'CSE'}), "DSC-1 1st year")
+
+    def test_query_that_is_only_a_year_kept(self):
+        self.assertEqual(scoring_query("2nd year", {'year': '2'}), "2nd year")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from syllabus_index import SyllabusIndex
+
+# --- CONTEXT ROUTING: which strategy get_context() picks for a question ---
+#   python -m unittest test_routing      (from backend/, needs the built index)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CSE_2 = {'year': 'Second Year', 'branch': 'CSE'}
+
+class SyllabusRoutingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import app
+        if not app.kb.chunks or not app.kb.syllabus: raise unittest.SkipTest("knowledge base not built (run process_data.py)")
+        cls.app = app
+
+    def strategy(self, query, course=None):
+        stats = {}
+        self.app.get_context(query, stats, course)
+        return stats['strategy']
+
+    def test_room_question_with_taught_uses_timetable(self):
+        self.assertEqual(self.strategy("which room is DBMS taught in"), 'rules')
+        self.assertEqual(self.strategy("which room is DBMS taught in", CSE_2), 'rules')
+
+    def test_room_question_with_subject_chip_skips_syllabus(self):
+        # A clicked subject chip must not turn a room question into a syllabus one
+        self.assertNotEqual(self.strategy("where is this class", dict(CSE_2, subject='DBMS')), 'syllabus')
+
+    def test_follow_up_with_subject_chip_uses_search(self):
+        # The chip picks the subject for syllabus questions only
+        chip = dict(CSE_2, subject='DBMS')
+        self.assertEqual(self.strategy("Syllabus for DBMS", chip), 'syllabus')
+        self.assertNotEqual(self.strategy("who teaches it?", chip), 'syllabus')
+        self.assertNotEqual(self.strategy("when is the exam?", chip), 'syllabus')
+
+    def test_syllabus_question_uses_index(self):
+        self.assertEqual(self.strategy("Syllabus for DBMS", CSE_2), 'syllabus')
+        self.assertEqual(self.strategy("unit 2 of OS", CSE_2), 'syllabus')
+
+class SyllabusWordsTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SyllabusIndex.load(os.path.join(current_dir, 'syllabus_index.json'))
+        if not self.index: self.skipTest("syllabus_index.json not built")
+
+    def test_room_words_skip_lookup(self):
+        self.assertEqual(self.index.lookup("which room is DBMS taught in", **CSE_2), '')
+        self.assertEqual(self.index.lookup("is the DBMS lab free", subject='DBMS', **CSE_2), '')
+
+    def test_subject_chip_alone_is_not_a_syllabus_question(self):
+        self.assertEqual(self.index.lookup("who teaches it?", subject='DBMS', **CSE_2), '')
+        self.assertIn('[SYLLABUS]', self.index.lookup("what are the units", subject='DBMS', **CSE_2))
+
+    def test_taught_alone_is_not_a_syllabus_question(self):
+        self.assertEqual(self.index.lookup("who has taught DBMS", **CSE_2), '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import os
+import re
+import json
+from datetime import datetime
+
+from campus_terms import YEAR_WORDS
+
+try:
+    from zoneinfo import ZoneInfo
+    CAMPUS_TZ = ZoneInfo('Asia/Kolkata')
+except Exception:
+    CAMPUS_TZ = None
+
+DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+DAY_START, DAY_END = 8 * 60, 18 * 60
+
+VACANCY_WORDS = ['vacant', 'free', 'empty', 'available']
+
+def fmt_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def campus_now():
+    return datetime.now(CAMPUS_TZ) if CAMPUS_TZ else datetime.now()
+
+class TimetableIndex:
+    """
+    In-memory view over timetable_index.json (built by process_data.py).
+    Slots are bucketed by day / room / section / faculty so a question is
+    answered with an interval lookup instead of sending the whole timetable
+    to the LLM.
+    """
+
+    def __init__(self, data):
+        self.slots = data.get('slots', [])
+        self.faculty = data.get('faculty', {})
+        self.rooms = data.get('rooms', {})
+        self.layout = data.get('layout', [])
+
+        self.by_day, self.by_room, self.by_section, self.by_faculty = {}, {}, {}, {}
+        for s in self.slots:
+            self.by_day.setdefault(s['day'], []).append(s)
+            for r in (s['room'] or '').split('/'):
+                if r: self.by_room.setdefault(r, []).append(s)
+            self.by_section.setdefault((s['year'], s['section']), []).append(s)
+            for f in (s['faculty'] or '').split('/'):
+                if f.strip(): self.by_faculty.setdefault(f.strip(), []).append(s)
+        for bucket in (self.by_day, self.by_room, self.by_section, self.by_faculty):
+            for rows in bucket.values(): rows.sort(key=lambda s: (DAYS.index(s['day']), s['start']))
+
+        self.lecture_halls = [r for r, info in self.rooms.items() if info['type'] == 'lecture']
+        self.subject_codes = {s['subject'].split()[0].upper() for s in self.slots if s['subject']}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path): return None
+        with open(path, 'r', encoding='utf-8') as f: return cls(json.load(f))
+
+    # --- LOOKUPS ---
+    def occupied(self, day, minute):
+        return [s for s in self.by_day.get(day, []) if s['start'] <= minute < s['end']]
+
+    def vacant_halls(self, day, minute):
+        busy = {r for s in self.occupied(day, minute) for r in (s['room'] or '').split('/')}
+        return [r for r in self.lecture_halls if r not in busy]
+
+    def room_location(self, room):
+        for entry in self.layout:
+            if re.search(rf'\b{re.escape(room)}\b', entry['desc']):
+                return f"{entry['building']}, {entry['floor']}"
+        # Range rows ("Classrooms (203-216)") don't list every number, fall back to the floor digit
+        if room.isdigit():
+            floor = room[0]
+            for entry in self.layout:
+                if entry['floor'].startswith(floor) and 'Kanad' in entry['building']:
+                    return f"{entry['building']}, {entry['floor']}"
+        return None
+
+    # --- QUERY PARSING ---
+    def parse_query(self, query, now=None):
+        now = now or campus_now()
+        q_lower = query.lower()
+        parsed = {'day': None, 'minute': None, 'rooms': [], 'section': None, 'faculty': [], 'subjects': []}
+
+        # Day
+        for d in DAYS:
+            if d.lower() in q_lower or re.search(rf'\b{d[:3].lower()}\b', q_lower): parsed['day'] = d
+        if 'tomorrow' in q_lower: parsed['day'] = DAYS[(now.weekday() + 1) % 7]
+        elif re.search(r'\b(today|now)\b', q_lower): parsed['day'] = DAYS[now.weekday()]
+
+        # Time: "10am", "2:30 pm", "14:00", "at 3"
+        m = (re.search(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b', q_lower)
+             or re.search(r'\b(\d{1,2}):(\d{2})\b()', q_lower)
+             or re.search(r'\bat\s+(\d{1,2})\b()()', q_lower))
+        if m:
+            hour, minute, ampm = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+            if ampm == 'pm' and hour < 12: hour += 12
+            elif ampm == 'am' and hour == 12: hour = 0
+            elif not ampm and 1 <= hour <= 7: hour += 12  # "at 3" means 15:00 on campus
+            parsed['minute'] = hour * 60 + minute
+        elif re.search(r'\b(now|current|currently)\b', q_lower):
+            parsed['minute'] = now.hour * 60 + now.minute
+
+        # Rooms: "room 313", "R4", "G-14", bare known room numbers
+        for token in re.findall(r'\broom\s*(?:no\.?\s*)?([a-z]?-?\d{1,3})\b', q_lower) + re.findall(r'\b(r[1-4]|\d{3})\b', q_lower):
+            room = token.upper()
+            if (room in self.rooms or room in self.by_room) and room not in parsed['rooms']: parsed['rooms'].append(room)
+        for room, info in self.rooms.items():
+            for name in info['desc'].split('/'):
+                name = re.sub(r'\(.*?\)', '', name).strip().lower()
+                if len(name) > 3 and name in q_lower and room not in parsed['rooms']: parsed['rooms'].append(room)
+
+        # Section: "2nd year cse-a", "ece b"
+        year = next((y for w, y in YEAR_WORDS.items() if re.search(rf'\b{w}\s*year\b', q_lower)), None)
+        sm = re.search(r'\b(cse|ece|ee)(?:\s*-?\s*([ab])\b)?', q_lower)
+        if sm:
+            section = sm.group(1).upper() + (f"-{sm.group(2).upper()}" if sm.group(2) else '')
+            parsed['section'] = (year, section)
+
+        # Faculty initials / subject codes: short codes only count when typed in caps
+        for token in re.findall(r'[A-Za-z][A-Za-z0-9-]+', query):
+            if token.isupper() and token in self.faculty:
+                parsed['faculty'].append(token)
+            if token.upper() in self.subject_codes and (token.isupper() or len(token) > 3):
+                parsed['subjects'].append(token.upper())
+
+        return parsed
+
+    def section_rows(self, year, section):
+        rows = []
+        for (y, sec), slots in self.by_section.items():
+            if year and y != year: continue
+            if sec == section or (('-' not in section) and sec.split('-')[0] == section): rows.extend(slots)
+        return rows
+
+    # --- ANSWERING ---
+    def lookup(self, query, now=None):
+        """
+        Returns a compact context block for room / vacancy / schedule questions,
+        or "" when the question isn't something the index can answer.
+        """
+        q = self.parse_query(query, now)
+        q_lower = query.lower()
+        lines = []
+
+        wants_vacancy = any(w in q_lower for w in VACANCY_WORDS)
+        has_filter = q['rooms'] or q['section'] or q['faculty'] or q['subjects']
+        if not wants_vacancy and not has_filter: return ""
+
+        now = now or campus_now()
+        day = q['day']
+        minute = q['minute']
+
+        # 1. Vacancy: lecture halls minus occupied rooms at (day, time)
+        if wants_vacancy and not (q['section'] or q['faculty'] or q['subjects']):
+            day = day or DAYS[now.weekday()]
+            if minute is None and not q['day']: minute = now.hour * 60 + now.minute
+            if minute is not None and q['rooms']:
+                for room in q['rooms']:
+                    busy = [s for s in self.occupied(day, minute) if room in (s['room'] or '').split('/')]
+                    status = 'OCCUPIED' if busy else 'FREE'
+                    lines.append(f"Room {room} on {day.title()} at {fmt_time(minute)}: {status}")
+                    lines.extend(self.format_slot(s) for s in busy)
+                return "[Timetable Index]\n" + "\n".join(lines)
+            elif minute is not None:
+                vacant = self.vacant_halls(day, minute)
+                lines.append(f"Vacant lecture halls on {day.title()} at {fmt_time(minute)}: {', '.join(vacant) or 'None'}")
+                busy = dict.fromkeys(f"{r} (Year {s['year']} {s['section']}: {s['subject']})" for s in self.occupied(day, minute)
+                                     for r in (s['room'] or '').split('/') if r in self.lecture_halls)
+                if busy: lines.append(f"Occupied lecture halls: {'; '.join(busy)}")
+            else:
+                lines.append(f"Vacant lecture halls on {day.title()} (hourly):")
+                for start in range(DAY_START, DAY_END, 60):
+                    lines.append(f"{fmt_time(start)}–{fmt_time(start + 60)}: {', '.join(self.vacant_halls(day, start)) or 'None'}")
+            lines.append("(Labs are excluded: they are usually locked outside lab hours.)")
+
+        # 2. Rooms: location + schedule
+        rows = None
+        for room in q['rooms']:
+            info = self.rooms.get(room, {})
+            where = self.room_location(room)
+            desc = f" ({info['desc']})" if info.get('desc') else ''
+            kind = 'Lab' if info.get('type') == 'lab' else 'Lecture Hall'
+            lines.append(f"Room {room}{desc}: {kind}" + (f", {where}" if where else ''))
+            rows = (rows or []) + self.by_room.get(room, [])
+
+        # 3. Section / faculty / subject schedules
+        if q['section']: rows = self.section_rows(*q['section']) if rows is None else [r for r in rows if r in self.section_rows(*q['section'])]
+        for fac in q['faculty']:
+            fac_rows = self.by_faculty.get(fac, [])
+            lines.append(f"{fac} = {self.faculty.get(fac, fac)}")
+            rows = fac_rows if rows is None else [r for r in rows if r in fac_rows]
+        if q['subjects'] and rows is not None:
+            rows = [r for r in rows if r['subject'].split()[0].upper() in q['subjects']]
+        elif q['subjects']:
+            rows = [s for s in self.slots if s['subject'].split()[0].upper() in q['subjects']]
+
+        if rows is not None:
+            if day: rows = [r for r in rows if r['day'] == day]
+            if minute is not None and day: rows = [r for r in rows if r['start'] <= minute < r['end']] or rows
+            if rows:
+                lines.append("Matching timetable rows:")
+                lines.extend(self.format_slot(r) for r in rows)
+            else:
+                lines.append(f"No classes scheduled{' on ' + day.title() if day else ''}.")
+
+        if not lines: return ""
+        return "[Timetable Index]\n" + "\n".join(lines)
+
+    def format_slot(self, s):
+        fac = s['faculty'] or '-'
+        fac_name = self.faculty.get(fac)
+        fac = f"{fac} ({fac_name})" if fac_name else fac
+        return f"- {s['day'].title()} {fmt_time(s['start'])}–{fmt_time(s['end'])} | Year {s['year']} {s['section']} | {s['subject']} | Room {s['room'] or 'N/A'} | {fac}"
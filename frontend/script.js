@@ -42,6 +42,8 @@ let currentUser = null;
 let currentRole = 'student';
 let currentClassId = null; // WE TRACK THIS NOW
 let chatHistory = [];
+let studentCourse = null; // {year, branch} picked in the student sidebar
+let subjectChips = [];
 // ... (Keep existing auth and scroll logic) ...
 
 // --- VOICE LOGIC ---
@@ -236,7 +238,7 @@ function loadDashboard() {
     if (currentRole === 'student') {
         sidebar.innerHTML = `
             <div style="color:#888; font-size:0.8rem; margin-bottom:10px;">ACADEMIC YEAR</div>
-            <select id="year-selector" style="width:100%; margin-bottom:10px; padding:8px; background:black; color:white; border:1px solid #333;">
+            <select id="year-selector" onchange="window.fetchDynamicSubjects()" style="width:100%; margin-bottom:10px; padding:8px; background:black; color:white; border:1px solid #333;">
                 <option value="First Year">First Year</option>
                 <option value="Second Year">Second Year</option>
                 <option value="Third Year">Third Year</option>
@@ -275,6 +277,7 @@ window.fetchDynamicSubjects = async () => {
     const list = document.getElementById('subject-list');
 
     if (!year || !branch) return;
+    studentCourse = { year, branch };
 
     list.innerHTML = '<div style="color:white; padding:10px;"><i class="fas fa-spin fa-circle-notch"></i> Scanning PDFs...</div>';
 
@@ -289,10 +292,11 @@ window.fetchDynamicSubjects = async () => {
         list.innerHTML = '';
         
         if (data.subjects && data.subjects.length > 0) {
-            data.subjects.forEach(sub => {
+            subjectChips = data.subjects;
+            data.subjects.forEach((sub, i) => {
                 list.innerHTML += `
                 <div class="chip" style="width:100%; justify-content:flex-start; margin-bottom:5px;" 
-                     onclick="window.sendMessage('Syllabus for ${sub}')">
+                     onclick="window.askSyllabus(${i})">
                     ${sub}
                 </div>`;
             });
@@ -304,6 +308,9 @@ window.fetchDynamicSubjects = async () => {
     }
 };
 
+// The clicked subject goes with the message, so the backend answers from the syllabus index
+window.askSyllabus = (i) => window.sendMessage(`Syllabus for ${subjectChips[i]}`, subjectChips[i]);
+
 window.loadClasses = async () => {
     const res = await fetch(`${API_BASE}/get_classes`, { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify({email:currentUser})});
     const data = await res.json();
@@ -345,30 +352,82 @@ window.deleteRecord = async () => {
     if(id) { await fetch(`${API_BASE}/delete_student`, { method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({id})}); window.loadClassRoster(); }
 }
 
+// --- STREAMING CHAT (SSE over fetch, EventSource can't POST) ---
+async function streamChat(payload, onDelta) {
+    const res = await fetch(`${API_BASE}/chat/stream`, {
+        method: 'POST', headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(payload)
+    });
+    if (!res.ok || !res.body) {
+        const err = new Error('Streaming unavailable');
+        err.noStream = true; // Nothing was processed server-side, safe to retry on /chat
+        throw err;
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '', final = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const event = (raw.match(/^event: (.*)$/m) || [])[1];
+            const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+            if (event === 'delta') onDelta(data.text);
+            else if (event === 'done') final = data;
+        }
+    }
+    if (!final) throw new Error('Stream ended early');
+    return final;
+}
+
 // --- CHAT ---
-window.sendMessage = async (textInput = null) => {
+window.sendMessage = async (textInput = null, subject = null) => {
     const input = document.getElementById('user-input');
     const text = textInput || input.value.trim();
     if (!text) return;
-    
+
     addMsg(text, true);
     if (!textInput) input.value = '';
     const loadId = addMsg('Thinking...', false, true);
+    const loader = document.getElementById(loadId);
+
+    // SEND CLASS_ID HERE
+    const payload = {
+        message: text,
+        history: chatHistory,
+        role: currentRole,
+        email: currentUser,
+        class_id: currentClassId, // KEY FIX
+        ...(currentRole === 'student' && studentCourse ? studentCourse : {}),
+        ...(subject ? { subject } : {})
+    };
 
     try {
-        // SEND CLASS_ID HERE
-        const res = await fetch(`${API_BASE}/chat`, {
-            method: 'POST', headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ 
-                message: text, 
-                history: chatHistory, 
-                role: currentRole, 
-                email: currentUser,
-                class_id: currentClassId // KEY FIX
-            })
-        });
-        const data = await res.json();
-        document.getElementById(loadId).remove();
+        let data;
+        let streamed = '';
+        try {
+            // Render tokens as they arrive; action replies only show up in the final event
+            data = await streamChat(payload, (delta) => {
+                streamed += delta;
+                loader.innerHTML = marked.parse(streamed);
+                document.getElementById('chat-box').scrollTop = 999999;
+            });
+        } catch (err) {
+            if (!err.noStream) throw err;
+            const res = await fetch(`${API_BASE}/chat`, {
+                method: 'POST', headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(payload)
+            });
+            data = await res.json();
+        }
+        loader.remove();
         addMsg(data.response, false);
         chatHistory.push({text, isUser:true});
         chatHistory.push({text: data.response, isUser:false});
@@ -385,8 +444,34 @@ function addMsg(text, isUser, isLoading) {
     return div.id;
 }
 
-window.openMap = () => {
+// --- TOUR IMAGES (resized AVIF/WebP/JPEG variants from build_assets.py) ---
+let imageManifest = null;
+const loadImageManifest = () => {
+    imageManifest = imageManifest || fetch(`${API_BASE}/assets/images`)
+        .then(res => res.ok ? res.json() : {})
+        .catch(() => ({}));
+    return imageManifest;
+};
+
+// The card is 200px wide: the browser picks the smallest variant that covers 200px x devicePixelRatio
+const pictureHtml = (url, images, style) => {
+    const prefix = `${API_BASE}/data/`;
+    const entry = url.startsWith(prefix) ? images[url.slice(prefix.length)] : null;
+    if (!entry) return `<img src="${url}" loading="lazy" decoding="async" style="${style}">`;
+
+    const srcset = list => list.map(v => `${prefix}${v.file} ${v.w}w`).join(', ');
+    const jpeg = entry.variants.jpeg;
+    const sources = ['avif', 'webp']
+        .filter(fmt => entry.variants[fmt] && entry.variants[fmt].length)
+        .map(fmt => `<source type="image/${fmt}" srcset="${srcset(entry.variants[fmt])}" sizes="200px">`)
+        .join('');
+    return `<picture>${sources}<img src="${prefix}${jpeg[Math.min(1, jpeg.length - 1)].file}" srcset="${srcset(jpeg)}" sizes="200px"
+        width="${entry.width}" height="${entry.height}" loading="lazy" decoding="async" style="${style}"></picture>`;
+};
+
+window.openMap = async () => {
     document.getElementById('map-modal').style.display = 'flex';
+    const images = await loadImageManifest();
     
     // Initialize Map
     if (window.campusMap) { window.campusMap.remove(); } // Reset if exists
@@ -441,7 +526,7 @@ window.openMap = () => {
     locations.forEach(loc => {
         const popupContent = `
             <div style="width:200px; color:black; text-align:center;">
-                <img src="${loc.img}" style="width:100%; height:120px; object-fit:cover; border-radius:8px; margin-bottom:8px;">
+                ${pictureHtml(loc.img, images, 'width:100%; height:120px; object-fit:cover; border-radius:8px; margin-bottom:8px;')}
                 <h3 style="margin:0; font-size:1rem;">${loc.title}</h3>
                 <p style="margin:5px 0 0 0; font-size:0.8rem; color:#555;">${loc.desc}</p>
             </div>